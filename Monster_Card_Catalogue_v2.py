@@ -1,6 +1,15 @@
 import easygui as eg
-#this is our dictionary where the information the user wants to know, remove, add, find are in.
-catalogue = {
+from monster_storage import MonsterCatalogue, STATS
+try:
+    from monster_similarity import index_for #finding similar monsters needs numpy
+except ImportError:
+    index_for = None
+try:
+    from monster_tournament import tournament #so does the tournament
+except ImportError:
+    tournament = None
+#these are the monsters a new catalogue starts with.
+starting_monsters = {
     "Stoneling" : { #dictionary inside a dictionary to store more values so we could put in different keys.
         "Strength" : 7,
         "Speed" : 1,
@@ -63,13 +72,61 @@ catalogue = {
     } 
 }
 
-def view_monsters(): #this shows us what is currently inside the dictionary
-    catalogue_text = "Existing NEOZONE monsters:"
-    for monster_name, stat in catalogue.items(): #this would grab the information (name and stats)
-        catalogue_text += f"\n\n{monster_name}'s Stats:\n" #while this would print it
-        for stat, stat_number in stat.items(): #this would print the stats
-            catalogue_text += f"{stat}: {stat_number}\n"
-    eg.msgbox(catalogue_text, title="catalogue")
+#this is our catalogue where the information the user wants to know, remove, add, find are in.
+#it works like a dictionary but saves the monsters in monsters.db, so they are still there next time.
+#main_catalogue opens it, so importing this file doesn't create monsters.db.
+catalogue = None
+
+PAGE_SIZE = 10 #how many monsters the catalogue shows at a time
+
+def view_monsters(): #this shows us the monsters a page at a time, filtered and sorted however the user likes
+    ranges = {} #stat -> (lowest, highest), None meaning no limit
+    sort = None
+    descending = False
+    page = 0
+    while True:
+        result = catalogue.query(ranges, sort, descending, page * PAGE_SIZE, PAGE_SIZE) #only this page is looked up
+        pages = max(1, -(-result.total // PAGE_SIZE))
+        lines = [f"Existing NEOZONE monsters: {result.total} found, page {page + 1} of {pages}"] #a list joined once at the end, instead of adding to a string over and over
+        for stat, (lowest, highest) in ranges.items():
+            lines.append(f"{stat}: {'any' if lowest is None else lowest} - {'any' if highest is None else highest}")
+        if sort:
+            lines.append(f"Sorted by {sort}, {'highest' if descending else 'lowest'} first")
+        for monster_name, stats in result.monsters: #this would grab the information (name and stats)
+            lines.append(f"\n{monster_name}'s Stats:")
+            lines.extend(f"{stat}: {stat_number}" for stat, stat_number in stats.items())
+        choice = eg.buttonbox("\n".join(lines), title = "catalogue", choices = ["<< Previous page", "Next page >>", "Filter and sort", "Back to menu"])
+        if choice == "<< Previous page":
+            page = max(page - 1, 0)
+        elif choice == "Next page >>":
+            page = min(page + 1, pages - 1)
+        elif choice == "Filter and sort":
+            chosen = choose_filters(ranges)
+            if chosen:
+                ranges, sort, descending = chosen
+                page = 0
+        else:
+            return
+
+def choose_filters(ranges): #asks which stat ranges to show and what to sort by
+    fields = [f"Lowest {stat}" for stat in STATS] + [f"Highest {stat}" for stat in STATS]
+    values = [ranges.get(stat, (None, None))[0] for stat in STATS] + [ranges.get(stat, (None, None))[1] for stat in STATS]
+    values = eg.multenterbox("Leave a box blank for no limit", "Filter monsters", fields, ["" if value is None else str(value) for value in values])
+    if values is None:
+        return None
+    try:
+        numbers = [int(value) if value.strip() else None for value in values]
+    except ValueError:
+        eg.msgbox("Invalid stat number. Please enter numeric values or leave the box blank", "ERROR")
+        return None
+    ranges = {stat: (lowest, highest) for stat, lowest, highest in zip(STATS, numbers, numbers[len(STATS):])
+              if (lowest, highest) != (None, None)}
+    orders = ["Catalogue order"] + [f"{stat} ({end} first)" for stat in STATS for end in ["lowest", "highest"]]
+    order = eg.choicebox("How should the monsters be sorted?", "Sort monsters", orders)
+    if not order or order == "Catalogue order":
+        return ranges, None, False
+    stat, end = order.split(" (")
+    return ranges, stat, end.startswith("highest")
 
 def make_monster():#this function helps the user search up their desired monster
     eg.msgbox("Create new NEOZONE monsters and customize their stats!", "Create Monster")
@@ -104,11 +161,13 @@ def make_monster():#this function helps the user search up their desired monster
     eg.msgbox(f"New NEOZONE monster '{name} added.", "SUCCESS")
 
 def main_catalogue(): #this will be our main interface where we can navigate and locate what we want to see
+    global catalogue
+    catalogue = MonsterCatalogue(starting_monsters=starting_monsters)
     while True:
         choice = eg.buttonbox(
             "=== NEOZONE: THE Monster Game Catalogue ===\nWhat would you like to do today?\n\nChoose one of the options to navigate!",#the welcoming message the user is receiving
             title = "THE Burger Shop",
-            choices = ["Look at all the monsters >-<!", "Search for a MONSTER?! rawr :3", "Create the Monster of your dreams :O", "Delete a Monster :<", "Exit"]
+            choices = ["Look at all the monsters >-<!", "Search for a MONSTER?! rawr :3", "Create the Monster of your dreams :O", "Delete a Monster :<", "Find similar monsters :o", "Monster tournament!!", "Exit"]
         )
         if choice == 'Look at all the monsters >-<!': #if the user chooses one of the options it will do the fuctions which has specific tasks assigned using the def function.
             view_monsters()
@@ -118,7 +177,12 @@ def main_catalogue(): #this will be our main interface where we can navigate and
             make_monster()
         elif choice == 'Delete a Monster :<':
             delete_monster()
+        elif choice == 'Find similar monsters :o':
+            similar_monsters()
+        elif choice == 'Monster tournament!!':
+            monster_tournament()
         elif choice == 'Exit':
+            catalogue.close() #this saves any changes that haven't been written yet
             eg.msgbox("Thank you for using NEOZONE: THE Monster Game Catalogue") 
             break #using break quits the code
 
@@ -136,4 +200,51 @@ def delete_monster():
         del catalogue[name]
         eg.msgbox(f"NEOZONE monster '{name}' was deleted.", "SUCCESS")
 
-main_catalogue()
\ No newline at end of file
+def similar_monsters(): #this finds the monsters with stats closest to a monster or to stats the user picks
+    if index_for is None:
+        eg.msgbox("Finding similar monsters needs numpy. Install it with: pip install numpy", "ERROR")
+        return
+    start = eg.buttonbox("Find monsters similar to...", "Find similar monsters", ["A monster in the catalogue", "Stats I choose"])
+    if start == "A monster in the catalogue":
+        name = eg.choicebox("Which NEOZONE monster?", "Find similar monsters", list(catalogue.keys()))
+        if not name:
+            return
+        matches = index_for(catalogue).like(name)
+        title = f"Monsters like {name}"
+    elif start == "Stats I choose":
+        values = eg.multenterbox("Enter a number between 1 - 25 for each stat", "Find similar monsters", STATS)
+        if values is None:
+            return
+        try:
+            target = [int(value) for value in values]
+        except ValueError:
+            eg.msgbox("Invalid stat number. Please enter numeric values", "ERROR")
+            return
+        if not all(1 <= value <= 25 for value in target):
+            eg.msgbox("Every stat has to be between 1 - 25", "ERROR")
+            return
+        matches = index_for(catalogue).nearest(target)
+        title = "Monsters like your stats"
+    else:
+        return
+    similar_text = "The closest NEOZONE monsters (a smaller distance is more alike):"
+    for monster_name, distance in matches:
+        stats = ", ".join(f"{stat} {number}" for stat, number in catalogue[monster_name].items())
+        similar_text += f"\n\n{monster_name} (distance {distance:.2f})\n{stats}"
+    eg.msgbox(similar_text, title = title)
+
+def monster_tournament(): #every monster fights every other monster and we see who wins the most
+    if tournament is None:
+        eg.msgbox("The tournament needs numpy. Install it with: pip install numpy", "ERROR")
+        return
+    if len(catalogue) < 2:
+        eg.msgbox("A tournament needs at least two NEOZONE monsters!", "ERROR")
+        return
+    report = tournament(catalogue, rounds = 100, workers = 1) #the catalogue is small enough for one process
+    tournament_text = f"Every monster fought every other monster {report['rounds']} times!\n"
+    for place, standing in enumerate(report["standings"][:10], 1):
+        tournament_text += f"\n{place}. {standing.name}: won {standing.win_rate:.0%} (Elo {standing.elo:.0f})"
+    eg.msgbox(tournament_text, title = "NEOZONE monster tournament")
+
+if __name__ == "__main__":
+    main_catalogue()
\ No newline at end of file
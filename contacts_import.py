@@ -0,0 +1,229 @@
+# Streams contacts from a CSV or vCard file into contacts.db in large batches, updating the names of emails already there
+import argparse
+import csv
+import itertools
+import re
+import sqlite3
+import sys
+import time
+
+# This is the filename of the contacts database, the same one the contacts app uses
+DB_NAME = 'contacts.db'
+# How many records are read and upserted at a time
+BATCH_SIZE = 10000
+# How many records go into one transaction
+COMMIT_EVERY = 200000
+# How many rejected records are kept to show in the report
+MAX_REJECT_SAMPLES = 20
+
+# These PRAGMAs are applied to the connection the command line import opens
+PRAGMAS = {
+    "cache_size": -65536,       # keep up to 64MB of pages in memory, so the email index stays cached
+    "temp_store": "MEMORY",     # temporary b-trees stay in memory
+}
+
+# The contacts table, created the same way by the contacts app and by the import
+CREATE_SQL = """
+    CREATE TABLE IF NOT EXISTS contacts (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        email TEXT NOT NULL UNIQUE
+    )
+"""
+
+# An email that is already there gets the new name. The WHERE skips rows whose name is the
+# same, so they are not written again and rowcount only counts real inserts and updates.
+UPSERT_SQL = """
+    INSERT INTO contacts (name, email) VALUES (?, ?)
+    ON CONFLICT (email) DO UPDATE SET name = excluded.name
+    WHERE name != excluded.name
+"""
+
+# Not a full check of the email rules, just one @ with something either side and a dot in the domain
+EMAIL_PATTERN = re.compile(r"[^@\s]+@[^@\s]+\.[^@\s.]+")
+
+# The vCard escapes \, \; \n and \\
+VCARD_ESCAPE = re.compile(r"\\(.)")
+
+def normalize_email(email):
+    """
+    Returns the email trimmed and in lower case, without a mailto:, so the same address
+    always matches the same contact. Raises ValueError if it doesn't look like an email.
+    """
+    email = (email or "").strip().lower()
+    if email.startswith("mailto:"):
+        email = email[len("mailto:"):]
+    if not EMAIL_PATTERN.fullmatch(email):
+        raise ValueError(f"{email!r} is not an email address" if email else "email is missing")
+    return email
+
+def clean_record(record):
+    ''' Checks one record and returns (name, email). Raises ValueError saying why a record is rejected. '''
+    if "_error" in record:
+        raise ValueError(record["_error"])
+    name = " ".join((record.get("name") or "").split())
+    if not name:
+        raise ValueError("name is missing")
+    return name, normalize_email(record.get("email"))
+
+def read_csv(f):
+    ''' Yields {"name", "email"} for each row of a CSV file with a header row, whatever the case of the headings '''
+    reader = csv.reader(f)
+    header = [heading.strip().lower() for heading in next(reader, [])]
+    for column in ["name", "email"]:
+        if column not in header:
+            raise ValueError(f"The CSV file has no {column} column")
+    name_column = header.index("name")
+    email_column = header.index("email")
+    for row in reader:
+        if not any(row):
+            continue
+        if len(row) <= max(name_column, email_column):
+            yield {"_error": f"only {len(row)} of {len(header)} columns"}
+        else:
+            yield {"name": row[name_column], "email": row[email_column]}
+
+def unfolded_lines(f):
+    ''' Yields the logical lines of a vCard file, joining the lines that start with a space or tab onto the one before '''
+    line = None
+    for raw in f:
+        raw = raw.rstrip("\r\n")
+        if raw[:1] in (" ", "\t") and line is not None:
+            line += raw[1:]
+            continue
+        if line is not None:
+            yield line
+        line = raw
+    if line is not None:
+        yield line
+
+def read_vcard(f):
+    """
+    Yields {"name", "email"} for each card in a vCard file: the FN (or the N parts if there
+    is no FN) and the preferred EMAIL, or the first one if none is marked preferred.
+    """
+    card = None
+    for line in unfolded_lines(f):
+        key, colon, value = line.partition(":")
+        if not colon:
+            continue
+        # Apple and Google put a group in front of some properties, like item1.EMAIL
+        prop, _, parameters = key.partition(";")
+        prop = prop.rpartition(".")[2].upper()
+        if prop == "BEGIN":
+            if value.strip().upper() == "VCARD":
+                card = {}
+        elif card is None:
+            continue
+        elif prop == "END":
+            if value.strip().upper() == "VCARD":
+                name = card.get("FN") or " ".join(part for part in reversed(card.get("N", "").split(";")[:2]) if part)
+                if "\\" in name:
+                    name = VCARD_ESCAPE.sub(lambda match: "\n" if match.group(1) in "nN" else match.group(1), name)
+                yield {"name": name, "email": card.get("EMAIL")}
+                card = None
+        elif prop == "EMAIL":
+            # vCard 3 marks the preferred email TYPE=PREF (or TYPE=INTERNET,PREF) and vCard 4 PREF=1
+            preferred = "PREF" in parameters.upper() and any(
+                parameter.startswith("PREF=") or "PREF" in parameter.split("=")[-1].split(",")
+                for parameter in parameters.upper().split(";"))
+            if "EMAIL" not in card or (preferred and not card.get("EMAIL_PREFERRED")):
+                card["EMAIL"] = value
+                card["EMAIL_PREFERRED"] = preferred
+        elif prop in ("FN", "N"):
+            card.setdefault(prop, value.strip())
+
+def read_contacts(path, file_format=None):
+    """
+    Yields one {"name", "email"} dictionary per contact in a CSV or vCard file.
+    The file is read line by line, so it is never all in memory.
+    """
+    file_format = file_format or ("vcard" if path.lower().endswith((".vcf", ".vcard")) else "csv")
+    # utf-8-sig skips the byte order mark spreadsheet programs often start a CSV with
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if file_format == "csv":
+            yield from read_csv(f)
+        else:
+            yield from read_vcard(f)
+
+def highest_id(cursor):
+    cursor.execute("SELECT max(id) FROM contacts")
+    return cursor.fetchone()[0] or 0
+
+def import_contacts(conn, records, batch_size=BATCH_SIZE, commit_every=COMMIT_EVERY):
+    """
+    Upserts the records in batches with executemany. A contact whose email is already in
+    the database has their name updated, so importing a file again only changes what changed in it.
+    A new row always gets an id one above the highest, so the inserts in a batch are how
+    far the highest id moved, and the rest of the rows it changed were updates.
+    Returns a dictionary with the counts and the speed of the import.
+    """
+    cursor = conn.cursor()
+    report = {"read": 0, "inserted": 0, "updated": 0, "unchanged": 0, "rejected": 0, "rejected_samples": []}
+    uncommitted = 0
+    start = time.perf_counter()
+    records = iter(records)
+    while True:
+        batch = list(itertools.islice(records, batch_size))
+        if not batch:
+            break
+        rows = []
+        for record in batch:
+            report["read"] += 1
+            try:
+                rows.append(clean_record(record))
+            except (ValueError, TypeError, AttributeError) as e:
+                report["rejected"] += 1
+                if len(report["rejected_samples"]) < MAX_REJECT_SAMPLES:
+                    report["rejected_samples"].append((report["read"], str(e)))
+        if not rows:
+            continue
+        before = highest_id(cursor)
+        cursor.executemany(UPSERT_SQL, rows)
+        changed = cursor.rowcount
+        inserted = highest_id(cursor) - before
+        report["inserted"] += inserted
+        report["updated"] += changed - inserted
+        report["unchanged"] += len(rows) - changed
+        uncommitted += len(rows)
+        if uncommitted >= commit_every:
+            conn.commit()
+            uncommitted = 0
+    conn.commit()
+    report["seconds"] = time.perf_counter() - start
+    report["rows_per_second"] = report["read"] / report["seconds"] if report["seconds"] else 0.0
+    return report
+
+def report_lines(report):
+    ''' The outcome of an import as lines of text '''
+    lines = [f"Read {report['read']} contacts in {report['seconds']:.2f}s ({report['rows_per_second']:,.0f} contacts/s)",
+             f"   Inserted:  {report['inserted']}",
+             f"   Updated:   {report['updated']} (email already there, name changed)",
+             f"   Unchanged: {report['unchanged']} (email already there with the same name)",
+             f"   Rejected:  {report['rejected']}"]
+    lines += [f"      record {number}: {reason}" for number, reason in report["rejected_samples"]]
+    return lines
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import contacts from a CSV or vCard file.")
+    parser.add_argument("path", help="the CSV (with name and email columns) or vCard file to import")
+    parser.add_argument("--db", default=DB_NAME, help="the database file to import into")
+    parser.add_argument("--format", choices=["csv", "vcard"], help="the file format (guessed from the extension if left out)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="records upserted per executemany call")
+    parser.add_argument("--commit-every", type=int, default=COMMIT_EVERY, help="records per transaction")
+    args = parser.parse_args()
+
+    try:
+        conn = sqlite3.connect(args.db)
+        conn.execute(CREATE_SQL)
+    except sqlite3.Error as e:
+        sys.exit(f"A database error occurred: {e}")
+    for name, value in PRAGMAS.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    try:
+        print("\n".join(report_lines(import_contacts(conn, read_contacts(args.path, args.format),
+                                                       args.batch_size, args.commit_every))))
+    except (OSError, ValueError) as e:
+        sys.exit(f"Could not import {args.path}: {e}")
+    finally:
+        conn.close()
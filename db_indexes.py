@@ -0,0 +1,15 @@
+# Keeps a SQLite database's indexes in step with the ones the code lists, for drama_repository and kpop_database
+
+def create_indexes(cursor, indexes):
+    """
+    Creates any index from indexes ({index name: CREATE INDEX IF NOT EXISTS sql}) that is
+    missing and drops our old idx_ indexes that are no longer listed, so the database keeps
+    up with the code. Indexes are only compared by name, so an index whose columns change
+    needs a new name, or a database that already has it keeps the old columns.
+    """
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx\\_%' ESCAPE '\\'")
+    for (index_name,) in cursor.fetchall():
+        if index_name not in indexes:
+            cursor.execute(f'DROP INDEX IF EXISTS "{index_name}"')
+    for sql in indexes.values():
+        cursor.execute(sql)
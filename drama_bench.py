@@ -0,0 +1,229 @@
+# Builds synthetic drama databases of any size and times every query the drama tools run against them
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from drama_repository import (COUNTRY_EXISTS_SQL, DB_NAME, SHOW_ALL_SQL, SHOW_COUNTRY_SQL, SHOW_YEAR_SQL,
+                              SHOW_WATCHED_SQL, SHOW_RATING_SQL, YEAR_EXISTS_SQL, fetch_page, release_order, setup_database)
+from drama_connection import apply_pragmas, enable_wal
+from drama_lookup import LookupCache
+from drama_query import DramaQuery, compile_query, leaderboard_sql, named_query
+from drama_search import search_dramas
+from drama_stats import drama_stats
+
+# The sizes benchmarked when none are given
+DEFAULT_SIZES = [10000, 100000]
+# How many timed runs each query gets, warm and cold
+DEFAULT_REPEAT = 5
+# Where the synthetic databases are kept between runs
+DEFAULT_WORKDIR = os.path.join(tempfile.gettempdir(), "drama_bench")
+# How many synthetic dramas are inserted at a time
+INSERT_BATCH = 50000
+
+# Words the synthetic drama names are made from, so searches have something to find
+NAME_WORDS = ["Love", "Moon", "Secret", "Queen", "Doctor", "Garden", "Fate", "Star", "Legend", "Summer",
+              "Hidden", "Palace", "Dream", "River", "Heart", "Sword", "City", "Spring", "Night", "Rose"]
+# Ratings go from 0 to 10 in half steps, like the real data
+RATINGS = [step / 2 for step in range(21)]
+
+def copy_lookups_and_views(conn, source):
+    """
+    Copies the release_year, country and watched rows and every view from the real
+    database, so the synthetic one answers the same menu options.
+    """
+    conn.execute("ATTACH DATABASE ? AS source", (source,))
+    for table in ["release_year", "country", "watched"]:
+        conn.execute(f"INSERT OR IGNORE INTO main.{table} SELECT * FROM source.{table}")
+    views = conn.execute("SELECT sql FROM source.sqlite_master WHERE type = 'view'").fetchall()
+    conn.commit()
+    conn.execute("DETACH DATABASE source")
+    for (sql,) in views:
+        conn.execute(sql.replace("CREATE VIEW", "CREATE VIEW IF NOT EXISTS", 1))
+    conn.commit()
+
+def synthetic_dramas(size, release_ids, country_ids, watched_ids, seed):
+    ''' Yields size random drama rows with unique names '''
+    rng = random.Random(seed)
+    for number in range(size):
+        name = f"{rng.choice(NAME_WORDS)} {rng.choice(NAME_WORDS)} {number}"
+        yield (name, rng.choice(release_ids), rng.choice(country_ids), rng.randint(1, 60),
+               rng.choice(watched_ids), rng.choice(RATINGS))
+
+def build_database(path, size, source=DB_NAME, seed=0):
+    """
+    Creates a database at path with the schema, indexes and search table from
+    setup_database, the lookup tables and views of the real database, and size
+    synthetic dramas. Returns how long the build took in seconds.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    start = time.perf_counter()
+    conn, cursor = setup_database(path)
+    # Nothing here needs to survive a crash, so skip the journal while filling the table
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    copy_lookups_and_views(conn, source)
+    ids = {}
+    for table, id_column in [("release_year", "release_id"), ("country", "country_id"), ("watched", "watched_id")]:
+        ids[table] = [row[0] for row in conn.execute(f"SELECT {id_column} FROM {table}")]
+    rows = synthetic_dramas(size, ids["release_year"], ids["country"], ids["watched"], seed)
+    while True:
+        batch = [row for _, row in zip(range(INSERT_BATCH), rows)]
+        if not batch:
+            break
+        cursor.executemany("INSERT INTO drama VALUES (?, ?, ?, ?, ?, ?)", batch)
+    conn.commit()
+    # Go back to WAL, which setup_database uses, so the timings match the real tools
+    enable_wal(conn)
+    conn.close()
+    return time.perf_counter() - start
+
+def run_sql(sql, params=()):
+    ''' Makes a benchmark step that runs one query and fetches every row '''
+    def step(conn):
+        return len(conn.execute(sql, params).fetchall())
+    return step
+
+def run_page(sql, params, releases):
+    ''' Makes a benchmark step that fetches the first page of a dramagui show_* screen '''
+    def step(conn):
+        rows, next_after = fetch_page(conn.cursor(), sql, params, releases)
+        return len(rows)
+    return step
+
+def run_view(view_name):
+    ''' Makes a benchmark step that reads a view straight from the database, with its headings '''
+    def step(conn):
+        rows = conn.execute("SELECT * FROM '" + view_name + "'").fetchall()
+        conn.execute("SELECT name from pragma_table_info('" + view_name + "') AS tblInfo").fetchall()
+        return len(rows)
+    return step
+
+def run_lookup_load(conn):
+    ''' The lookup tables dramagui loads when it starts '''
+    return len(LookupCache(conn).choices("release"))
+
+def benchmark_steps(conn):
+    """
+    Returns every query the drama tools issue as {name: step}, where a step takes a
+    connection, runs the query and returns the number of rows it produced.
+    """
+    lookups = LookupCache(conn)
+    releases = release_order(conn.cursor(), lookups)
+    country, year, watched = "South Korea", "2023", "Watched"
+    steps = {
+        "dramagui: lookup tables": run_lookup_load,
+        "dramagui: show_all page": run_page(SHOW_ALL_SQL, (), releases),
+        "dramagui: show_country page": run_page(SHOW_COUNTRY_SQL, (lookups.id_for("country", country),), releases),
+        "dramagui: show_year page": run_page(SHOW_YEAR_SQL, (), [lookups.id_for("release", year)]),
+        "dramagui: show_watched page": run_page(SHOW_WATCHED_SQL, (lookups.id_for("watched", watched),), releases),
+        "dramagui: show_rating page": run_page(SHOW_RATING_SQL, (8,), releases),
+        "dramagui/dramapy: search": lambda conn: len(search_dramas(conn.cursor(), "love* moon")),
+        "dramapy: country exists": run_sql(COUNTRY_EXISTS_SQL, (country.upper(),)),
+        "dramapy: year exists": run_sql(YEAR_EXISTS_SQL, (year,)),
+        "dramapy: country query": run_sql(*compile_query(DramaQuery(country=country, sort="release_desc"))),
+        "dramapy: year query": run_sql(*compile_query(DramaQuery(year_from=int(year), year_to=int(year), sort="release_desc"))),
+        "dramapy: country leaderboard": run_sql(leaderboard_sql("country"), (10,)),
+        "dramapy: year leaderboard": run_sql(leaderboard_sql("release"), (10,)),
+        "dramagui/dramapy: country statistics": lambda conn: len(drama_stats(conn.cursor(), "country")),
+        "dramagui/dramapy: year statistics": lambda conn: len(drama_stats(conn.cursor(), "release")),
+    }
+    for (view_name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'view' ORDER BY name").fetchall():
+        steps[f"view: {view_name}"] = run_view(view_name)
+        # This is how dramapy.print_query answers the view now
+        if named_query(view_name) is not None:
+            steps[f"query engine: {view_name}"] = run_sql(*compile_query(named_query(view_name)))
+    return steps
+
+def summarise(timings):
+    ''' Turns a list of timings in seconds into milliseconds statistics '''
+    return {
+        "min_ms": min(timings) * 1000,
+        "median_ms": statistics.median(timings) * 1000,
+        "mean_ms": statistics.mean(timings) * 1000,
+        "runs": len(timings),
+    }
+
+def time_step(path, step, repeat):
+    """
+    Times a step with a cold cache (a new connection for every run, so the schema is
+    parsed again and SQLite's page cache starts empty) and with a warm cache (one
+    connection, after one untimed run). The operating system's file cache is not
+    cleared, so cold here means cold for SQLite.
+    """
+    cold = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn = sqlite3.connect(path)
+        apply_pragmas(conn)
+        rows = step(conn)
+        cold.append(time.perf_counter() - start)
+        conn.close()
+
+    conn = sqlite3.connect(path)
+    apply_pragmas(conn)
+    step(conn)
+    warm = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        step(conn)
+        warm.append(time.perf_counter() - start)
+    conn.close()
+    return {"rows": rows, "cold": summarise(cold), "warm": summarise(warm)}
+
+def run_benchmark(sizes, repeat=DEFAULT_REPEAT, workdir=DEFAULT_WORKDIR, source=DB_NAME, rebuild=False, seed=0):
+    """
+    Builds (or reuses) a synthetic database for each size and times every step on it.
+    Returns the report as a dictionary ready to be written as JSON.
+    """
+    os.makedirs(workdir, exist_ok=True)
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "sqlite_version": sqlite3.sqlite_version,
+        "python_version": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "seed": seed,
+        "sizes": {},
+    }
+    for size in sizes:
+        path = os.path.join(workdir, f"drama_{size}.db")
+        build_seconds = None
+        if rebuild or not os.path.exists(path):
+            print(f"Building {size:,} dramas in {path} ...")
+            build_seconds = build_database(path, size, source, seed)
+        # A database kept from an earlier run is brought up to date with the code first,
+        # so its indexes, triggers and search table are the ones the tools use now
+        conn, cursor = setup_database(path)
+        steps = benchmark_steps(conn)
+        conn.close()
+        results = {}
+        for name, step in steps.items():
+            results[name] = time_step(path, step, repeat)
+            print(f"{size:>10,}  {name:<45} warm {results[name]['warm']['median_ms']:9.3f} ms"
+                  f"   cold {results[name]['cold']['median_ms']:9.3f} ms   {results[name]['rows']:>8} rows")
+        report["sizes"][str(size)] = {"path": path, "build_seconds": build_seconds, "queries": results}
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the drama tools' queries on synthetic databases.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="numbers of dramas to benchmark with")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="timed runs per query")
+    parser.add_argument("--workdir", default=DEFAULT_WORKDIR, help="where the synthetic databases are kept")
+    parser.add_argument("--source", default=DB_NAME, help="the database the lookup tables and views are copied from")
+    parser.add_argument("--rebuild", action="store_true", help="build the synthetic databases again even if they exist")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the synthetic data")
+    parser.add_argument("--out", default="drama_bench_report.json", help="where to write the JSON report")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.sizes, args.repeat, args.workdir, args.source, args.rebuild, args.seed)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.out}")
@@ -0,0 +1,58 @@
+# A small in-memory cache for query results that is emptied whenever the database changes
+from collections import OrderedDict
+import sys
+
+# How much memory the cached results may use, in bytes
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+class ResultCache:
+    """
+    Keeps results in least-recently-used order within a memory budget.
+    Every lookup passes the database's current PRAGMA data_version; when it is not
+    the one the cached results were made with, they are all thrown away.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def clear(self):
+        ''' Forgets every cached result '''
+        self._entries.clear()
+        self.used_bytes = 0
+
+    def get(self, key, version):
+        ''' Returns the cached result for key, or None if it isn't cached for this version '''
+        if version != self.version:
+            self.clear()
+            self.version = version
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, value, version, size=None):
+        """
+        Caches value under key for this version, dropping the least recently used
+        results until it fits. A value bigger than the whole budget isn't cached.
+        """
+        if version != self.version:
+            self.clear()
+            self.version = version
+        size = sys.getsizeof(value) if size is None else size
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self.used_bytes -= self._entries.pop(key)[1]
+        while self._entries and self.used_bytes + size > self.max_bytes:
+            oldest_key, (oldest_value, oldest_size) = self._entries.popitem(last=False)
+            self.used_bytes -= oldest_size
+        self._entries[key] = (value, size)
+        self.used_bytes += size
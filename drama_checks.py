@@ -0,0 +1,110 @@
+# Checks that can be run against the drama database to make sure it stays fast and correct
+import re
+import sqlite3
+import sys
+
+from drama_repository import (ORPHAN_RELEASES_SQL, SHOW_ALL_SQL, SHOW_COUNTRY_SQL, SHOW_YEAR_SQL,
+                              SHOW_WATCHED_SQL, SHOW_RATING_SQL, setup_database)
+from drama_query import DramaQuery, compile_query, leaderboard_sql, named_query
+from drama_search import find_search_mismatches
+from drama_stats import find_stats_mismatches
+
+# Every query the drama tools ship with, and sample parameters for it.
+# The show_* queries take their filter id, then a release id, a drama name and a page size.
+SHIPPED_QUERIES = {
+    "show_all": (SHOW_ALL_SQL, (13, "", 100)),
+    "show_country": (SHOW_COUNTRY_SQL, (2, 13, "", 100)),
+    "show_year": (SHOW_YEAR_SQL, (13, "", 100)),
+    "show_watched": (SHOW_WATCHED_SQL, (1, 13, "", 100)),
+    "show_rating": (SHOW_RATING_SQL, (8, 13, "", 100)),
+    "show_* release order": (ORPHAN_RELEASES_SQL, ()),
+    "dramapy country": compile_query(DramaQuery(country="China", sort="release_desc")),
+    "dramapy year": compile_query(DramaQuery(year_from=2023, year_to=2023, sort="release_desc")),
+    "query engine filters": compile_query(DramaQuery(year_from=2015, year_to=2020, status="Watched", rating_min=5, sort="rating_desc", limit=10)),
+    "dramapy country leaderboard": (leaderboard_sql("country"), (10,)),
+    "dramapy year leaderboard": (leaderboard_sql("release"), (10,)),
+}
+
+# These list every drama, so reading the whole table is what they are meant to do
+FULL_LISTINGS = {"All information", "query engine: All information"}
+
+def query_plan(cursor, sql, parameters=()):
+    ''' Returns the detail lines of EXPLAIN QUERY PLAN for a query '''
+    cursor.execute("EXPLAIN QUERY PLAN " + sql, parameters)
+    return [row[3] for row in cursor.fetchall()]
+
+def find_full_scans(cursor):
+    """
+    Runs EXPLAIN QUERY PLAN over the shipped queries and every view in the database.
+    Returns (query name, plan line) for each query that reads the whole drama table,
+    or the whole of one of its indexes. Only the queries in FULL_LISTINGS may do that.
+    """
+    queries = dict(SHIPPED_QUERIES)
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'view' ORDER BY name")
+    for (view_name,) in cursor.fetchall():
+        queries[view_name] = ("SELECT * FROM \"" + view_name + "\"", ())
+        # dramapy.print_query answers the named views with the query engine instead
+        if named_query(view_name) is not None:
+            queries["query engine: " + view_name] = compile_query(named_query(view_name))
+
+    full_scans = []
+    for name, (sql, parameters) in queries.items():
+        if name in FULL_LISTINGS:
+            continue
+        for detail in query_plan(cursor, sql, parameters):
+            # SCAN drama USING (COVERING) INDEX still reads every drama, just in index order.
+            # Looking rows up shows as SEARCH drama instead.
+            if re.match(r"SCAN drama\b", detail):
+                full_scans.append((name, detail))
+    return full_scans
+
+def check_query_plans(cursor):
+    ''' Fails with an AssertionError if any shipped query scans the whole drama table '''
+    full_scans = find_full_scans(cursor)
+    assert not full_scans, "Queries doing a full scan of drama:\n" + "\n".join(
+        f"   {name}: {detail}" for name, detail in full_scans)
+
+def check_search_index(cursor):
+    """
+    Fails with an AssertionError if the drama_fts search table is damaged or no longer
+    has exactly the drama table's names. drama_search.rebuild_search fixes it.
+    """
+    try:
+        cursor.execute("INSERT INTO drama_fts (drama_fts, rank) VALUES ('integrity-check', 1)")
+    except sqlite3.DatabaseError as e:
+        raise AssertionError(f"The search table is damaged: {e}")
+    mismatches = find_search_mismatches(cursor)
+    assert not mismatches, "The search table is out of step with drama:\n" + "\n".join(
+        f"   {drama_name}: {kept} in the search table, {correct} in drama" for drama_name, kept, correct in mismatches)
+
+def check_stats(cursor):
+    """
+    Fails with an AssertionError if the drama_stats summary table no longer matches
+    the numbers worked out from the drama table. drama_stats.rebuild_stats fixes it.
+    """
+    mismatches = find_stats_mismatches(cursor)
+    assert not mismatches, "Statistics out of step with drama:\n" + "\n".join(
+        f"   {grouping} {group_id}: kept {kept}, should be {correct}" for grouping, group_id, kept, correct in mismatches)
+
+# Every check, and what it means when it passes
+CHECKS = [
+    (check_query_plans, "All shipped queries are index-backed."),
+    (check_search_index, "The search table matches the drama table."),
+    (check_stats, "The statistics match the drama table."),
+]
+
+if __name__ == "__main__":
+    try:
+        conn, cursor = setup_database()
+    except sqlite3.Error as e:
+        sys.exit(f"A database error occurred: {e}")
+    failed = False
+    for check, passed_message in CHECKS:
+        try:
+            check(cursor)
+            print(passed_message)
+        except AssertionError as e:
+            print(e)
+            failed = True
+    conn.close()
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,181 @@
+# Checks that read-only lookups (like dramapy.py) and a writer (like dramagui.py) can share one database file
+import argparse
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+from drama_repository import DB_NAME, setup_database
+from drama_connection import connect
+from drama_query import DramaQuery, compile_query, named_query
+
+# How many reader processes run next to the writer
+DEFAULT_READERS = 4
+# How long each phase of the test runs, in seconds
+DEFAULT_SECONDS = 5.0
+# With the readers running, the writer has to keep at least this share of the commits per second
+# it manages next to the same number of processes that only use the CPU. Both phases compete for
+# the CPU the same way, so the gap is the readers getting in the writer's way. With WAL they only
+# share its index, which cost 20-30% on a one-core machine, so this allows up to 40% for that and noise.
+MIN_WRITE_RATIO = 0.6
+# A read that takes longer than this was waiting on the writer, not doing work
+MAX_READ_SECONDS = 0.5
+
+# What each reader runs over and over: dramapy's top 10 option and a menu option B search
+READ_QUERIES = [
+    compile_query(named_query("Top 10 South Korean Drama")),
+    compile_query(DramaQuery(country="China", sort="release_desc")),
+]
+
+def reader(path, start_at, stop_at, results):
+    ''' Runs the read queries on a read-only connection until stop_at and reports how it went '''
+    conn = connect(path, read_only=True)
+    queries = errors = 0
+    slowest = 0.0
+    while time.time() < start_at:
+        time.sleep(0.001)
+    while time.time() < stop_at:
+        for sql, params in READ_QUERIES:
+            started = time.perf_counter()
+            try:
+                conn.execute(sql, params).fetchall()
+                queries += 1
+            except sqlite3.OperationalError:
+                errors += 1
+            slowest = max(slowest, time.perf_counter() - started)
+    conn.close()
+    results.put(("reader", queries, errors, slowest))
+
+def spinner(path, start_at, stop_at, results):
+    ''' Keeps one CPU busy until stop_at without touching the database '''
+    spins = 0
+    while time.time() < start_at:
+        time.sleep(0.001)
+    while time.time() < stop_at:
+        spins += 1
+    results.put(("spinner", spins, 0, 0.0))
+
+def writer(path, start_at, stop_at, results):
+    ''' Adds dramas one commit at a time, the way add_drama does, until stop_at '''
+    conn = connect(path)
+    commits = errors = 0
+    slowest = 0.0
+    while time.time() < start_at:
+        time.sleep(0.001)
+    while time.time() < stop_at:
+        started = time.perf_counter()
+        try:
+            conn.execute("""
+                INSERT INTO drama (drama_name, release_id, country_id, episode, watched_id, rating)
+                VALUES (?, 1, 5, 16, 1, 8)
+            """, (f"Concurrency test drama {os.getpid()} {commits}",))
+            conn.commit()
+            commits += 1
+        except sqlite3.OperationalError:
+            conn.rollback()
+            errors += 1
+        slowest = max(slowest, time.perf_counter() - started)
+    conn.close()
+    results.put(("writer", commits, errors, slowest))
+
+def run_phase(path, readers, seconds, spinners=0):
+    """
+    Runs one writer process, the given number of reader processes and the given number
+    of spinner processes at the same time. Returns the totals for the readers and for the writer.
+    """
+    results = multiprocessing.Queue()
+    start_at = time.time() + 1.0 #gives every process time to start before the clock runs
+    stop_at = start_at + seconds
+    processes = [multiprocessing.Process(target=writer, args=(path, start_at, stop_at, results))]
+    processes += [multiprocessing.Process(target=reader, args=(path, start_at, stop_at, results)) for _ in range(readers)]
+    processes += [multiprocessing.Process(target=spinner, args=(path, start_at, stop_at, results)) for _ in range(spinners)]
+    for process in processes:
+        process.start()
+    outcomes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    totals = {"reads": 0, "read_errors": 0, "slowest_read": 0.0, "commits": 0, "write_errors": 0, "slowest_commit": 0.0}
+    for role, count, errors, slowest in outcomes:
+        if role == "reader":
+            totals["reads"] += count
+            totals["read_errors"] += errors
+            totals["slowest_read"] = max(totals["slowest_read"], slowest)
+        elif role == "writer":
+            totals["commits"] += count
+            totals["write_errors"] += errors
+            totals["slowest_commit"] = max(totals["slowest_commit"], slowest)
+    totals["commits_per_second"] = totals["commits"] / seconds
+    totals["reads_per_second"] = totals["reads"] / seconds
+    return totals
+
+def print_phase(name, totals):
+    ''' Prints the totals of one phase '''
+    print(f"{name}:")
+    print(f"   writer:  {totals['commits_per_second']:,.0f} commits/s, {totals['write_errors']} errors, "
+          f"slowest commit {totals['slowest_commit'] * 1000:.1f} ms")
+    print(f"   readers: {totals['reads_per_second']:,.0f} queries/s, {totals['read_errors']} errors, "
+          f"slowest query {totals['slowest_read'] * 1000:.1f} ms")
+
+def check_concurrency(source=DB_NAME, readers=DEFAULT_READERS, seconds=DEFAULT_SECONDS, wal=True):
+    """
+    Copies the database, runs the writer next to as many processes that only use the CPU
+    as there are readers, and then with the readers. Each run starts from its own copy, so
+    the second doesn't pay for the dramas the first added. Returns a list of the problems
+    found (an empty list means the check passed).
+    """
+    workdir = tempfile.mkdtemp(prefix="drama_concurrency_")
+    path = os.path.join(workdir, "drama.db")
+    try:
+        shutil.copyfile(source, path)
+        try:
+            conn, cursor = setup_database(path)
+        except sqlite3.Error as e:
+            return [f"Could not set up the test database: {e}"]
+        if not wal:
+            conn.execute("PRAGMA journal_mode = DELETE")
+        journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        conn.close()
+        print(f"Journal mode: {journal_mode}")
+
+        shutil.copyfile(path, os.path.join(workdir, "busy.db"))
+        alone = run_phase(os.path.join(workdir, "busy.db"), 0, seconds, spinners=readers)
+        print_phase(f"Writer with {readers} busy processes", alone)
+        shutil.copyfile(path, os.path.join(workdir, "shared.db"))
+        shared = run_phase(os.path.join(workdir, "shared.db"), readers, seconds)
+        print_phase(f"Writer with {readers} readers", shared)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    problems = []
+    if journal_mode != "wal":
+        problems.append(f"The database is in {journal_mode} mode, not WAL.")
+    if shared["read_errors"]:
+        problems.append(f"Readers failed {shared['read_errors']} times while the writer was committing.")
+    if shared["write_errors"]:
+        problems.append(f"The writer failed {shared['write_errors']} times while readers were reading.")
+    if shared["slowest_read"] > MAX_READ_SECONDS:
+        problems.append(f"A read waited {shared['slowest_read']:.2f}s, so readers blocked on the writer.")
+    if shared["commits_per_second"] < alone["commits_per_second"] * MIN_WRITE_RATIO:
+        problems.append(f"Write throughput fell from {alone['commits_per_second']:,.0f} to "
+                        f"{shared['commits_per_second']:,.0f} commits/s with readers running "
+                        f"(at least {MIN_WRITE_RATIO:.0%} has to be kept).")
+    return problems
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check readers and a writer can use the drama database at the same time.")
+    parser.add_argument("--db", default=DB_NAME, help="the database to copy for the test")
+    parser.add_argument("--readers", type=int, default=DEFAULT_READERS, help="reader processes to run")
+    parser.add_argument("--seconds", type=float, default=DEFAULT_SECONDS, help="how long each phase runs")
+    parser.add_argument("--no-wal", action="store_true", help="use the old rollback journal, to see the problem WAL fixes")
+    args = parser.parse_args()
+
+    problems = check_concurrency(args.db, args.readers, args.seconds, wal=not args.no_wal)
+    for problem in problems:
+        print(problem)
+    if problems:
+        sys.exit(1)
+    print("Readers never blocked on the writer.")
@@ -0,0 +1,86 @@
+# Keeps long-lived, tuned connections to the drama database so queries don't pay for a new connection each time
+import atexit
+import os
+import sqlite3
+import threading
+from urllib.parse import quote
+
+# This is the filename of the database to be used
+DB_NAME = 'dramadatabase.db'
+
+# These PRAGMAs are applied once to every connection the manager opens
+PRAGMAS = {
+    "cache_size": -65536,       # keep up to 64MB of pages in memory (negative means KiB)
+    "mmap_size": 268435456,     # read up to 256MB of the file through memory mapping
+    "temp_store": "MEMORY",     # sorts and temporary tables stay in memory
+}
+
+# How long a connection waits for another one's write to finish before giving up
+BUSY_TIMEOUT_SECONDS = 5.0
+
+def apply_pragmas(conn, pragmas=PRAGMAS):
+    ''' Applies the tuning PRAGMAs to a connection '''
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+
+def connect(db_name=DB_NAME, read_only=False, pragmas=PRAGMAS, check_same_thread=True):
+    """
+    Opens a connection that waits up to BUSY_TIMEOUT_SECONDS for locks and has the
+    tuning PRAGMAs applied. A read_only connection is opened with a mode=ro URI,
+    so it can never take the write lock.
+    """
+    if read_only:
+        uri = "file:" + quote(os.path.abspath(db_name).replace(os.sep, "/")) + "?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=check_same_thread)
+    else:
+        conn = sqlite3.connect(db_name, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=check_same_thread)
+    apply_pragmas(conn, pragmas)
+    return conn
+
+def enable_wal(conn):
+    """
+    Switches the database to write-ahead logging, so readers keep reading while a
+    writer commits. The setting is stored in the database file, so it only has to be
+    done once by a connection that can write.
+    """
+    conn.execute("PRAGMA journal_mode = WAL")
+    # With WAL, NORMAL only syncs at checkpoints and is still safe against corruption
+    conn.execute("PRAGMA synchronous = NORMAL")
+
+class ConnectionManager:
+    """
+    Opens one connection per thread the first time it is asked for and hands the
+    same connection out after that. Every connection is closed when the program exits.
+    Tools that only look things up should pass read_only=True.
+    """
+
+    def __init__(self, db_name=DB_NAME, pragmas=PRAGMAS, read_only=False):
+        self.db_name = db_name
+        self.pragmas = pragmas
+        self.read_only = read_only
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        atexit.register(self.close_all)
+
+    def connection(self):
+        ''' Returns this thread's connection, opening it on first use '''
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = connect(self.db_name, self.read_only, self.pragmas, check_same_thread=False)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def cursor(self):
+        ''' Returns a new cursor on this thread's connection '''
+        return self.connection().cursor()
+
+    def close_all(self):
+        ''' Closes every connection the manager has opened '''
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
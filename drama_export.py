@@ -0,0 +1,214 @@
+# Streams a view or a filtered query out of the drama database to CSV, JSONL or a compact columnar file
+import argparse
+import csv
+import gzip
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:
+    # Windows has no resource module, so the peak memory is left out of the report there
+    resource = None
+
+from drama_connection import PRAGMAS, connect
+from drama_query import DramaQuery, compile_query, named_query
+from drama_repository import DB_NAME
+
+# How many rows are fetched and written at a time
+CHUNK_SIZE = 10000
+
+# Exports read every row once, so a big page cache or memory map only adds to the memory used.
+# Sorts spill to a temporary file instead of holding the whole result in memory.
+EXPORT_PRAGMAS = dict(PRAGMAS, cache_size=-16384, mmap_size=0, temp_store="FILE")
+
+# The columnar format: a gzip file of JSON lines. The first line names the columns,
+# and every line after it holds one chunk of rows stored column by column, so the
+# repeated countries, years and statuses sit next to each other and compress well.
+COLUMNAR_FORMAT = "drama-columns"
+
+def source_query(conn, view_name=None, query=None):
+    """
+    Returns (sql, params) for what is being exported: a DramaQuery, one of the named
+    views (answered by the query engine), or any other view (read as it is).
+    """
+    if query is not None:
+        return compile_query(query)
+    if named_query(view_name) is not None:
+        return compile_query(named_query(view_name))
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'view' AND name = ?", (view_name,)).fetchone()
+    if exists is None:
+        raise ValueError(f"There is no view called {view_name}")
+    return "SELECT * FROM \"" + view_name + "\"", ()
+
+def fetch_chunks(cursor, chunk_size=CHUNK_SIZE):
+    ''' Yields the rows of an executed query chunk_size at a time, so only one chunk is ever in memory '''
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield rows
+
+def write_csv(path, columns, chunks):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for rows in chunks:
+            writer.writerows(rows)
+            yield len(rows)
+
+def write_jsonl(path, columns, chunks):
+    # json.dumps builds a new encoder on every call when given options, so make one and keep it
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    with open(path, "w", encoding="utf-8") as f:
+        for rows in chunks:
+            f.write("".join(encode(dict(zip(columns, row))) + "\n" for row in rows))
+            yield len(rows)
+
+def write_columnar(path, columns, chunks):
+    with gzip.open(path, "wt", encoding="utf-8", compresslevel=6) as f:
+        f.write(json.dumps({"format": COLUMNAR_FORMAT, "version": 1, "columns": columns}) + "\n")
+        for rows in chunks:
+            f.write(json.dumps({"rows": len(rows), "columns": [list(column) for column in zip(*rows)]},
+                               ensure_ascii=False, separators=(",", ":")) + "\n")
+            yield len(rows)
+
+def read_columnar(path):
+    """
+    Reads a columnar export back. Returns the column names and a generator that
+    yields one {column name: list of values} dictionary per chunk.
+    """
+    f = gzip.open(path, "rt", encoding="utf-8")
+    header = json.loads(f.readline())
+    if header.get("format") != COLUMNAR_FORMAT:
+        f.close()
+        raise ValueError(f"{path} is not a {COLUMNAR_FORMAT} file")
+
+    def chunks():
+        with f:
+            for line in f:
+                yield dict(zip(header["columns"], json.loads(line)["columns"]))
+    return header["columns"], chunks()
+
+# For each format: the file extension and the function that writes it.
+# A writer yields the number of rows in each chunk once that chunk is written.
+FORMATS = {
+    "csv": (".csv", write_csv),
+    "jsonl": (".jsonl", write_jsonl),
+    "columnar": (".dcol.gz", write_columnar),
+}
+
+def peak_memory_mb():
+    ''' Returns the most memory this process has used so far in MB, or None if it cannot be told '''
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def export(conn, path, file_format="csv", view_name=None, query=None, chunk_size=CHUNK_SIZE):
+    """
+    Writes a view or a DramaQuery to path, chunk_size rows at a time.
+    Returns a report with the rows written, the time taken and the speed.
+    """
+    extension, writer = FORMATS[file_format]
+    sql, params = source_query(conn, view_name, query)
+    start = time.perf_counter()
+    cursor = conn.cursor()
+    cursor.arraysize = chunk_size
+    cursor.execute(sql, params)
+    columns = [column[0] for column in cursor.description]
+    rows = 0
+    for written in writer(path, columns, fetch_chunks(cursor, chunk_size)):
+        rows += written
+    seconds = time.perf_counter() - start
+    return {
+        "source": view_name or repr(query),
+        "path": path,
+        "format": file_format,
+        "rows": rows,
+        "seconds": seconds,
+        "rows_per_second": rows / seconds if seconds else 0.0,
+        "bytes": os.path.getsize(path),
+        "peak_memory_mb": peak_memory_mb(),
+    }
+
+def export_view_file(db_name, view_name, path, file_format, chunk_size=CHUNK_SIZE):
+    ''' Exports one view on its own read-only connection (this is what each worker process runs) '''
+    conn = connect(db_name, read_only=True, pragmas=EXPORT_PRAGMAS)
+    try:
+        return export(conn, path, file_format, view_name=view_name, chunk_size=chunk_size)
+    finally:
+        conn.close()
+
+def view_path(outdir, view_name, file_format):
+    return os.path.join(outdir, view_name + FORMATS[file_format][0])
+
+def export_views(db_name, view_names, outdir, file_format="csv", workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Exports each view to its own file in outdir, spread over worker processes
+    (one per core when workers is None). Returns the reports in the order of view_names.
+    """
+    os.makedirs(outdir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(export_view_file, db_name, view_name, view_path(outdir, view_name, file_format),
+                               file_format, chunk_size) for view_name in view_names]
+        return [future.result() for future in futures]
+
+def print_report(report):
+    memory = f", peak memory {report['peak_memory_mb']:.1f} MB" if report["peak_memory_mb"] is not None else ""
+    print(f"{report['source']:<30} {report['rows']:>10,} rows in {report['seconds']:.2f}s "
+          f"({report['rows_per_second']:,.0f} rows/s, {report['bytes'] / 1024:,.0f} KB{memory}) -> {report['path']}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export drama views or a filtered query to CSV, JSONL or a columnar file.")
+    parser.add_argument("views", nargs="*", help="the views to export (leave out to export a filtered query)")
+    parser.add_argument("--db", default=DB_NAME, help="the database to export from")
+    parser.add_argument("--format", choices=list(FORMATS), default="csv", help="the file format to write")
+    parser.add_argument("--out", default=".", help="the folder for view files, or the file for a query")
+    parser.add_argument("--all-views", action="store_true", help="export every view in the database")
+    parser.add_argument("--workers", type=int, help="worker processes for several views (one per core if left out)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="rows fetched and written at a time")
+    parser.add_argument("--country", help="only dramas from this country")
+    parser.add_argument("--year-from", type=int, help="only dramas released in or after this year")
+    parser.add_argument("--year-to", type=int, help="only dramas released in or before this year")
+    parser.add_argument("--status", help="only dramas with this watched status")
+    parser.add_argument("--rating-min", type=float, help="only dramas rated at least this")
+    parser.add_argument("--rating-max", type=float, help="only dramas rated at most this")
+    parser.add_argument("--sort", choices=["release", "release_desc", "rating_desc", "name"], help="the order to write the dramas in")
+    args = parser.parse_args()
+
+    view_names = args.views
+    if args.all_views:
+        conn = connect(args.db, read_only=True, pragmas=EXPORT_PRAGMAS)
+        view_names = [name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'view' ORDER BY name")]
+        conn.close()
+
+    started = time.perf_counter()
+    if view_names:
+        os.makedirs(args.out, exist_ok=True)
+        try:
+            if len(view_names) == 1 and not args.workers:
+                reports = [export_view_file(args.db, view_names[0], view_path(args.out, view_names[0], args.format),
+                                            args.format, args.chunk_size)]
+            else:
+                reports = export_views(args.db, view_names, args.out, args.format, args.workers, args.chunk_size)
+        except ValueError as e:
+            sys.exit(str(e))
+    else:
+        query = DramaQuery(country=args.country, year_from=args.year_from, year_to=args.year_to, status=args.status,
+                           rating_min=args.rating_min, rating_max=args.rating_max, sort=args.sort)
+        path = args.out if not os.path.isdir(args.out) else os.path.join(args.out, "dramas" + FORMATS[args.format][0])
+        conn = connect(args.db, read_only=True, pragmas=EXPORT_PRAGMAS)
+        try:
+            reports = [export(conn, path, args.format, query=query, chunk_size=args.chunk_size)]
+        finally:
+            conn.close()
+    for report in reports:
+        print_report(report)
+    total_rows = sum(report["rows"] for report in reports)
+    seconds = time.perf_counter() - started
+    print(f"Exported {total_rows:,} rows in {seconds:.2f}s ({total_rows / seconds if seconds else 0:,.0f} rows/s)")
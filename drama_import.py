@@ -0,0 +1,143 @@
+# Streams dramas from a CSV or JSONL file into the drama database in large batches
+import argparse
+import csv
+import itertools
+import json
+import sqlite3
+import sys
+import time
+
+from drama_repository import DB_NAME, setup_database
+from drama_lookup import LookupCache
+
+# The columns every record needs, in the order they go into the drama table
+FIELDS = ["drama_name", "release", "country", "episode", "watched", "rating"]
+# How many records are read and inserted at a time
+BATCH_SIZE = 10000
+# How many records go into one transaction
+COMMIT_EVERY = 200000
+# How many rejected rows are kept to show in the report
+MAX_REJECT_SAMPLES = 20
+
+INSERT_SQL = """
+    INSERT INTO drama (drama_name, release_id, country_id, episode, watched_id, rating)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (drama_name) DO NOTHING
+"""
+
+def read_records(path, file_format=None):
+    """
+    Yields one dictionary per record in a CSV (with a header row) or JSONL file.
+    The file is read line by line, so it is never all in memory.
+    """
+    file_format = file_format or ("jsonl" if path.lower().endswith((".jsonl", ".json")) else "csv")
+    with open(path, newline="", encoding="utf-8") as f:
+        if file_format == "csv":
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError as e:
+                        yield {"_error": f"invalid JSON: {e}"}
+
+def to_number(value, number_type, lowest, highest):
+    ''' Turns a field into a number between lowest and highest, or None if it is blank '''
+    if value is None or str(value).strip() == "":
+        return None
+    number = number_type(value)
+    if number < lowest or number > highest:
+        raise ValueError(f"{value} is not between {lowest} and {highest}")
+    return number
+
+def clean_record(record):
+    """
+    Checks one record and returns (drama_name, release, country, episode, watched, rating)
+    with the numbers converted. Raises ValueError saying why a record is rejected.
+    """
+    if "_error" in record:
+        raise ValueError(record["_error"])
+    values = {field: record.get(field) for field in FIELDS}
+    for field in ["drama_name", "release", "country", "watched"]:
+        values[field] = str(values[field]).strip() if values[field] is not None else ""
+        if not values[field]:
+            raise ValueError(f"{field} is missing")
+    episode = to_number(values["episode"], int, 0, 10000)
+    rating = to_number(values["rating"], float, 0, 10)
+    if rating is not None and rating.is_integer():
+        rating = int(rating)
+    return values["drama_name"], values["release"], values["country"], episode, values["watched"], rating
+
+def import_dramas(conn, records, batch_size=BATCH_SIZE, commit_every=COMMIT_EVERY):
+    """
+    Inserts the records in batches with executemany, resolving the release, country
+    and watched labels through the lookup cache and adding any new ones.
+    Dramas whose name is already in the database are skipped and counted as conflicts.
+    Returns a dictionary with the counts and the speed of the import.
+    """
+    lookups = LookupCache(conn)
+    cursor = conn.cursor()
+    report = {"read": 0, "inserted": 0, "conflicts": 0, "rejected": 0, "rejected_samples": []}
+    uncommitted = 0
+    start = time.perf_counter()
+    records = iter(records)
+    while True:
+        batch = list(itertools.islice(records, batch_size))
+        if not batch:
+            break
+        rows = []
+        # Labels resolved in this batch, so the cache is only asked once per label
+        ids = {}
+        for record in batch:
+            report["read"] += 1
+            try:
+                name, release, country, episode, watched, rating = clean_record(record)
+            except (ValueError, TypeError, AttributeError) as e:
+                report["rejected"] += 1
+                if len(report["rejected_samples"]) < MAX_REJECT_SAMPLES:
+                    report["rejected_samples"].append((report["read"], str(e)))
+                continue
+            for kind, label in (("release", release), ("country", country), ("watched", watched)):
+                if (kind, label) not in ids:
+                    ids[kind, label] = lookups.add(kind, label)
+            rows.append((name, ids["release", release], ids["country", country],
+                         episode, ids["watched", watched], rating))
+        cursor.executemany(INSERT_SQL, rows)
+        report["inserted"] += cursor.rowcount
+        report["conflicts"] += len(rows) - cursor.rowcount
+        uncommitted += len(rows)
+        if uncommitted >= commit_every:
+            conn.commit()
+            uncommitted = 0
+    conn.commit()
+    report["seconds"] = time.perf_counter() - start
+    report["rows_per_second"] = report["read"] / report["seconds"] if report["seconds"] else 0.0
+    return report
+
+def print_report(report):
+    ''' Prints the outcome of an import '''
+    print(f"Read {report['read']} rows in {report['seconds']:.2f}s ({report['rows_per_second']:,.0f} rows/s)")
+    print(f"   Inserted:  {report['inserted']}")
+    print(f"   Conflicts: {report['conflicts']} (drama_name already in the database)")
+    print(f"   Rejected:  {report['rejected']}")
+    for line_number, reason in report["rejected_samples"]:
+        print(f"      record {line_number}: {reason}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import dramas from a CSV or JSONL file.")
+    parser.add_argument("path", help="the CSV or JSONL file to import")
+    parser.add_argument("--db", default=DB_NAME, help="the database file to import into")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="the file format (guessed from the extension if left out)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="records inserted per executemany call")
+    parser.add_argument("--commit-every", type=int, default=COMMIT_EVERY, help="records per transaction")
+    args = parser.parse_args()
+
+    try:
+        conn, cursor = setup_database(args.db)
+    except sqlite3.Error as e:
+        sys.exit(f"A database error occurred: {e}")
+    try:
+        print_report(import_dramas(conn, read_records(args.path, args.format), args.batch_size, args.commit_every))
+    finally:
+        conn.close()
@@ -0,0 +1,144 @@
+# Load-tests drama_service.py with client processes that each keep one connection open and send requests back to back
+import argparse
+import http.client
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import time
+from urllib.parse import quote, urlsplit
+
+from drama_service import DEFAULT_HOST, DEFAULT_PORT
+
+# How many client processes send requests at once
+DEFAULT_CLIENTS = 4
+# How long the test runs, in seconds
+DEFAULT_SECONDS = 10.0
+
+# What a dashboard asks for: every dramagui screen and a few named views
+PATHS = [
+    "/dramas/all",
+    "/dramas/country/South%20Korea",
+    "/dramas/country/China?limit=20",
+    "/dramas/year/2023",
+    "/dramas/watched/Watched",
+    "/dramas/rating/8",
+    "/views",
+    "/views/" + quote("Top 10 South Korean Drama"),
+    "/views/" + quote("Year 2021"),
+    "/views/" + quote("Rating 5 and over"),
+]
+
+def client(base_url, seconds, conditional, number):
+    """
+    Sends the PATHS in turn on one keep-alive connection for the given time.
+    With conditional, every request carries the ETag the last answer for that path had.
+    Returns (status counts, latencies in seconds, errors).
+    """
+    url = urlsplit(base_url)
+    conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=10)
+    etags = {}
+    statuses = {}
+    latencies = []
+    errors = 0
+    # Each client starts at a different path, so the service doesn't see them in lockstep
+    position = number
+    stop_at = time.perf_counter() + seconds
+    while time.perf_counter() < stop_at:
+        path = PATHS[position % len(PATHS)]
+        position += 1
+        headers = {"If-None-Match": etags[path]} if conditional and path in etags else {}
+        started = time.perf_counter()
+        try:
+            conn.request("GET", path, headers=headers)
+            response = conn.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=10)
+            continue
+        latencies.append(time.perf_counter() - started)
+        statuses[response.status] = statuses.get(response.status, 0) + 1
+        if response.getheader("ETag"):
+            etags[path] = response.getheader("ETag")
+    conn.close()
+    return statuses, latencies, errors
+
+def percentile(sorted_values, fraction):
+    ''' Returns the value a fraction of the way through an already sorted list '''
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+def run_load_test(base_url, clients=DEFAULT_CLIENTS, seconds=DEFAULT_SECONDS, conditional=False):
+    ''' Runs the client processes and returns the combined report as a dictionary '''
+    with multiprocessing.Pool(clients) as pool:
+        results = pool.starmap(client, [(base_url, seconds, conditional, number) for number in range(clients)])
+    statuses = {}
+    latencies = []
+    errors = 0
+    for client_statuses, client_latencies, client_errors in results:
+        for status, count in client_statuses.items():
+            statuses[status] = statuses.get(status, 0) + count
+        latencies.extend(client_latencies)
+        errors += client_errors
+    latencies.sort()
+    report = {
+        "requests": len(latencies),
+        "requests_per_second": len(latencies) / seconds,
+        "statuses": dict(sorted(statuses.items())),
+        "errors": errors,
+    }
+    if latencies:
+        report.update({
+            "median_ms": statistics.median(latencies) * 1000,
+            "p95_ms": percentile(latencies, 0.95) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+            "max_ms": latencies[-1] * 1000,
+        })
+    return report
+
+def print_report(report):
+    print(f"{report['requests']:,} requests, {report['requests_per_second']:,.0f} requests/s, {report['errors']} errors")
+    print("   statuses: " + ", ".join(f"{status}: {count:,}" for status, count in report["statuses"].items()))
+    if report["requests"]:
+        print(f"   latency:  median {report['median_ms']:.2f} ms, p95 {report['p95_ms']:.2f} ms, "
+              f"p99 {report['p99_ms']:.2f} ms, max {report['max_ms']:.2f} ms")
+
+def wait_for_service(base_url, seconds=10.0):
+    ''' Waits until the service answers, so the test doesn't start before it is listening '''
+    url = urlsplit(base_url)
+    stop_at = time.perf_counter() + seconds
+    while True:
+        try:
+            conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=1)
+            conn.request("GET", "/views")
+            conn.getresponse().read()
+            conn.close()
+            return
+        except OSError:
+            if time.perf_counter() > stop_at:
+                raise
+            time.sleep(0.1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the drama JSON service.")
+    parser.add_argument("--url", default=f"http://{DEFAULT_HOST}:{DEFAULT_PORT}", help="where the service is listening")
+    parser.add_argument("--clients", type=int, default=DEFAULT_CLIENTS, help="client processes to run")
+    parser.add_argument("--seconds", type=float, default=DEFAULT_SECONDS, help="how long the test runs")
+    parser.add_argument("--conditional", action="store_true", help="send If-None-Match, like a polling dashboard")
+    parser.add_argument("--serve", metavar="DB", help="start drama_service.py on this database for the test")
+    args = parser.parse_args()
+
+    service = None
+    if args.serve:
+        url = urlsplit(args.url)
+        service = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "drama_service.py"),
+                                    "--db", args.serve, "--host", url.hostname, "--port", str(url.port or 80)])
+    try:
+        wait_for_service(args.url)
+        print_report(run_load_test(args.url, args.clients, args.seconds, args.conditional))
+    finally:
+        if service:
+            service.terminate()
+            service.wait()
@@ -0,0 +1,75 @@
+# Keeps the small lookup tables of the drama database in memory so labels and ids can be swapped without a query
+
+# For each kind of lookup: the table, its id column, its label column and how its choices are ordered
+LOOKUP_TABLES = {
+    "release": ("release_year", "release_id", "release", "release"),
+    "country": ("country", "country_id", "country", "country_id"),
+    "watched": ("watched", "watched_id", "watched", "watched_id"),
+}
+
+class LookupCache:
+    """
+    Loads release_year, country and watched once and serves id <-> label lookups
+    from dictionaries. Labels are always strings, so a release of 2023 is "2023".
+    The tables are loaded again when PRAGMA data_version shows another connection
+    has changed the database.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._data_version = None
+        self._ids = {}
+        self._labels = {}
+        self._choices = {}
+
+    def invalidate(self):
+        ''' Forgets the loaded tables so the next lookup reads them again '''
+        self._data_version = None
+
+    def _load(self):
+        ''' Reads all three lookup tables into the dictionaries '''
+        cursor = self.conn.cursor()
+        for kind, (table, id_column, label_column, order) in LOOKUP_TABLES.items():
+            cursor.execute(f"SELECT {id_column}, {label_column} FROM {table} ORDER BY {order}")
+            rows = [(row_id, str(label)) for row_id, label in cursor.fetchall()]
+            self._ids[kind] = {label: row_id for row_id, label in rows}
+            self._labels[kind] = {row_id: label for row_id, label in rows}
+            self._choices[kind] = [label for row_id, label in rows]
+
+    def _refresh(self):
+        ''' Reloads the tables if they were never loaded or the database has changed '''
+        data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version != self._data_version:
+            self._load()
+            self._data_version = data_version
+
+    def choices(self, kind):
+        ''' Returns the labels of one lookup table, in display order '''
+        self._refresh()
+        return list(self._choices[kind])
+
+    def id_for(self, kind, label):
+        ''' Returns the id for a label, or None if the label is not in the table '''
+        self._refresh()
+        return self._ids[kind].get(str(label))
+
+    def label_for(self, kind, row_id):
+        ''' Returns the label for an id, or None if the id is not in the table '''
+        self._refresh()
+        return self._labels[kind].get(row_id)
+
+    def add(self, kind, label):
+        """
+        Returns the id for a label, inserting it into its lookup table first if it
+        is new. The caller commits the insert along with the rest of its work.
+        """
+        row_id = self.id_for(kind, label)
+        if row_id is not None:
+            return row_id
+        table, id_column, label_column, order = LOOKUP_TABLES[kind]
+        cursor = self.conn.cursor()
+        cursor.execute(f"INSERT INTO {table} ({label_column}) VALUES (?) ON CONFLICT ({label_column}) DO NOTHING", (label,))
+        cursor.execute(f"SELECT {id_column} FROM {table} WHERE {label_column} = ?", (label,))
+        # Our own writes don't change data_version, so the tables are reloaded on the next lookup
+        self.invalidate()
+        return cursor.fetchone()[0]
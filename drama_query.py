@@ -0,0 +1,162 @@
+# One query engine for every drama filter, instead of a hard-coded view for every country, year, status and rating
+import re
+from collections import namedtuple
+
+# The columns every drama query returns
+FIELDS = ["drama_name", "release", "country", "episode", "watched", "rating"]
+
+# This is the SQL to connect to all the tables in the database
+TABLES = (" drama "
+          "LEFT JOIN country ON drama.country_id = country.country_id "
+          "LEFT JOIN release_year ON drama.release_id = release_year.release_id "
+          "LEFT JOIN watched ON drama.watched_id = watched.watched_id ")
+
+# The orders a query can be sorted in
+SORTS = {
+    "release": "release ASC",
+    "release_desc": "release DESC",
+    "rating_desc": "rating DESC",
+    "name": "drama_name ASC",
+}
+
+# A namedtuple rather than a dataclass, because importing dataclasses (and typing) would
+# add tens of milliseconds to the start of every script that runs a query
+QUERY_FIELDS = ["country", "year_from", "year_to", "status", "rating_min", "rating_max", "rating_below", "sort", "limit"]
+
+class DramaQuery(namedtuple("DramaQuery", QUERY_FIELDS, defaults=[None] * len(QUERY_FIELDS))):
+    """
+    A filter over the dramas. Every field left as None is not filtered on.
+    The year and rating ranges include both ends; rating_below excludes its value.
+    """
+    __slots__ = ()
+
+def compile_query(query):
+    """
+    Turns a DramaQuery into SQL with ? placeholders and the values to bind to them.
+    The labels are looked up in their small lookup tables and matched on the drama ids, so
+    SQLite can use the drama indexes. The SQL only depends on which filters are set,
+    so sqlite3's statement cache reuses the prepared statement for new values.
+    """
+    conditions = []
+    params = []
+    # A label names one row, so its id is compared with = and the index keeps rows in rating order
+    if query.country is not None:
+        conditions.append("drama.country_id = (SELECT country_id FROM country WHERE country = ? COLLATE NOCASE)")
+        params.append(query.country)
+    if query.year_from is not None or query.year_to is not None:
+        year_conditions = []
+        if query.year_from is not None:
+            year_conditions.append("release >= ?")
+            params.append(int(query.year_from))
+        if query.year_to is not None:
+            year_conditions.append("release <= ?")
+            params.append(int(query.year_to))
+        conditions.append("drama.release_id IN (SELECT release_id FROM release_year WHERE " + " AND ".join(year_conditions) + ")")
+    if query.status is not None:
+        conditions.append("drama.watched_id = (SELECT watched_id FROM watched WHERE watched = ? COLLATE NOCASE)")
+        params.append(query.status)
+    if query.rating_min is not None:
+        conditions.append("drama.rating >= ?")
+        params.append(query.rating_min)
+    if query.rating_max is not None:
+        conditions.append("drama.rating <= ?")
+        params.append(query.rating_max)
+    if query.rating_below is not None:
+        conditions.append("drama.rating < ?")
+        params.append(query.rating_below)
+
+    sql = "SELECT " + ", ".join(FIELDS) + " FROM " + TABLES
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    if query.sort is not None:
+        if query.sort not in SORTS:
+            raise ValueError(f"Unknown sort {query.sort!r}, expected one of {', '.join(SORTS)}")
+        sql += " ORDER BY " + SORTS[query.sort]
+    if query.limit is not None:
+        sql += " LIMIT ?"
+        params.append(int(query.limit))
+    return sql, tuple(params)
+
+def run_query(cursor, query):
+    ''' Runs a DramaQuery and returns its rows '''
+    sql, params = compile_query(query)
+    cursor.execute(sql, params)
+    return cursor.fetchall()
+
+# The named views in dramadatabase.db that are not a plain "Year N" or "Rating N"
+NAMED_QUERIES = {
+    "All information": DramaQuery(sort="release"),
+    "China Drama": DramaQuery(country="China", sort="release"),
+    "South Korea Dramas": DramaQuery(country="South Korea", sort="release"),
+    "Thailand Dramas": DramaQuery(country="Thailand", sort="release"),
+    "Philippines Dramas": DramaQuery(country="Philippines", sort="release"),
+    "Watched Status": DramaQuery(status="Watched", sort="release"),
+    "Dropped Status": DramaQuery(status="Dropped", sort="release"),
+    "On-Hold Status": DramaQuery(status="On-Hold", sort="release"),
+    "Plan on Watching Status": DramaQuery(status="Plan on Watching", sort="release"),
+    "Rating below 5": DramaQuery(rating_below=5, sort="release_desc"),
+    "Rating 5 and over": DramaQuery(rating_min=5, sort="release_desc"),
+    "Top 10 South Korean Drama": DramaQuery(country="South Korea", rating_max=10, sort="rating_desc", limit=10),
+    "Top 10 Chinese Drama": DramaQuery(country="China", rating_max=10, sort="rating_desc", limit=10),
+    "Top 10 Thailand Drama": DramaQuery(country="Thailand", rating_max=10, sort="rating_desc", limit=10),
+    "Top 10 Philippines Drama": DramaQuery(country="Philippines", rating_max=10, sort="rating_desc", limit=10),
+}
+
+def named_query(view_name):
+    """
+    Returns the DramaQuery that answers one of the named views ("Year 2023",
+    "Rating 7.5", "Top 10 Chinese Drama", ...), or None if the name is not known.
+    """
+    if view_name in NAMED_QUERIES:
+        return NAMED_QUERIES[view_name]
+    match = re.fullmatch(r"Year (\d+)", view_name)
+    if match:
+        year = int(match.group(1))
+        return DramaQuery(year_from=year, year_to=year)
+    match = re.fullmatch(r"Rating (\d+(?:\.5)?)", view_name)
+    if match:
+        rating = float(match.group(1))
+        return DramaQuery(rating_min=rating, rating_max=rating)
+    return None
+
+# The table each field comes from, for queries that join a lookup table twice
+FIELD_COLUMNS = {
+    "drama_name": "drama.drama_name",
+    "release": "release_year.release",
+    "country": "country.country",
+    "episode": "drama.episode",
+    "watched": "watched.watched",
+    "rating": "drama.rating",
+}
+
+# The groups a leaderboard can rank within: the lookup table, its id column and its label
+LEADERBOARD_GROUPS = {
+    "country": ("country", "country_id", "country"),
+    "release": ("release_year", "release_id", "release"),
+}
+
+def leaderboard_sql(by):
+    """
+    Returns the SQL for the top ? dramas of every country or release year, best rating first.
+    Each group's best rows are read straight off its (group, rating DESC, drama_name) index,
+    so only N rows per group are looked at, and ROW_NUMBER() numbers them in one pass.
+    Like the Top 10 views, ratings above 10 are left out.
+    """
+    if by not in LEADERBOARD_GROUPS:
+        raise ValueError(f"Unknown leaderboard {by!r}, expected one of {', '.join(LEADERBOARD_GROUPS)}")
+    table, id_col, label = LEADERBOARD_GROUPS[by]
+    return (f"SELECT grp.{label}, ROW_NUMBER() OVER (PARTITION BY drama.{id_col} "
+            "ORDER BY drama.rating DESC, drama.drama_name) AS place, "
+            + ", ".join(FIELD_COLUMNS[field] for field in FIELDS)
+            + f" FROM {table} AS grp "
+            f"JOIN drama ON drama.rowid IN (SELECT rowid FROM drama AS best WHERE best.{id_col} = grp.{id_col} "
+            "AND best.rating <= 10 ORDER BY best.rating DESC, best.drama_name LIMIT ?) "
+            "LEFT JOIN country ON drama.country_id = country.country_id "
+            "LEFT JOIN release_year ON drama.release_id = release_year.release_id "
+            "LEFT JOIN watched ON drama.watched_id = watched.watched_id "
+            f"ORDER BY grp.{label}, place")
+
+def leaderboard(cursor, by="country", n=10):
+    ''' Returns the top n dramas of every country (or release year) as (group, place, *FIELDS) rows '''
+    cursor.execute(leaderboard_sql(by), (int(n),))
+    return cursor.fetchall()
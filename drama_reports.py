@@ -0,0 +1,98 @@
+# Writes a report for every view in the drama database at once, spread over worker processes
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from tabulate import tabulate
+
+from drama_connection import connect
+from drama_repository import DB_NAME, DramaRepository
+
+# Where the reports go unless told otherwise
+DEFAULT_OUTDIR = "reports"
+
+# Each worker process opens one read-only connection and uses it for every view it is given
+worker_repository = None
+
+def open_worker(db_name):
+    ''' Runs once in each worker process, before it is given any views '''
+    global worker_repository
+    worker_repository = DramaRepository(connect(db_name, read_only=True))
+
+def report_path(outdir, view_name):
+    return os.path.join(outdir, view_name + ".txt")
+
+def write_report(view_name, outdir):
+    """
+    Renders one view the way dramapy's print_query does and writes it to its own file.
+    Returns (view name, rows, seconds, process id).
+    """
+    start = time.perf_counter()
+    headings, rows = worker_repository.view(view_name)
+    with open(report_path(outdir, view_name), "w", encoding="utf-8") as f:
+        f.write(tabulate(rows, headings))
+        f.write("\n")
+    return view_name, len(rows), time.perf_counter() - start, os.getpid()
+
+def view_names(db_name):
+    ''' Returns every view in the database, from sqlite_master '''
+    conn = connect(db_name, read_only=True)
+    try:
+        return [name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'view' ORDER BY name")]
+    finally:
+        conn.close()
+
+def write_reports(db_name=DB_NAME, outdir=DEFAULT_OUTDIR, workers=None, names=None):
+    """
+    Writes a report for each view (every view when names is None) in a pool of worker
+    processes, one per core when workers is None. Raises ValueError before anything is
+    written if a name is not a view. A view that fails doesn't stop the others.
+    Returns the timings in the order the reports finished, and (view name, error) for each view that failed.
+    """
+    all_names = view_names(db_name)
+    if names is None:
+        names = all_names
+    for view_name in names:
+        if view_name not in all_names:
+            raise ValueError(f"There is no view called {view_name}")
+    os.makedirs(outdir, exist_ok=True)
+    timings = []
+    failures = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=open_worker, initargs=(db_name,)) as pool:
+        futures = {pool.submit(write_report, view_name, outdir): view_name for view_name in names}
+        for future in as_completed(futures):
+            try:
+                timings.append(future.result())
+            except (sqlite3.Error, OSError) as e:
+                failures.append((futures[future], str(e)))
+    return timings, failures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a report file for every view in the drama database.")
+    parser.add_argument("views", nargs="*", help="only report on these views")
+    parser.add_argument("--db", default=DB_NAME, help="the database to report on")
+    parser.add_argument("--out", default=DEFAULT_OUTDIR, help="the folder the reports are written to")
+    parser.add_argument("--workers", type=int, help="worker processes (one per core if left out)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        sys.exit(f"There is no database called {args.db}")
+    started = time.perf_counter()
+    try:
+        timings, failures = write_reports(args.db, args.out, args.workers, args.views or None)
+    except ValueError as e:
+        sys.exit(str(e))
+    seconds = time.perf_counter() - started
+
+    print(tabulate([(view_name, rows, f"{view_seconds * 1000:.1f}", pid) for view_name, rows, view_seconds, pid in timings],
+                   ["view", "rows", "ms", "worker"]))
+    busy = sum(view_seconds for view_name, rows, view_seconds, pid in timings)
+    print(f"\nWrote {len(timings)} reports to {args.out} in {seconds:.2f}s "
+          f"({busy:.2f}s of work, {busy / seconds if seconds else 0:.1f}x parallel)")
+    for view_name, error in failures:
+        print(f"Could not write the report for {view_name}: {error}")
+    if failures:
+        sys.exit(1)
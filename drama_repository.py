@@ -0,0 +1,343 @@
+# The drama database without a user interface: setting it up, the show_* pages, adding dramas and the query engine.
+# It never imports easygui or tabulate, so scripts and batch jobs can use it without starting tkinter.
+import sqlite3
+from collections import namedtuple
+
+from db_indexes import create_indexes
+from drama_connection import connect, enable_wal
+from drama_lookup import LookupCache
+from drama_query import FIELDS, DramaQuery, leaderboard, named_query, run_query
+from drama_search import SEARCH_LIMIT, search_dramas, setup_search
+from drama_stats import drama_stats, setup_stats
+
+# This is the filename of the database to be used
+DB_NAME = 'dramadatabase.db'
+
+# These are the indexes setup_database keeps on the database, so the filters
+# and the views can look rows up instead of reading the whole drama table.
+# The (..., release_id, drama_name) composites let the show_* screens read one
+# page at a time in order. db_indexes.create_indexes keeps the database in step with them.
+DRAMA_INDEXES = {
+    "idx_release_year_release": "CREATE UNIQUE INDEX IF NOT EXISTS idx_release_year_release ON release_year (release)",
+    "idx_country_country": "CREATE UNIQUE INDEX IF NOT EXISTS idx_country_country ON country (country)",
+    "idx_watched_watched": "CREATE UNIQUE INDEX IF NOT EXISTS idx_watched_watched ON watched (watched)",
+    "idx_drama_release_name": "CREATE INDEX IF NOT EXISTS idx_drama_release_name ON drama (release_id, drama_name)",
+    "idx_drama_watched_release": "CREATE INDEX IF NOT EXISTS idx_drama_watched_release ON drama (watched_id, release_id, drama_name)",
+    "idx_drama_rating_release": "CREATE INDEX IF NOT EXISTS idx_drama_rating_release ON drama (rating, release_id, drama_name)",
+    "idx_drama_country_release_name": "CREATE INDEX IF NOT EXISTS idx_drama_country_release_name ON drama (country_id, release_id, drama_name)",
+    "idx_drama_country_rating_name": "CREATE INDEX IF NOT EXISTS idx_drama_country_rating_name ON drama (country_id, rating DESC, drama_name)",
+    "idx_drama_release_rating_name": "CREATE INDEX IF NOT EXISTS idx_drama_release_rating_name ON drama (release_id, rating DESC, drama_name)",
+}
+
+# How many dramas the show_* screens put on one page
+PAGE_SIZE = 100
+
+# These are the queries behind the show_* screens. Each one reads a single page of
+# one release year, after a given drama name, so it never touches more rows than it shows.
+SHOW_ALL_SQL = """
+    SELECT drama_name, release, country, episode, watched, rating
+        FROM drama
+        LEFT JOIN
+        release_year ON drama.release_id = release_year.release_id
+        LEFT JOIN
+        country ON drama.country_id = country.country_id
+        LEFT JOIN
+        watched ON drama.watched_id = watched.watched_id
+        WHERE drama.release_id IS ? AND drama_name > ?
+        ORDER BY drama_name
+        LIMIT ?
+"""
+
+SHOW_COUNTRY_SQL = """
+    SELECT drama_name, release, country, episode
+    FROM drama
+    LEFT JOIN release_year ON drama.release_id = release_year.release_id
+    LEFT JOIN country ON drama.country_id = country.country_id
+    WHERE drama.country_id = ? AND drama.release_id IS ? AND drama_name > ?
+    ORDER BY drama_name
+    LIMIT ?
+"""
+
+SHOW_YEAR_SQL = """
+    SELECT drama_name, release, country, episode, watched
+    FROM drama
+    LEFT JOIN
+    release_year ON drama.release_id = release_year.release_id
+    LEFT JOIN
+    country ON drama.country_id = country.country_id
+    LEFT JOIN
+    watched ON drama.watched_id = watched.watched_id
+    WHERE drama.release_id IS ? AND drama_name > ?
+    ORDER BY drama_name
+    LIMIT ?
+"""
+
+SHOW_WATCHED_SQL = """
+    SELECT drama_name, release, country, episode, watched
+    FROM drama
+    LEFT JOIN
+    release_year ON drama.release_id = release_year.release_id
+    LEFT JOIN
+    country ON drama.country_id = country.country_id
+    LEFT JOIN
+    watched ON drama.watched_id = watched.watched_id
+    WHERE drama.watched_id = ? AND drama.release_id IS ? AND drama_name > ?
+    ORDER BY drama_name
+    LIMIT ?
+"""
+
+SHOW_RATING_SQL = """
+    SELECT drama_name, rating, country, episode, watched, release
+    FROM drama
+    LEFT JOIN
+    release_year ON drama.release_id = release_year.release_id
+    LEFT JOIN
+    country ON drama.country_id = country.country_id
+    LEFT JOIN
+    watched ON drama.watched_id = watched.watched_id
+    WHERE drama.rating = ? AND drama.release_id IS ? AND drama_name > ?
+    ORDER BY drama_name
+    LIMIT ?
+"""
+
+# The page query behind each show_* screen
+SCREENS = {
+    "all": SHOW_ALL_SQL,
+    "country": SHOW_COUNTRY_SQL,
+    "year": SHOW_YEAR_SQL,
+    "watched": SHOW_WATCHED_SQL,
+    "rating": SHOW_RATING_SQL,
+}
+
+# These check that a country or year typed in is in the database
+COUNTRY_EXISTS_SQL = "SELECT 1 FROM country WHERE UPPER(country) = ?"
+YEAR_EXISTS_SQL = "SELECT 1 FROM release_year WHERE (release) = ?"
+
+# The release ids dramas have that are not in release_year. It steps from one release id to
+# the next on an index that starts with release_id, so it reads one entry per release id, not per drama.
+ORPHAN_RELEASES_SQL = """
+    WITH RECURSIVE release_ids (release_id) AS (
+        SELECT min(release_id) FROM drama
+        UNION ALL
+        SELECT (SELECT min(release_id) FROM drama WHERE release_id > release_ids.release_id)
+        FROM release_ids WHERE release_id IS NOT NULL
+    )
+    SELECT release_id FROM release_ids
+    WHERE release_id IS NOT NULL
+    AND release_id NOT IN (SELECT release_id FROM release_year)
+"""
+
+INSERT_DRAMA_SQL = """
+    INSERT INTO drama (drama_name, release_id, country_id, episode, watched_id, rating)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+def setup_database(db_name=DB_NAME):
+    """
+    Connects to the SQLite database and makes sure the drama tables, indexes,
+    search table and statistics table exist. If the database file doesn't exist,
+    SQLite will create it. Returns the connection and a cursor.
+    Raises sqlite3.Error if the database cannot be set up.
+    """
+    conn = connect(db_name)
+    try:
+        # Let dramapy.py and other readers keep reading while we write
+        enable_wal(conn)
+        cursor = conn.cursor()
+        # This prevents an error if you run the script multiple times.
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS release_year (
+            release_id INTEGER PRIMARY KEY,
+            release TEXT
+        );
+        ''')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS country (
+                country_id INTEGER PRIMARY KEY,
+                country TEXT
+            );
+        ''')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS watched (
+                watched_id INTEGER PRIMARY KEY,
+                watched TEXT
+            );
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS drama (
+                drama_name TEXT PRIMARY KEY,
+                release_id INTEGER,
+                country_id INTEGER,
+                episode INTEGER,
+                watched_id INTEGER,
+                rating INTEGER,
+                FOREIGN KEY (release_id) REFERENCES release_year (release_id),
+                FOREIGN KEY (country_id) REFERENCES country (country_id),
+                FOREIGN KEY (watched_id) REFERENCES watched (watched_id)
+            );
+        ''')
+
+        # Make sure the filter and sort columns are indexed
+        create_indexes(cursor, DRAMA_INDEXES)
+
+        # Make sure drama names can be searched
+        setup_search(cursor)
+
+        # Make sure the statistics table is there and kept up to date
+        setup_stats(cursor)
+
+        # Commit the changes to save the table creation to the database file.
+        conn.commit()
+    except sqlite3.Error:
+        conn.close()
+        raise
+    return conn, cursor
+
+def release_order(cursor, lookups):
+    """
+    Returns the release ids in the order the screens show them: dramas without a
+    release first (None), then any release ids that are not in release_year (they have
+    no year to show either), then every year from oldest to newest.
+    """
+    cursor.execute(ORPHAN_RELEASES_SQL)
+    return [None] + [row[0] for row in cursor.fetchall()] + [
+        lookups.id_for("release", release) for release in lookups.choices("release")]
+
+def fetch_page(cursor, sql, params, releases, after=None, page_size=PAGE_SIZE):
+    """
+    Fetches one page of a show_* query in (release, drama name) order.
+    The query is run for one release year at a time, starting after the key of the
+    last row on the previous page, until the page is full.
+    Returns the rows and the key to pass as after for the next page (None on the last page).
+    """
+    page = []
+    position, last_name = after or (0, "")
+    while position < len(releases) and len(page) <= page_size:
+        # Ask for one row more than fits, so we know whether there is a next page
+        cursor.execute(sql, params + (releases[position], last_name, page_size + 1 - len(page)))
+        page.extend((position, row) for row in cursor.fetchall())
+        position, last_name = position + 1, ""
+    next_after = None
+    if len(page) > page_size:
+        page = page[:page_size]
+        next_after = (page[-1][0], page[-1][1][0])
+    return [row for position, row in page], next_after
+
+# One drama as the query engine and the search return it
+Drama = namedtuple("Drama", FIELDS)
+
+class DramaRepository:
+    """
+    Everything the drama tools read and write, on one connection.
+    The query engine and the search return Drama records; the show_* pages,
+    leaderboards and statistics return plain rows.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.lookups = LookupCache(conn)
+
+    @classmethod
+    def open(cls, db_name=DB_NAME, read_only=False):
+        """
+        Opens a repository on a database file. A writable one is set up first;
+        a read-only one expects the database to have been set up already.
+        """
+        if read_only:
+            return cls(connect(db_name, read_only=True))
+        conn, cursor = setup_database(db_name)
+        return cls(conn)
+
+    def close(self):
+        ''' Closes the connection '''
+        self.conn.close()
+
+    def data_version(self):
+        ''' Returns a number that changes whenever another connection changes the database '''
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def choices(self, kind):
+        ''' Returns the release years, countries or watched statuses, in display order '''
+        return self.lookups.choices(kind)
+
+    def page(self, screen, value=None, after=None, page_size=PAGE_SIZE):
+        """
+        Returns one page of a show_* screen ("all", "country", "year", "watched" or "rating")
+        and the key to pass as after for the next page (None on the last page).
+        value is the country, year, status or rating the screen is filtered on.
+        An unknown year, country or status gives an empty page.
+        """
+        cursor = self.conn.cursor()
+        params = ()
+        if screen in ("year", "country", "watched"):
+            row_id = self.lookups.id_for("release" if screen == "year" else screen, value)
+            if row_id is None:
+                return [], None
+        if screen == "year":
+            # A year is a single release, so there is only one release id to page through
+            releases = [row_id]
+        else:
+            releases = release_order(cursor, self.lookups)
+        if screen in ("country", "watched"):
+            params = (row_id,)
+        elif screen == "rating":
+            params = (value,)
+        return fetch_page(cursor, SCREENS[screen], params, releases, after, page_size)
+
+    def add_drama(self, drama_name, release, country, episode, watched, rating):
+        """
+        Adds a drama and commits it. release, country and watched are labels that have to
+        be in their lookup tables already, otherwise ValueError says which one is missing.
+        Raises sqlite3.IntegrityError if a drama with that name is already there.
+        """
+        ids = []
+        for kind, label, name in (("release", release, "Release year"), ("country", country, "Country"),
+                                  ("watched", watched, "Watched status")):
+            row_id = self.lookups.id_for(kind, label)
+            if row_id is None:
+                raise ValueError(f"{name} not found in database.")
+            ids.append(row_id)
+        release_id, country_id, watched_id = ids
+        # The ids come from the lookup cache, so the insert is the only statement we run
+        with self.conn:
+            self.conn.execute(INSERT_DRAMA_SQL, (drama_name, release_id, country_id, episode, watched_id, rating))
+
+    def query(self, query: DramaQuery):
+        ''' Runs a DramaQuery and returns its dramas '''
+        return [Drama._make(row) for row in run_query(self.conn.cursor(), query)]
+
+    def view(self, view_name):
+        """
+        Returns (headings, rows) for one of the views. The named views are answered by
+        the query engine; any other view is read from the database.
+        """
+        query = named_query(view_name)
+        if query is not None:
+            return FIELDS, self.query(query)
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT * FROM \"" + view_name + "\"")
+        rows = cursor.fetchall()
+        return [column[0] for column in cursor.description], rows
+
+    def search(self, text, limit=SEARCH_LIMIT):
+        ''' Returns the dramas whose names best match a search, best match first '''
+        return [Drama._make(row) for row in search_dramas(self.conn.cursor(), text, limit)]
+
+    def leaderboard(self, by="country", n=10):
+        ''' Returns the top n dramas of every country or release year as (group, place, *FIELDS) rows '''
+        return leaderboard(self.conn.cursor(), by, n)
+
+    def stats(self, by="country"):
+        ''' Returns (label, dramas, average rating, total episodes) for every country, year or status '''
+        return drama_stats(self.conn.cursor(), by)
+
+    def country_exists(self, country):
+        ''' Returns True if the country is in the database, whatever its capitals '''
+        return self.conn.execute(COUNTRY_EXISTS_SQL, (country.upper(),)).fetchone() is not None
+
+    def year_exists(self, year):
+        ''' Returns True if the release year is in the database '''
+        return self.conn.execute(YEAR_EXISTS_SQL, (year,)).fetchone() is not None
@@ -0,0 +1,124 @@
+# Full-text search over drama names, backed by an FTS5 table that triggers keep in step with drama
+import re
+
+# How many matches a search returns
+SEARCH_LIMIT = 100
+
+# drama_fts indexes the names in drama_fts_docid (an external content table), with prefix
+# indexes so short prefix searches like "Lo*" stay fast. drama's primary key is TEXT, so its
+# rowids can change in a VACUUM or a dump and restore. drama_fts_docid gives every drama name
+# an INTEGER PRIMARY KEY instead, which keeps its value, and the triggers find a name's docid
+# through its UNIQUE index.
+SEARCH_SETUP = [
+    """
+    CREATE TABLE IF NOT EXISTS drama_fts_docid (
+        docid INTEGER PRIMARY KEY,
+        drama_name TEXT NOT NULL UNIQUE
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS drama_fts USING fts5(
+        drama_name,
+        content='drama_fts_docid',
+        content_rowid='docid',
+        prefix='2 3',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS drama_fts_insert AFTER INSERT ON drama BEGIN
+        INSERT INTO drama_fts_docid (drama_name) VALUES (new.drama_name);
+        INSERT INTO drama_fts (rowid, drama_name)
+            SELECT docid, drama_name FROM drama_fts_docid WHERE drama_name = new.drama_name;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS drama_fts_delete AFTER DELETE ON drama BEGIN
+        INSERT INTO drama_fts (drama_fts, rowid, drama_name)
+            SELECT 'delete', docid, drama_name FROM drama_fts_docid WHERE drama_name = old.drama_name;
+        DELETE FROM drama_fts_docid WHERE drama_name = old.drama_name;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS drama_fts_update AFTER UPDATE OF drama_name ON drama BEGIN
+        INSERT INTO drama_fts (drama_fts, rowid, drama_name)
+            SELECT 'delete', docid, drama_name FROM drama_fts_docid WHERE drama_name = old.drama_name;
+        UPDATE drama_fts_docid SET drama_name = new.drama_name WHERE drama_name = old.drama_name;
+        INSERT INTO drama_fts (rowid, drama_name)
+            SELECT docid, drama_name FROM drama_fts_docid WHERE drama_name = new.drama_name;
+    END
+    """,
+]
+
+# The triggers SEARCH_SETUP creates, dropped along with a search table from before drama_fts_docid
+SEARCH_TRIGGERS = ["drama_fts_insert", "drama_fts_delete", "drama_fts_update"]
+
+SEARCH_SQL = """
+    SELECT drama.drama_name, release, country, episode, watched, rating
+    FROM drama_fts
+    JOIN drama ON drama.drama_name = drama_fts.drama_name
+    LEFT JOIN release_year ON drama.release_id = release_year.release_id
+    LEFT JOIN country ON drama.country_id = country.country_id
+    LEFT JOIN watched ON drama.watched_id = watched.watched_id
+    WHERE drama_fts MATCH ?
+    ORDER BY rank
+    LIMIT ?
+"""
+
+def setup_search(cursor):
+    """
+    Creates the search tables and their triggers if they are missing.
+    A new search table is filled from the dramas that are already there. A search
+    table from before drama_fts_docid is dropped and made again.
+    """
+    cursor.execute("SELECT sql FROM sqlite_master WHERE name = 'drama_fts'")
+    row = cursor.fetchone()
+    exists = row is not None
+    if exists and "drama_fts_docid" not in row[0]:
+        cursor.execute("DROP TABLE drama_fts")
+        for trigger in SEARCH_TRIGGERS:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        exists = False
+    for sql in SEARCH_SETUP:
+        cursor.execute(sql)
+    if not exists:
+        rebuild_search(cursor)
+
+def rebuild_search(cursor):
+    ''' Refills the search tables from the drama table '''
+    cursor.execute("DELETE FROM drama_fts_docid")
+    cursor.execute("INSERT INTO drama_fts_docid (drama_name) SELECT drama_name FROM drama")
+    cursor.execute("INSERT INTO drama_fts (drama_fts) VALUES ('rebuild')")
+
+def find_search_mismatches(cursor):
+    """
+    Counts every name in the search tables and in the drama table.
+    Returns (drama_name, times in the search table, times in drama) for every name that differs.
+    """
+    cursor.execute("SELECT drama_name, count(*) FROM drama_fts GROUP BY drama_name")
+    kept = dict(cursor.fetchall())
+    cursor.execute("SELECT drama_name, count(*) FROM drama GROUP BY drama_name")
+    correct = dict(cursor.fetchall())
+    return [(name, kept.get(name, 0), correct.get(name, 0))
+            for name in sorted(kept.keys() | correct.keys(), key=str)
+            if kept.get(name, 0) != correct.get(name, 0)]
+
+def build_match(text):
+    """
+    Turns what the user typed into an FTS5 query. Every word has to match, and a word
+    ending in * matches as a prefix, so "love*" finds "Lovely Runner".
+    Returns None if there are no words to search for.
+    """
+    terms = []
+    for word, star in re.findall(r"(\w+)(\*?)", text):
+        # Quoting each word stops characters like - or : being read as FTS5 operators
+        terms.append('"' + word + '"' + star)
+    return " ".join(terms) if terms else None
+
+def search_dramas(cursor, text, limit=SEARCH_LIMIT):
+    ''' Returns the best matching dramas for a search, best match first '''
+    match = build_match(text)
+    if match is None:
+        return []
+    cursor.execute(SEARCH_SQL, (match, limit))
+    return cursor.fetchall()
@@ -0,0 +1,264 @@
+# A local HTTP service that answers the dramagui screens and the named views as JSON, for dashboards
+import argparse
+import json
+import socket
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from drama_cache import ResultCache
+from drama_connection import ConnectionManager, connect
+from drama_repository import DB_NAME, PAGE_SIZE, DramaRepository
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# How many requests are worked on at once, each on its own thread and connection
+DEFAULT_THREADS = 8
+# The most rows one page may ask for
+MAX_PAGE_SIZE = 1000
+# A keep-alive connection that sends nothing for this long is closed, so it gives its thread back.
+# It is kept short because an idle connection holds one of the pool's threads while it waits.
+IDLE_SECONDS = 1.0
+
+# The column names of each dramagui screen, in the order its page query returns them
+SCREEN_COLUMNS = {
+    "all": ["drama_name", "release", "country", "episode", "watched", "rating"],
+    "country": ["drama_name", "release", "country", "episode"],
+    "year": ["drama_name", "release", "country", "episode", "watched"],
+    "watched": ["drama_name", "release", "country", "episode", "watched"],
+    "rating": ["drama_name", "rating", "country", "episode", "watched", "release"],
+}
+
+class NotFound(Exception):
+    pass
+
+class BadRequest(Exception):
+    pass
+
+class Generation:
+    """
+    Tells every thread which version of the database it is looking at.
+    PRAGMA data_version only means something on the connection it was read from,
+    so all threads ask one shared connection instead of their own.
+    """
+
+    def __init__(self, db_name=DB_NAME):
+        self.conn = connect(db_name, read_only=True, check_same_thread=False)
+        # Part of every ETag, so a restarted service never hands out an old ETag again
+        self.started = time.time_ns()
+        self._lock = threading.Lock()
+
+    def current(self):
+        ''' Returns a number that changes whenever the database changes '''
+        with self._lock:
+            return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+class DramaService:
+    """
+    Answers GET paths with JSON bodies:
+        /dramas/all, /dramas/country/<country>, /dramas/year/<year>,
+        /dramas/watched/<status>, /dramas/rating/<rating>   one page of a dramagui screen
+            (?after=<next from the last page>&limit=<rows>)
+        /views                                               the names of the views
+        /views/<view name>                                   a whole view
+    Bodies are cached until the database changes, and every answer has an ETag.
+    """
+
+    def __init__(self, db_name=DB_NAME):
+        self.connections = ConnectionManager(db_name, read_only=True)
+        self.generation = Generation(db_name)
+        self.cache = ResultCache()
+        self._cache_lock = threading.Lock()
+        self._local = threading.local()
+
+    def repository(self):
+        ''' Returns this thread's repository, which keeps its lookup tables between requests '''
+        repository = getattr(self._local, "repository", None)
+        if repository is None:
+            repository = self._local.repository = DramaRepository(self.connections.connection())
+        return repository
+
+    def etag(self, generation):
+        return f'"{self.generation.started:x}-{generation}"'
+
+    def get(self, target, if_none_match=""):
+        """
+        Returns (etag, body) for a request target such as "/dramas/country/Japan?limit=20".
+        body is None when if_none_match already has the current ETag, so the client's copy is current.
+        Raises NotFound or BadRequest.
+        """
+        generation = self.generation.current()
+        if self.etag(generation) in if_none_match:
+            return self.etag(generation), None
+        with self._cache_lock:
+            body = self.cache.get(target, generation)
+        if body is None:
+            body = json.dumps(self.answer(target), separators=(",", ":")).encode("utf-8")
+            with self._cache_lock:
+                self.cache.put(target, body, generation, len(body))
+        return self.etag(generation), body
+
+    def answer(self, target):
+        ''' Works out the JSON document for a request target '''
+        url = urlsplit(target)
+        parts = [unquote(part) for part in url.path.strip("/").split("/")]
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        repository = self.repository()
+
+        if parts[0] == "dramas" and len(parts) >= 2 and parts[1] in SCREEN_COLUMNS:
+            screen = parts[1]
+            if (screen == "all") != (len(parts) == 2) or len(parts) > 3:
+                raise NotFound(url.path)
+            value = parts[2] if len(parts) == 3 else None
+            if screen == "rating":
+                value = to_number(value, "rating")
+            elif screen != "all" and value not in repository.choices("release" if screen == "year" else screen):
+                raise NotFound(f"No {screen} called {value}")
+            limit = int(to_number(query.get("limit", PAGE_SIZE), "limit"))
+            if not 0 < limit <= MAX_PAGE_SIZE:
+                raise BadRequest(f"limit has to be between 1 and {MAX_PAGE_SIZE}")
+            rows, next_after = repository.page(screen, value, parse_after(query.get("after")), limit)
+            return {
+                "columns": SCREEN_COLUMNS[screen],
+                "rows": rows,
+                "next": f"{next_after[0]}:{next_after[1]}" if next_after else None,
+            }
+
+        if parts == ["views"]:
+            cursor = repository.conn.execute("SELECT name FROM sqlite_master WHERE type = 'view' ORDER BY name")
+            return {"views": [name for (name,) in cursor.fetchall()]}
+
+        if parts[0] == "views" and len(parts) == 2:
+            exists = repository.conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'view' AND name = ?", (parts[1],))
+            if exists.fetchone() is None:
+                raise NotFound(f"No view called {parts[1]}")
+            columns, rows = repository.view(parts[1])
+            return {"columns": list(columns), "rows": rows}
+
+        raise NotFound(url.path)
+
+def to_number(value, name):
+    ''' Turns a path or query value into an int or float, or raises BadRequest '''
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise BadRequest(f"{name} has to be a number")
+    return int(number) if number.is_integer() else number
+
+def parse_after(after):
+    ''' Turns the "next" value of a page ("position:drama name") back into a page key '''
+    if after is None:
+        return None
+    position, colon, last_name = after.partition(":")
+    if not colon or not position.isdigit():
+        raise BadRequest("after has to be the next value of the previous page")
+    return int(position), last_name
+
+class DramaRequestHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so a dashboard polling the service doesn't open a connection every time
+    protocol_version = "HTTP/1.1"
+    timeout = IDLE_SECONDS
+    server_version = "DramaService/1.0"
+
+    def do_GET(self):
+        try:
+            etag, body = self.server.service.get(self.path, self.headers.get("If-None-Match", ""))
+        except NotFound as e:
+            return self.send_json(404, {"error": f"Not found: {e}"})
+        except BadRequest as e:
+            return self.send_json(400, {"error": str(e)})
+        except sqlite3.Error as e:
+            return self.send_json(500, {"error": f"A database error occurred: {e}"})
+
+        if body is None:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def end_headers(self):
+        # When connections are waiting for a thread, this one is closed after its answer
+        # rather than kept alive, so its thread goes to the next connection
+        if self.server.saturated():
+            self.send_header("Connection", "close")
+        super().end_headers()
+
+    def send_json(self, status, document):
+        body = json.dumps(document).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Logging every request to stderr would cost more than answering it
+        pass
+
+class PooledHTTPServer(HTTPServer):
+    ''' An HTTPServer that hands each connection to a fixed pool of threads '''
+
+    def __init__(self, address, service, threads=DEFAULT_THREADS):
+        self.service = service
+        self.threads = threads
+        self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="drama-service")
+        # How many connections are being served or waiting for a thread
+        self.open_connections = 0
+        self.open_lock = threading.Lock()
+        super().__init__(address, DramaRequestHandler)
+
+    def saturated(self):
+        ''' True if there are more open connections than threads, so some are waiting '''
+        return self.open_connections > self.threads
+
+    def process_request(self, request, client_address):
+        with self.open_lock:
+            self.open_connections += 1
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            with self.open_lock:
+                self.open_connections -= 1
+
+    def server_bind(self):
+        # Answers are small, so send them straight away instead of waiting to fill a packet
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        super().server_bind()
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the drama database as JSON on a local port.")
+    parser.add_argument("--db", default=DB_NAME, help="the database to serve")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="the address to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="the port to listen on")
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS, help="requests worked on at once")
+    args = parser.parse_args()
+
+    server = PooledHTTPServer((args.host, args.port), DramaService(args.db), args.threads)
+    print(f"Serving {args.db} on http://{args.host}:{args.port}/ with {args.threads} threads")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
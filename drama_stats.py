@@ -0,0 +1,109 @@
+# Drama statistics per country, release year and watched status, kept in a summary table that triggers keep in step with drama
+
+# The groups the statistics are kept for: the lookup table, the drama column and the label
+STATS_GROUPS = {
+    "country": ("country", "country_id", "country"),
+    "release": ("release_year", "release_id", "release"),
+    "watched": ("watched", "watched_id", "watched"),
+}
+
+# Dramas with no id for a group are counted under this id
+NO_GROUP = 0
+
+# The numbers kept for every group. rating_total and rated give the average rating,
+# because a drama without a rating should not pull the average down
+STATS_COLUMNS = ["dramas", "rated", "rating_total", "episodes"]
+
+def stats_values(row, sign):
+    ''' Returns one VALUES row per group that adds (sign 1) or takes away (sign -1) a drama row (new or old) '''
+    return ", ".join(
+        f"('{group}', COALESCE({row}.{id_col}, {NO_GROUP}), {sign}, {sign} * ({row}.rating IS NOT NULL), "
+        f"{sign} * COALESCE({row}.rating, 0), {sign} * COALESCE({row}.episode, 0))"
+        for group, (table, id_col, label) in STATS_GROUPS.items())
+
+# Adding the change onto the existing row means each trigger only touches one row per group
+STATS_UPSERT = ("INSERT INTO drama_stats (grouping, group_id, " + ", ".join(STATS_COLUMNS) + ") VALUES {values} "
+                "ON CONFLICT (grouping, group_id) DO UPDATE SET "
+                + ", ".join(f"{column} = {column} + excluded.{column}" for column in STATS_COLUMNS) + ";")
+
+STATS_SETUP = [
+    """
+    CREATE TABLE IF NOT EXISTS drama_stats (
+        grouping TEXT NOT NULL,
+        group_id INTEGER NOT NULL,
+        dramas INTEGER NOT NULL,
+        rated INTEGER NOT NULL,
+        rating_total REAL NOT NULL,
+        episodes INTEGER NOT NULL,
+        PRIMARY KEY (grouping, group_id)
+    ) WITHOUT ROWID
+    """,
+    "CREATE TRIGGER IF NOT EXISTS drama_stats_insert AFTER INSERT ON drama BEGIN "
+    + STATS_UPSERT.format(values=stats_values("new", 1)) + " END",
+    "CREATE TRIGGER IF NOT EXISTS drama_stats_delete AFTER DELETE ON drama BEGIN "
+    + STATS_UPSERT.format(values=stats_values("old", -1)) + " END",
+    "CREATE TRIGGER IF NOT EXISTS drama_stats_update "
+    "AFTER UPDATE OF release_id, country_id, watched_id, episode, rating ON drama BEGIN "
+    + STATS_UPSERT.format(values=stats_values("old", -1) + ", " + stats_values("new", 1)) + " END",
+]
+
+def stats_from_dramas_sql():
+    ''' Returns SQL that works out every group's numbers from the drama table itself '''
+    return " UNION ALL ".join(
+        f"SELECT '{group}', COALESCE({id_col}, {NO_GROUP}), COUNT(*), COUNT(rating), "
+        f"TOTAL(rating), TOTAL(episode) FROM drama GROUP BY COALESCE({id_col}, {NO_GROUP})"
+        for group, (table, id_col, label) in STATS_GROUPS.items())
+
+def setup_stats(cursor):
+    """
+    Creates the statistics table and its triggers if they are missing.
+    A new statistics table is filled from the dramas that are already there.
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'drama_stats'")
+    exists = cursor.fetchone()
+    for sql in STATS_SETUP:
+        cursor.execute(sql)
+    if not exists:
+        rebuild_stats(cursor)
+
+def rebuild_stats(cursor):
+    ''' Works out the statistics table again from the drama table '''
+    cursor.execute("DELETE FROM drama_stats")
+    cursor.execute("INSERT INTO drama_stats (grouping, group_id, " + ", ".join(STATS_COLUMNS) + ") "
+                   + stats_from_dramas_sql())
+
+def drama_stats(cursor, by="country"):
+    """
+    Returns (label, dramas, average rating, total episodes) for every country, release year
+    or watched status that has dramas. Only the summary rows are read, never the dramas.
+    """
+    if by not in STATS_GROUPS:
+        raise ValueError(f"Unknown statistics {by!r}, expected one of {', '.join(STATS_GROUPS)}")
+    table, id_col, label = STATS_GROUPS[by]
+    cursor.execute(f"""
+        SELECT {label}, dramas, ROUND(rating_total / NULLIF(rated, 0), 2), CAST(episodes AS INTEGER)
+        FROM drama_stats
+        LEFT JOIN {table} ON {table}.{id_col} = drama_stats.group_id
+        WHERE grouping = ? AND dramas > 0
+        ORDER BY {label}
+    """, (by,))
+    return cursor.fetchall()
+
+def find_stats_mismatches(cursor):
+    """
+    Works the statistics out from scratch and compares them with the statistics table.
+    Returns (grouping, group_id, kept numbers, correct numbers) for every group that differs.
+    """
+    cursor.execute("SELECT grouping, group_id, " + ", ".join(STATS_COLUMNS) + " FROM drama_stats WHERE dramas != 0")
+    kept = {row[:2]: row[2:] for row in cursor.fetchall()}
+    cursor.execute(stats_from_dramas_sql())
+    correct = {row[:2]: row[2:] for row in cursor.fetchall()}
+
+    mismatches = []
+    for key in sorted(kept.keys() | correct.keys()):
+        kept_numbers = kept.get(key, (0, 0, 0, 0))
+        correct_numbers = correct.get(key, (0, 0, 0, 0))
+        # The rating totals are floats, so they are compared after rounding
+        if [round(n, 6) for n in kept_numbers] != [round(n, 6) for n in correct_numbers]:
+            mismatches.append((*key, kept_numbers, correct_numbers))
+    return mismatches
@@ -3,64 +3,17 @@ import sqlite3
 from tabulate import tabulate
 import easygui as eg
 
-# This is the filename of the database to be used
-DB_NAME = 'dramadatabase.db'
-def setup_database():
+import drama_repository
+from drama_repository import DB_NAME, DramaRepository
+
+def setup_database(db_name=DB_NAME):
     """
-    Connects to the SQLite database and ensures the contacts table exists.
+    Connects to the SQLite database and ensures the drama tables exist.
     If the database file doesn't exist, SQLite will create it.
     This function returns the connection and cursor objects for later use.
     """
     try:
-        # Connect to the database file named 'contacts.db'.
-        # This will create the file if it doesn't exist.
-        conn = sqlite3.connect('dramadatabase.db')
-       
-        # Create a cursor object to execute SQL commands.
-        cursor = conn.cursor()
-       
-        # This prevents an error if you run the script multiple times.
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS release_year (
-            release_id INTEGER PRIMARY KEY,
-            release TEXT
-        );
-        ''')
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS country (
-                country_id INTEGER PRIMARY KEY,
-                country TEXT
-            );
-        ''')
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS watched (
-                watched_id INTEGER PRIMARY KEY,
-                watched TEXT
-            );
-        ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS drama (
-                drama_name TEXT PRIMARY KEY,
-                release_id INTEGER,
-                country_id INTEGER,
-                episode INTEGER,
-                watched_id INTEGER,
-                rating INTEGER,
-                FOREIGN KEY (release_id) REFERENCES release_year (release_id),
-                FOREIGN KEY (country_id) REFERENCES country (country_id),
-                FOREIGN KEY (watched_id) REFERENCES watched (watched_id)
-            );
-        ''')
-         
-        # Commit the changes to save the table creation to the database file.
-        conn.commit()
-       
-        # Return the connection and cursor for use in other functions.
-        return conn, cursor
-       
+        return drama_repository.setup_database(db_name)
     except sqlite3.Error as e:
         # Use EasyGui to show an error message if the database connection fails.
         eg.exceptionbox(msg=f"A database error occurred: {e}", title="Database Error")
@@ -84,193 +37,140 @@ def print_query(view_name:str):
     print(tabulate(results,headings))
     db.close()
 
-def show_all (cursor): #this shows everything the database has
-    try:
-        cursor.execute("""
-            SELECT drama_name, release, country, episode, watched, rating
-                FROM drama
-                LEFT JOIN
-                release_year ON drama.release_id = release_year.release_id
-                LEFT JOIN
-                country ON drama.country_id = country.country_id
-                LEFT JOIN
-                watched ON drama.watched_id = watched.watched_id
-                ORDER BY release ASC
-        """)
-        rows = cursor.fetchall() #this fetches the information
-        if not rows:
-            eg.msgbox("No dramas found in the database.", "Drama List")
-            return
+def format_rows(rows, headers, col_widths):
+    ''' Lines up the rows of one page under the headers '''
+    header_row = "".join(h.ljust(col_widths[i]) for i, h in enumerate(headers))
+    line = "-" * sum(col_widths)
 
-        col_widths = [40, 8, 15, 10, 20, 8]  #this is technically a format on how the information would appear
-        headers = ["Drama", "Rating", "Country", "Episodes", "Watched", "Release"]
+    formatted_rows = []
+    for row in rows:
+        formatted_row = "".join(str(col)[:col_widths[i]-1].ljust(col_widths[i]) for i, col in enumerate(row))
+        formatted_rows.append(formatted_row)
+
+    return f"{header_row}\n{line}\n" + "\n".join(formatted_rows)
 
-        header_row = "".join(h.ljust(col_widths[i]) for i, h in enumerate(headers))
-        line = "-" * sum(col_widths)
+def show_pages(repository, screen, value, headers, col_widths, msg, title, empty_msg, empty_title):
+    """
+    Shows a show_* query one page at a time with Next and Previous buttons.
+    Only the page on screen is fetched and formatted.
+    """
+    pages = [None] #the key each visited page starts after, so Previous can go back
+    while True:
+        rows, next_after = repository.page(screen, value, pages[-1])
+        if not rows and len(pages) == 1:
+            eg.msgbox(empty_msg, empty_title)
+            return
 
-        formatted_rows = []
-        for row in rows:
-            formatted_row = "".join(str(col)[:col_widths[i]-1].ljust(col_widths[i]) for i, col in enumerate(row))
-            formatted_rows.append(formatted_row)
+        eg.codebox(f"{msg} (page {len(pages)})", title, format_rows(rows, headers, col_widths))
 
-        output = f"{header_row}\n{line}\n" + "\n".join(formatted_rows)
+        choices = []
+        if len(pages) > 1:
+            choices.append("Previous")
+        if next_after:
+            choices.append("Next")
+        if not choices: #everything fitted on one page
+            return
+        choices.append("Close")
+        move = eg.buttonbox(f"You are on page {len(pages)}.", title, choices=choices)
+        if move == "Next":
+            pages.append(next_after)
+        elif move == "Previous":
+            pages.pop()
+        else:
+            return
 
-        eg.codebox(f"All the Dramas {show_all}", "All the Dramas", output)
+def show_all (repository): #this shows everything the database has
+    try:
+        col_widths = [40, 8, 15, 10, 20, 8]  #this is technically a format on how the information would appear
+        headers = ["Drama", "Rating", "Country", "Episodes", "Watched", "Release"]
+        show_pages(repository, "all", None, headers, col_widths,
+                   "All the Dramas", "All the Dramas",
+                   "No dramas found in the database.", "Drama List")
 
     except sqlite3.Error as e: #this gets displayed if the database somehow breaks
         eg.exceptionbox(msg=f"Failed to retrieve dramas: {e}", title="Database Error")
 
-def show_country(cursor, country_choice):
+def show_country(repository, country_choice):
     try:
-        cursor.execute("""
-            SELECT drama_name, release, country, episode
-            FROM drama
-            LEFT JOIN release_year ON drama.release_id = release_year.release_id
-            LEFT JOIN country ON drama.country_id = country.country_id
-            WHERE country = ?
-            ORDER BY release ASC
-        """, (country_choice,)) #this lets us choose which country the user wants to see
-        rows = cursor.fetchall()
-
-        if not rows: #this is so if there are no dramas this is shown from the said country
-            eg.msgbox(f"No dramas found from {country_choice}.", "Country Results")
-            return
-
         col_widths = [45, 8, 15, 10]  
         headers = ["Drama", "Release", "Country", "Episodes"]
-
-        header_row = "".join(h.ljust(col_widths[i]) for i, h in enumerate(headers))
-        line = "-" * sum(col_widths)
-
-        formatted_rows = []
-        for row in rows:
-            formatted_row = "".join(str(col)[:col_widths[i]-1].ljust(col_widths[i]) for i, col in enumerate(row))
-            formatted_rows.append(formatted_row)
-
-        output = f"{header_row}\n{line}\n" + "\n".join(formatted_rows)
-
-        eg.codebox(f"Dramas that are from {country_choice}", "Country", output)
+        #this lets us choose which country the user wants to see
+        show_pages(repository, "country", country_choice, headers, col_widths, f"Dramas that are from {country_choice}", "Country",
+                   f"No dramas found from {country_choice}.", "Country Results") #this is shown if there are no dramas from the said country
 
     except sqlite3.Error as e:
         eg.exceptionbox(msg=f"Failed to retrieve dramas: {e}", title="Database Error")
 
-def show_year(cursor, year_choice):
+def show_year(repository, year_choice):
     try:
-        cursor.execute("""
-            SELECT drama_name, release, country, episode, watched
-            FROM drama
-            LEFT JOIN
-            release_year ON drama.release_id = release_year.release_id
-            LEFT JOIN
-            country ON drama.country_id = country.country_id
-            LEFT JOIN
-            watched ON drama.watched_id = watched.watched_id
-            WHERE release = ?
-        """, (year_choice,))
-        rows = cursor.fetchall()
-        if not rows:
-            eg.msgbox(f"No dramas found from year {year_choice}.", "Year Results")
-            return
         col_widths = [35, 8, 20, 8, 10]  
         headers = ["Drama", "Release", "Country", "Episodes", "Watched"]
-
-        header_row = "".join(h.ljust(col_widths[i]) for i, h in enumerate(headers))
-        line = "-" * sum(col_widths)
-
-        formatted_rows = []
-        for row in rows:
-            formatted_row = "".join(str(col)[:col_widths[i]-1].ljust(col_widths[i]) for i, col in enumerate(row))
-            formatted_rows.append(formatted_row)
-
-        output = f"{header_row}\n{line}\n" + "\n".join(formatted_rows)
-
-        eg.codebox(f"Dramas that are from {year_choice}", "Years", output)
+        show_pages(repository, "year", year_choice, headers, col_widths,
+                   f"Dramas that are from {year_choice}", "Years",
+                   f"No dramas found from year {year_choice}.", "Year Results")
 
     except sqlite3.Error as e:
         eg.exceptionbox(msg=f"Failed to retrieve dramas: {e}", title="Database Error")
 
-def show_watched(cursor, watched_choice):
+def show_watched(repository, watched_choice):
     try:
-        cursor.execute("""
-            SELECT drama_name, release, country, episode, watched
-            FROM drama
-            LEFT JOIN
-            release_year ON drama.release_id = release_year.release_id
-            LEFT JOIN
-            country ON drama.country_id = country.country_id
-            LEFT JOIN
-            watched ON drama.watched_id = watched.watched_id
-            WHERE watched = ?
-            ORDER BY release ASC
-        """, (watched_choice,))
-        rows = cursor.fetchall()
-        if not rows:
-            eg.msgbox(f"No dramas found with status {watched_choice}.", "Status Results")
-            return
         col_widths = [35, 8, 20, 10, 14]  
         headers = ["Drama", "Rating", "Country", "Episodes", "Watched"]
-
-        header_row = "".join(h.ljust(col_widths[i]) for i, h in enumerate(headers))
-        line = "-" * sum(col_widths)
-
-        formatted_rows = []
-        for row in rows:
-            formatted_row = "".join(str(col)[:col_widths[i]-1].ljust(col_widths[i]) for i, col in enumerate(row))
-            formatted_rows.append(formatted_row)
-
-        output = f"{header_row}\n{line}\n" + "\n".join(formatted_rows)
-
-        eg.codebox(f"Dramas you {watched_choice}", "Watched Status Results", output)
+        show_pages(repository, "watched", watched_choice, headers, col_widths, f"Dramas you {watched_choice}", "Watched Status Results",
+                   f"No dramas found with status {watched_choice}.", "Status Results")
     except sqlite3.Error as e:
         eg.exceptionbox(msg=f"Failed to retrieve dramas: {e}", title="Database Error")
 
-def show_rating(cursor, rating_choice):
+def show_rating(repository, rating_choice):
     try:
-        cursor.execute("""
-            SELECT drama_name, rating, country, episode, watched, release
-            FROM drama
-            LEFT JOIN
-            release_year ON drama.release_id = release_year.release_id
-            LEFT JOIN
-            country ON drama.country_id = country.country_id
-            LEFT JOIN
-            watched ON drama.watched_id = watched.watched_id
-            WHERE rating = ?
-        """, (rating_choice,))
-        rows = cursor.fetchall()
-        if not rows:
-            eg.msgbox(f"No dramas found with rating {rating_choice}.", "Rating Results")
-            return
         col_widths = [40, 8, 15, 10, 20, 8]  
         headers = ["Drama", "Rating", "Country", "Episodes", "Watched", "Release"]
+        show_pages(repository, "rating", rating_choice, headers, col_widths,
+                   f"Dramas with rating {rating_choice}", "Rating Results",
+                   f"No dramas found with rating {rating_choice}.", "Rating Results")
 
-        header_row = "".join(h.ljust(col_widths[i]) for i, h in enumerate(headers))
-        line = "-" * sum(col_widths)
+    except sqlite3.Error as e:
+        eg.exceptionbox(msg=f"Failed to retrieve dramas: {e}", title="Database Error")
 
-        formatted_rows = []
-        for row in rows:
-            formatted_row = "".join(str(col)[:col_widths[i]-1].ljust(col_widths[i]) for i, col in enumerate(row))
-            formatted_rows.append(formatted_row)
+def show_search(repository):
+    search_text = eg.enterbox("Enter part of a drama name (end a word with * to match the start of it):", "Search")
+    if not search_text:
+        return
+    try:
+        rows = repository.search(search_text)
+        if not rows:
+            eg.msgbox(f"No dramas found matching {search_text}.", "Search Results")
+            return
+        col_widths = [40, 8, 15, 10, 20, 8]
+        headers = ["Drama", "Release", "Country", "Episodes", "Watched", "Rating"]
+        eg.codebox(f"Dramas matching {search_text}", "Search Results", format_rows(rows, headers, col_widths))
 
-        output = f"{header_row}\n{line}\n" + "\n".join(formatted_rows)
+    except sqlite3.Error as e:
+        eg.exceptionbox(msg=f"Failed to search dramas: {e}", title="Database Error")
 
-        eg.codebox(f"Dramas with rating {rating_choice}", "Rating Results", output)
+def show_stats(repository, by, title):
+    try:
+        rows = repository.stats(by)
+        if not rows:
+            eg.msgbox("No dramas to count yet.", "Statistics")
+            return
+        col_widths = [20, 10, 16, 16]
+        headers = [title, "Dramas", "Average Rating", "Total Episodes"]
+        eg.codebox(f"Dramas by {title.lower()}", "Statistics", format_rows(rows, headers, col_widths))
 
     except sqlite3.Error as e:
-        eg.exceptionbox(msg=f"Failed to retrieve dramas: {e}", title="Database Error")
+        eg.exceptionbox(msg=f"Failed to load statistics: {e}", title="Database Error")
 
-def add_drama(cursor, conn):
+def add_drama(repository):
     drama_name = eg.enterbox("Enter drama name:", "Add Drama")
     if not drama_name:
         return
 
-    release_years = [str(y) for y in range(2010, 2030)]
-    release = eg.choicebox("Select release year:", "Add Drama", choices=release_years)
+    release = eg.choicebox("Select release year:", "Add Drama", choices=repository.choices("release"))
     if not release:
         return
 
-    countries = ["China", "South Korea", "Philippines", "Thailand","Japan"]
-    country = eg.choicebox("Select country:", "Add Drama", choices=countries)
+    country = eg.choicebox("Select country:", "Add Drama", choices=repository.choices("country"))
     if not country:
         return
 
@@ -278,8 +178,7 @@ def add_drama(cursor, conn):
     if episode is None:
         return
 
-    watched_statuses = ["Watched", "Plan on Watching", "On-Hold", "Dropped"]
-    watched = eg.choicebox("Select watched status:", "Add Drama", choices=watched_statuses)
+    watched = eg.choicebox("Select watched status:", "Add Drama", choices=repository.choices("watched"))
     if not watched:
         return
 
@@ -287,31 +186,11 @@ def add_drama(cursor, conn):
     if rating is None:
         return
 
-    cursor.execute("SELECT release_id FROM release_year WHERE release = ?", (release,))
-    release_id = cursor.fetchone()
-    if not release_id:
-        eg.msgbox("Release year not found in database.", "Error")
-        return
-
-    cursor.execute("SELECT country_id FROM country WHERE country = ?", (country,))
-    country_id = cursor.fetchone()
-    if not country_id:
-        eg.msgbox("Country not found in database.", "Error")
-        return
-
-    cursor.execute("SELECT watched_id FROM watched WHERE watched = ?", (watched,))
-    watched_id = cursor.fetchone()
-    if not watched_id:
-        eg.msgbox("Watched status not found in database.", "Error")
-        return
-
     try:
-        cursor.execute("""
-            INSERT INTO drama (drama_name, release_id, country_id, episode, watched_id, rating)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (drama_name, release_id[0], country_id[0], episode, watched_id[0], rating))
-        conn.commit()
+        repository.add_drama(drama_name, release, country, episode, watched, rating)
         eg.msgbox("Drama added successfully!", "Success")
+    except ValueError as e:
+        eg.msgbox(str(e), "Error")
     except sqlite3.Error as e:
         eg.exceptionbox(msg=f"Failed to add drama: {e}", title="Database Error")
 
@@ -321,40 +200,52 @@ if __name__ == "__main__":
     if not conn:
         exit()
 
+    repository = DramaRepository(conn) #this keeps the years, countries and statuses in memory
+
     while True:
         choice = eg.buttonbox(
             "Welcome to the Drama Database what would you like to do?",
             "Main Menu",
-            choices=["Show all drama","Country","Year","Watched Status","Rating","Add Drama","Exit"] #the choices the user can make
+            choices=["Show all drama","Country","Year","Watched Status","Rating","Search","Statistics","Add Drama","Exit"] #the choices the user can make
         )
         if choice == "Show all drama":
-            show_all(cursor)
+            show_all(repository)
+        elif choice == "Search":
+            show_search(repository)
+        elif choice == "Statistics":
+            stats_choice = eg.buttonbox(
+                "What would you like the dramas counted by?",
+                "Statistics",
+                choices=["Country", "Year", "Watched Status"]
+            )
+            if stats_choice:
+                show_stats(repository, {"Country": "country", "Year": "release", "Watched Status": "watched"}[stats_choice], stats_choice)
         elif choice == "Add Drama":
-            add_drama(cursor, conn)
+            add_drama(repository)
         elif choice == "Country":
             country_choice = eg.buttonbox(
                 "Pick a country to see:",
                 "Country",
-                choices=["China" , "South Korea" , "Philippines" , "Thailand", "Japan"]
+                choices=repository.choices("country")
             )
             if country_choice:
-                show_country(cursor, country_choice)
+                show_country(repository, country_choice)
         elif choice == "Year":
             year_choice = eg.choicebox(
                 "Choose a year to see:",
                 "Year",
-                choices=[str(i) for i in range(2010, 2030)]
+                choices=repository.choices("release")
             )
             if year_choice:
-                show_year(cursor, year_choice)
+                show_year(repository, year_choice)
         elif choice == "Watched Status":
             watched_choice = eg.buttonbox(
                 "Choose a status to see:",
                 "Watched Status",
-                choices=["Watched","Plan on Watching" , "On-Hold" , "Dropped"]
+                choices=repository.choices("watched")
             )
             if watched_choice:
-                show_watched(cursor, watched_choice)
+                show_watched(repository, watched_choice)
         elif choice == "Rating":
             rating_choice = eg.buttonbox(
                 "Pick a rating",
@@ -362,7 +253,7 @@ if __name__ == "__main__":
                 choices=[str(i) for i in range(1, 11)] 
             )
             if rating_choice:
-                show_rating(cursor, int(rating_choice))
+                show_rating(repository, int(rating_choice))
         elif choice == "Exit":
             eg.msgbox("Thank you for using Drama Database")
             break
\ No newline at end of file
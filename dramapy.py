@@ -1,117 +1,181 @@
 # Import the libraries to connect to the database and present the information in tables
 import sqlite3
 from tabulate import tabulate
-import easygui as eg
+from drama_cache import ResultCache
+from drama_connection import ConnectionManager
+from drama_export import FORMATS, export, print_report
+from drama_query import FIELDS, DramaQuery, named_query
+from drama_repository import DB_NAME, DramaRepository
 
-# This is the filename of the database to be used
-DB_NAME = 'dramadatabase.db'
+# This hands out one long-lived, read-only connection instead of connecting for every query
+connections = ConnectionManager(DB_NAME, read_only=True)
+# This keeps the printed views so repeated menu choices come from memory
+view_cache = ResultCache()
 
-def print_parameter_query(fields:str, where:str, parameter):
+def repository():
+    ''' Returns a repository on this thread's read-only connection '''
+    return DramaRepository(connections.connection())
+
+def print_parameter_query(query:DramaQuery):
     """ Prints the results for a parameter query in tabular form. """
-    db = sqlite3.connect('dramadatabase.db')
-    cursor = db.cursor()
-    sql = ("SELECT " + fields + " FROM " + TABLES + " WHERE " + where)
-    cursor.execute(sql,(parameter,))
-    results = cursor.fetchall()
-    print(tabulate(results,fields.split(",")))
-    db.close()  
+    dramas = repository()
+    # The cached table is only reused while nothing in the database has changed
+    data_version = dramas.data_version()
+    table = view_cache.get(query, data_version)
+    if table is None:
+        table = tabulate(dramas.query(query),FIELDS)
+        view_cache.put(query, table, data_version)
+    print(table)
 
 def print_query(view_name:str):
     ''' Prints the specified view from the database in a table '''
-    # Set up the connection to the database
-    db = sqlite3.connect(DB_NAME)
-    cursor = db.cursor()
-    # Get the results from the view
-    sql = "SELECT * FROM '" + view_name + "'"
-    cursor.execute(sql)
-    results = cursor.fetchall()
-    # Get the field names to use as headings
-    field_names = "SELECT name from pragma_table_info('" + view_name + "') AS tblInfo"
-    cursor.execute(field_names)
-    headings = list(sum(cursor.fetchall(),()))
-    # Print the results in a table with the headings
-    print(tabulate(results,headings))
-    db.close()
+    # The named views are all answered by the query engine
+    query = named_query(view_name)
+    if query is not None:
+        print_parameter_query(query)
+        return
+    # Any other view is read from the database
+    dramas = repository()
+    data_version = dramas.data_version()
+    table = view_cache.get(view_name, data_version)
+    if table is None:
+        # Put the results in a table with the headings
+        headings, results = dramas.view(view_name)
+        table = tabulate(results,headings)
+        view_cache.put(view_name, table, data_version)
+    print(table)
 
-TABLES = (" drama "
-           "LEFT JOIN country ON drama.country_id = country.country_id "
-           "LEFT JOIN release_year ON drama.release_id = release_year.release_id "
-           "LEFT JOIN watched ON drama.watched_id = watched.watched_id ")
+def print_leaderboard(by:str, n:int):
+    """ Prints the top n dramas of every country or release year in one table. """
+    dramas = repository()
+    data_version = dramas.data_version()
+    key = ("leaderboard", by, n)
+    table = view_cache.get(key, data_version)
+    if table is None:
+        table = tabulate(dramas.leaderboard(by, n), [by, "place"] + FIELDS)
+        view_cache.put(key, table, data_version)
+    print(table)
 
+def print_stats(by:str):
+    """ Prints the number of dramas, average rating and total episodes for each group. """
+    try:
+        results = repository().stats(by)
+    except sqlite3.OperationalError:
+        print("Statistics are not set up yet. Please open dramagui.py once to set them up.")
+        return
+    print(tabulate(results, [by, "dramas", "average rating", "total episodes"]))
 
+def export_view(view_name:str, file_format:str):
+    """ Writes a view to a file in the current folder a chunk at a time, instead of printing it. """
+    path = view_name + FORMATS[file_format][0]
+    try:
+        print_report(export(connections.connection(), path, file_format, view_name=view_name))
+    except ValueError as e:
+        print(f"Sorry. {e}.")
 
-menu_option = ''
-while menu_option != 'DONE':
-    menu_option = input('\nWelcome to my drama database \n\n'
-                        'This menu contains information about drama:\n'
-                        '   - Names of dramas\n'
-                        '   - Dramas from countries [South Korea, Philippines, Thailand, China]\n'
-                        '   - Drama Ratings\n'
-                        '   - Drama released 2013 - upcoming\n'
-                        '   - Status of Drama\n\n'
-                        'Please enter a letter that is from A to navigate through the menu.\n'
-                        "Please type 'Exit' to exit the database\n"
-                        'A  -   View all information\n'
-                        'B  -   Search for dramas from countries available\n'
-                        'C  -   Search for years certain dramas were aired\n'
-                        'D  -   Print out ratings below 5\n'
-                        'E  -   Print out ratings 5 and above\n'
-                        'F  -   Top 10 South Korean Drama\n'
-                        'G  -   Top 10 Chinese Drama\n'
-                        'H  -   Top 10 Thailand Drama\n'
-                        'I  -   Top 10 Philippines Drama\n'
-                        'Done   -   Bye Bye\n\n'
-                        "Where would you like to go? ")
-    menu_option = menu_option.upper()
-    if menu_option == 'A':
-        print_query('All information')
-    elif menu_option == 'B':
-        print("Here are the available countries to search from:\n"
-            "   -   China\n"
-            "   -   South Korea\n"
-            "   -   Philippines\n"
-            "   -   Thailand\n")
-        while True:
-            drama_country = input('Which country would you like to see? ')
-            drama_country = drama_country.capitalize()
-            db = sqlite3.connect(DB_NAME)
-            cursor = db.cursor()
-            cursor.execute("SELECT 1 FROM country WHERE UPPER(country) = ?", (drama_country.upper(),))
-            exists = cursor.fetchone()
-            db.close()
-            if exists:
-                print_parameter_query("drama_name, release, country, episode, watched, rating", "country = ? ORDER BY release DESC", drama_country)
-                break
-            else:
-                print("Sorry unable to find country. Please check for the spelling")
-    elif menu_option == 'C':
-        print("Here are the available countries to search from:\n"
-            "   -   0 [upcoming] , 2010 to 2025\n")
-        while True:
-            drama_year = input('Which year would you like to see? ')
-            db = sqlite3.connect(DB_NAME)
-            cursor = db.cursor()
-            cursor.execute("SELECT 1 FROM release_year WHERE (release) = ?", (drama_year,))
-            exists = cursor.fetchone()
-            db.close()
-            if exists:
-                print_parameter_query("drama_name, release, country, episode, watched, rating", "release = ? ORDER BY release DESC", drama_year)
-                break
+def ask_top_n():
+    ''' Asks how many dramas each leaderboard should show '''
+    while True:
+        top_n = input('How many dramas would you like to see for each? ')
+        if top_n.strip().isdigit() and int(top_n) > 0:
+            return int(top_n)
+        print("Sorry that is not a number. Please type a whole number above 0.")
+
+if __name__ == "__main__":
+    menu_option = ''
+    while menu_option != 'DONE':
+        menu_option = input('\nWelcome to my drama database \n\n'
+                            'This menu contains information about drama:\n'
+                            '   - Names of dramas\n'
+                            '   - Dramas from countries [South Korea, Philippines, Thailand, China]\n'
+                            '   - Drama Ratings\n'
+                            '   - Drama released 2013 - upcoming\n'
+                            '   - Status of Drama\n\n'
+                            'Please enter a letter that is from A to navigate through the menu.\n'
+                            "Please type 'Exit' to exit the database\n"
+                            'A  -   View all information\n'
+                            'B  -   Search for dramas from countries available\n'
+                            'C  -   Search for years certain dramas were aired\n'
+                            'D  -   Print out ratings below 5\n'
+                            'E  -   Print out ratings 5 and above\n'
+                            'F  -   Top 10 South Korean Drama\n'
+                            'G  -   Top 10 Chinese Drama\n'
+                            'H  -   Top 10 Thailand Drama\n'
+                            'I  -   Top 10 Philippines Drama\n'
+                            'J  -   Search drama names\n'
+                            'K  -   Top dramas for every country\n'
+                            'L  -   Top dramas for every year\n'
+                            'M  -   Statistics for every country, year and status\n'
+                            'N  -   Export a view to a file\n'
+                            'Done   -   Bye Bye\n\n'
+                            "Where would you like to go? ")
+        menu_option = menu_option.upper()
+        if menu_option == 'A':
+            print_query('All information')
+        elif menu_option == 'B':
+            print("Here are the available countries to search from:\n"
+                "   -   China\n"
+                "   -   South Korea\n"
+                "   -   Philippines\n"
+                "   -   Thailand\n")
+            while True:
+                drama_country = input('Which country would you like to see? ')
+                drama_country = drama_country.capitalize()
+                if repository().country_exists(drama_country):
+                    print_parameter_query(DramaQuery(country=drama_country, sort="release_desc"))
+                    break
+                else:
+                    print("Sorry unable to find country. Please check for the spelling")
+        elif menu_option == 'C':
+            print("Here are the available countries to search from:\n"
+                "   -   0 [upcoming] , 2010 to 2025\n")
+            while True:
+                drama_year = input('Which year would you like to see? ')
+                if repository().year_exists(drama_year) and drama_year.strip().isdigit():
+                    print_parameter_query(DramaQuery(year_from=int(drama_year), year_to=int(drama_year), sort="release_desc"))
+                    break
+                else:
+                    print("Sorry unable to find year. Please check if the year is right.")
+        elif menu_option == 'D':
+            print_query("Rating below 5")
+        elif menu_option == 'E':
+            print_query("Rating 5 and over")
+        elif menu_option == 'F':
+            print_query("Top 10 South Korean Drama")
+        elif menu_option == 'G':
+            print_query("Top 10 Chinese Drama")
+        elif menu_option == 'H':
+            print_query("Top 10 Thailand Drama")
+        elif menu_option == 'I':
+            print_query("Top 10 Philippines Drama")
+        elif menu_option == 'J':
+            print("Type part of a drama name. End a word with * to match the start of it, e.g. Love*")
+            search_text = input('What would you like to search for? ')
+            try:
+                results = repository().search(search_text)
+            except sqlite3.OperationalError:
+                results = None
+                print("Search is not set up yet. Please open dramagui.py once to set it up.")
+            if results:
+                print(tabulate(results, FIELDS))
+            elif results is not None:
+                print("Sorry no dramas match that search.")
+        elif menu_option == 'K':
+            print_leaderboard("country", ask_top_n())
+        elif menu_option == 'L':
+            print_leaderboard("release", ask_top_n())
+        elif menu_option == 'M':
+            for by in ("country", "release", "watched"):
+                print_stats(by)
+                print()
+        elif menu_option == 'N':
+            view_name = input('Which view would you like to export? (e.g. All information, Year 2023) ')
+            file_format = input('Which format, ' + ', '.join(FORMATS) + '? ').strip().lower()
+            if file_format in FORMATS:
+                export_view(view_name.strip(), file_format)
             else:
-                print("Sorry unable to find year. Please check if the year is right.")
-    elif menu_option == 'D':
-        print_query("Rating below 5")
-    elif menu_option == 'E':
-        print_query("Rating 5 and over")
-    elif menu_option == 'F':
-        print_query("Top 10 South Korean Drama")
-    elif menu_option == 'G':
-        print_query("Top 10 Chinese Drama")
-    elif menu_option == 'H':
-        print_query("Top 10 Thailand Drama")
-    elif menu_option == 'I':
-        print_query("Top 10 Philippines Drama")
-    elif menu_option == 'DONE':
-        print('Thanks for using me! \nPlease come again!!!')
-    else:
-        print("\nPlease try again!")
+                print("Sorry that format is not available.")
+        elif menu_option == 'DONE':
+            print('Thanks for using me! \nPlease come again!!!')
+        else:
+            print("\nPlease try again!")
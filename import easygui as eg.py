@@ -1,6 +1,8 @@
 import easygui as eg
 import sqlite3
 
+from contacts_import import CREATE_SQL, import_contacts, normalize_email, read_contacts, report_lines
+
 # --- Database Setup and Functions ---
 def setup_database():
     """
@@ -18,13 +20,8 @@ def setup_database():
         
         # SQL command to create the 'contacts' table if it doesn't already exist.
         # This prevents an error if you run the script multiple times.
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS contacts (
-                id INTEGER PRIMARY KEY,
-                name TEXT NOT NULL,
-                email TEXT NOT NULL UNIQUE
-            )
-        ''')
+        # The bulk import creates it with the same command.
+        cursor.execute(CREATE_SQL)
         
         # Commit the changes to save the table creation to the database file.
         conn.commit()
@@ -62,6 +59,14 @@ def add_contact(conn, cursor):
         eg.msgbox("Both Name and Email are required.", "Input Error")
         return
 
+    # Store the email the same way the bulk import does, so an address typed
+    # in a different case still counts as the same contact.
+    try:
+        email = normalize_email(email)
+    except ValueError as e:
+        eg.msgbox(f"Error: {e}.", "Input Error")
+        return
+
     try:
         # Execute an INSERT SQL command using placeholders (?) to prevent SQL injection.
         # This is the safest way to insert user-provided data.
@@ -80,6 +85,25 @@ def add_contact(conn, cursor):
         # Catch any other database errors and display them.
         eg.exceptionbox(msg=f"Failed to add contact: {e}", title="Database Error")
         
+def import_contacts_file(conn):
+    """
+    Asks for a CSV or vCard file and imports every contact in it, updating the name
+    of any contact whose email is already saved. Shows how many were added, updated and rejected.
+    """
+    path = eg.fileopenbox("Choose a CSV (with Name and Email columns) or vCard file", "Import Contacts",
+                          filetypes=["*.csv", ["*.vcf", "*.vcard", "vCard files"]])
+    if path is None:
+        return
+
+    try:
+        # The file is read and saved in batches, so even a very large one is never all in memory.
+        report = import_contacts(conn, read_contacts(path))
+        eg.textbox("Import finished", "Import Contacts", "\n".join(report_lines(report)))
+    except (OSError, ValueError, sqlite3.Error) as e:
+        # Batches already committed stay saved; only the unfinished one is undone.
+        conn.rollback()
+        eg.exceptionbox(msg=f"Failed to import contacts: {e}", title="Import Error")
+
 def show_contacts(cursor):
     """
     Retrieves all contacts from the database and displays them in a formatted message box.
@@ -126,12 +150,14 @@ if __name__ == "__main__":
         choice = eg.buttonbox(
             "What would you like to do?",
             "Main Menu",
-            choices=["Add Contact", "Show All Contacts", "Exit"]
+            choices=["Add Contact", "Import Contacts", "Show All Contacts", "Exit"]
         )
 
         # Handle the user's choice.
         if choice == "Add Contact":
             add_contact(conn, cursor)
+        elif choice == "Import Contacts":
+            import_contacts_file(conn)
         elif choice == "Show All Contacts":
             show_contacts(cursor)
         elif choice == "Exit" or choice is None:
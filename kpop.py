@@ -1,24 +1,37 @@
 # Import the libraries to connect to the database and present the information in tables
 import sqlite3
 from tabulate import tabulate
+from kpop_database import DB_NAME, birthdate_range, setup_database
+from kpop_query import FIELDS as SEARCH_FIELDS, IdolQuery, search_idols
+from kpop_search import FIELDS as NAME_FIELDS, SEARCH_LIMIT as NAME_LIMIT, search_names
 
-# This is the filename of the database to be used
-DB_NAME = 'kpop.db'
+# How many idols a search prints at most
+SEARCH_LIMIT = 50
 
-def print_parameter_query(fields:str, where:str, parameter):
+def print_parameter_query(fields:str, where:str, *parameters):
     """ Prints the results for a parameter query in tabular form. """
     db = sqlite3.connect(DB_NAME)
     cursor = db.cursor()
     sql = ("SELECT " + fields + " FROM " + TABLES + " WHERE " + where)
-    cursor.execute(sql,(parameter,))
+    cursor.execute(sql,parameters)
     results = cursor.fetchall()
     print(tabulate(results,fields.split(",")))
     db.close()  
 
-TABLES = (" idol "
+# This is the SQL to connect to all the tables in the database.
+# The idols view is the idol table with each idol's age worked out from their birthdate.
+TABLES = (" idols AS idol "
            "LEFT JOIN ethnicitys ON idol.ethnicity_id = ethnicitys.ethnicity_id "
-           "LEFT JOIN groups ON idol.group_id = groups.group_id "
-           "LEFT JOIN ages ON idol.age_id = ages.age_id ")
+           "LEFT JOIN groups ON idol.group_id = groups.group_id ")
+
+# The fields and filter of each menu option that asks for a value. Oldest first is the
+# earliest birthdate first, and an age is a birthdate range (see birthdate_range).
+KPOP_QUERIES = {
+    "group": ("kpop_group, real_name, stage_name, age", "kpop_group = ? ORDER BY birthdate IS NULL, birthdate"),
+    "height": ("kpop_group, real_name, stage_name, age, height", "height = ? ORDER BY birthdate IS NULL, birthdate"),
+    "ethnicity": ("kpop_group, real_name, stage_name, age, ethnicity", "ethnicity = ? ORDER BY birthdate IS NULL, birthdate"),
+    "age": ("kpop_group, real_name, stage_name, age", "birthdate > ? AND birthdate <= ? ORDER BY birthdate"),
+}
 
 def print_query(view_name:str):
     ''' Prints the specified view from the database in a table '''
@@ -36,72 +49,129 @@ def print_query(view_name:str):
     # Print the results in a table with the headings
     print(tabulate(results,headings))
     db.close()
-   
-menu_option = ''
-while menu_option != 'DONE':
-    menu_option = input('Welcome to the Kpop database \n\n'
-                        'This menu contains information about Kpop:\n'
-                        '   - Groups\n'
-                        "   - Idol's stage name\n"
-                        "   - Idol's real name\n"
-                        "   - Idol's ages\n"
-                        "   - Idol's Birthdays\n"
-                        "   - Idol's Ethnicity\n"
-                        "   - Idol's height\n"
-                        "   - Idol's instagram\n\n"
-                        'Please enter a letter that is from A -I to navigate throught the menu.\n'
-                        "Please type 'DONE' to exit the database\n"
-                        'A: All Information\n'
-                        'B: Kpop groups members\n'
-                        'C: Idols Height\n'
-                        'D: Ethinicty\n'
-                        'E: Idols Age\n'
-                        'F: Top 10 oldest\n'
-                        'G: Top 10 tallest\n'
-                        'H: Top 10 Youngest\n'
-                        "I: All the lee's in kpop\n"
-                        'DONE: Exit\n\n'
-                        'Where would you like to go? ')
-    menu_option = menu_option.upper()
-    if menu_option == 'A':
-        print_query('All information')
-    elif menu_option == 'B':
-        print('Here are the Kpop groups:\n'
-              ' - nct 127\n'
-              ' - nct dream\n'
-              ' - wayv\n'
-              ' - ateez\n'
-              ' - enhypen\n'
-              ' - seventeen\n'
-              ' - straykids\n')
-        kpop_group = input('Which kpop group would you like to see: ')
-        print_parameter_query("kpop_group, real_name, stage_name, age","kpop_group = ? ORDER BY age DESC", kpop_group.lower())
-    elif menu_option == 'C':
-        print('The height available are 165 - 187')
-        height = input('What height  would you like to see: ')
-        print_parameter_query("kpop_group, real_name, stage_name, age, height","height = ? ORDER BY age DESC", height)
-    elif menu_option == 'D':
-        print('Here are the Ethnicitys of the Kpop Idols:\n'
-              ' - South Korea\n'
-              ' - China\n'
-              ' - USA\n'
-              ' - Japan\n'
-              ' - Australia\n'
-              ' - Canada\n'
-              ' - Thailand\n')
-        ethnicity = input('Which ethnicity would you like to see? ')
-        print_parameter_query("kpop_group, real_name, stage_name, age, ethnicity","ethnicity = ? ORDER BY age DESC", ethnicity.lower())
-    elif menu_option == 'E':
-        print('The ages available are 19 - 29')
-        age = input('What age would you like to see: ')
-        print_parameter_query("kpop_group, real_name, stage_name, age","age = ? ORDER BY age DESC", age)       
-    elif menu_option == 'F':
-        print_query('Top 10 oldest')
-    elif menu_option == 'G':
-        print_query("Top 10 tallest")
-    elif menu_option == 'H':
-        print_query('Top 10 Youngest')
-    elif menu_option == 'I':
-        print_query("All the lee in kpop")
-    elif menu_option == 'DONE':
-        print('Thanks for using me! \nPlease come again!!!')
+
+def print_search(query:IdolQuery):
+    ''' Prints the idols that match a search, oldest and then tallest first '''
+    db = sqlite3.connect(DB_NAME)
+    cursor = db.cursor()
+    results = search_idols(cursor, query._replace(limit=SEARCH_LIMIT))
+    print(tabulate(results,SEARCH_FIELDS))
+    if len(results) == SEARCH_LIMIT:
+        print(f"Showing the first {SEARCH_LIMIT} idols, narrow the search to see the rest")
+    db.close()
+
+def print_name_search(text:str):
+    ''' Prints the idols whose real or stage name has text in it, best match first '''
+    db = sqlite3.connect(DB_NAME)
+    cursor = db.cursor()
+    results = search_names(cursor, text)
+    print(tabulate(results,NAME_FIELDS))
+    if len(results) == NAME_LIMIT:
+        print(f"Showing the best {NAME_LIMIT} matches")
+    db.close()
+
+def ask_number(prompt:str):
+    ''' Asks for a whole number until one is given. Returns None if the answer is left blank. '''
+    while True:
+        answer = input(prompt).strip()
+        if answer == '':
+            return None
+        try:
+            return int(answer)
+        except ValueError:
+            print('Please enter a whole number, or leave it blank')
+
+if __name__ == "__main__":
+    # Make sure the tables and views are there, so an empty kpop.db works
+    try:
+        conn, cursor = setup_database()
+        conn.close()
+    except sqlite3.Error as e:
+        print(f"A database error occurred: {e}")
+        raise SystemExit(1)
+
+    menu_option = ''
+    while menu_option != 'DONE':
+        menu_option = input('Welcome to the Kpop database \n\n'
+                            'This menu contains information about Kpop:\n'
+                            '   - Groups\n'
+                            "   - Idol's stage name\n"
+                            "   - Idol's real name\n"
+                            "   - Idol's ages\n"
+                            "   - Idol's Birthdays\n"
+                            "   - Idol's Ethnicity\n"
+                            "   - Idol's height\n"
+                            "   - Idol's instagram\n\n"
+                            'Please enter a letter that is from A - K to navigate throught the menu.\n'
+                            "Please type 'DONE' to exit the database\n"
+                            'A: All Information\n'
+                            'B: Kpop groups members\n'
+                            'C: Idols Height\n'
+                            'D: Ethinicty\n'
+                            'E: Idols Age\n'
+                            'F: Top 10 oldest\n'
+                            'G: Top 10 tallest\n'
+                            'H: Top 10 Youngest\n'
+                            "I: All the lee's in kpop\n"
+                            'J: Search idols\n'
+                            'K: Search names\n'
+                            'DONE: Exit\n\n'
+                            'Where would you like to go? ')
+        menu_option = menu_option.upper()
+        if menu_option == 'A':
+            print_query('All information')
+        elif menu_option == 'B':
+            print('Here are the Kpop groups:\n'
+                  ' - nct 127\n'
+                  ' - nct dream\n'
+                  ' - wayv\n'
+                  ' - ateez\n'
+                  ' - enhypen\n'
+                  ' - seventeen\n'
+                  ' - straykids\n')
+            kpop_group = input('Which kpop group would you like to see: ')
+            print_parameter_query(*KPOP_QUERIES["group"], kpop_group.lower())
+        elif menu_option == 'C':
+            print('The height available are 165 - 187')
+            height = ask_number('What height  would you like to see: ')
+            if height is not None:
+                print_parameter_query(*KPOP_QUERIES["height"], height)
+        elif menu_option == 'D':
+            print('Here are the Ethnicitys of the Kpop Idols:\n'
+                  ' - South Korea\n'
+                  ' - China\n'
+                  ' - USA\n'
+                  ' - Japan\n'
+                  ' - Australia\n'
+                  ' - Canada\n'
+                  ' - Thailand\n')
+            ethnicity = input('Which ethnicity would you like to see? ')
+            print_parameter_query(*KPOP_QUERIES["ethnicity"], ethnicity.lower())
+        elif menu_option == 'E':
+            print('The ages available are 19 - 29')
+            age = ask_number('What age would you like to see: ')
+            if age is not None:
+                print_parameter_query(*KPOP_QUERIES["age"], *birthdate_range(age, age))
+        elif menu_option == 'F':
+            print_query('Top 10 oldest')
+        elif menu_option == 'G':
+            print_query("Top 10 tallest")
+        elif menu_option == 'H':
+            print_query('Top 10 Youngest')
+        elif menu_option == 'I':
+            print_query("All the lee in kpop")
+        elif menu_option == 'J':
+            print('Leave anything blank to not search on it')
+            kpop_group = input('Which kpop group: ').strip()
+            ethnicity = input('Which ethnicity: ').strip()
+            print_search(IdolQuery(group=kpop_group or None,
+                                   ethnicity=ethnicity or None,
+                                   height_min=ask_number('Shortest height: '),
+                                   height_max=ask_number('Tallest height: '),
+                                   age_min=ask_number('Youngest age: '),
+                                   age_max=ask_number('Oldest age: ')))
+        elif menu_option == 'K':
+            name = input('Type a name, surname or any part of one: ')
+            print_name_search(name)
+        elif menu_option == 'DONE':
+            print('Thanks for using me! \nPlease come again!!!')
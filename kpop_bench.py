@@ -0,0 +1,183 @@
+# Times every query kpop.py runs on seeded kpop databases and checks none of them reads the whole idol table
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+from kpop import KPOP_QUERIES, TABLES
+from kpop_database import KPOP_VIEWS, birthdate_range, seed_database, setup_database
+from kpop_query import IdolQuery, compile_query
+from kpop_search import clean_fragment, name_queries, search_names
+
+DEFAULT_SIZES = [10000, 100000]
+DEFAULT_REPEAT = 5
+DEFAULT_WORKDIR = os.path.join(tempfile.gettempdir(), "kpop_bench")
+
+# Sample values for each kpop.py filter, the way the menu passes them
+SAMPLE_VALUES = {
+    "group": ("ateez",),
+    "height": (180,),
+    "ethnicity": ("japan",),
+    "age": birthdate_range(21, 21),
+}
+
+# Searches covering each combination of filters the search indexes are chosen for
+SAMPLE_SEARCHES = {
+    "everyone": IdolQuery(),
+    "group": IdolQuery(group="ateez"),
+    "group + ethnicity": IdolQuery(group="ateez", ethnicity="japan"),
+    "ethnicity + ranges": IdolQuery(ethnicity="japan", height_min=170, height_max=175, age_min=20, age_max=24),
+    "height range": IdolQuery(height_min=170, height_max=175),
+    "tall and young": IdolQuery(height_min=185, age_max=21),
+}
+
+# How many idols a timed search fetches, the same as kpop.py prints
+SEARCH_LIMIT = 50
+
+# Name searches: a common surname, one too short for the trigram index, a common piece
+# of a given name, a rare fragment, and one that matches nobody
+SAMPLE_NAMES = ["lee", "yu", "min", "hoon12", "zzq"]
+
+# These list every idol, so reading the whole table is what they are meant to do
+FULL_LISTINGS = {"view: All information", "view: idols"}
+
+def kpop_queries():
+    ''' Returns every query kpop.py runs as {name: (sql, params)} '''
+    queries = {}
+    for name, (fields, where) in KPOP_QUERIES.items():
+        queries[f"filter: {name}"] = ("SELECT " + fields + " FROM " + TABLES + " WHERE " + where, SAMPLE_VALUES[name])
+    for view_name in KPOP_VIEWS:
+        queries[f"view: {view_name}"] = ("SELECT * FROM '" + view_name + "'", ())
+    for name, query in SAMPLE_SEARCHES.items():
+        queries[f"search: {name}"] = compile_query(query._replace(limit=SEARCH_LIMIT))
+    return queries
+
+def name_search_queries():
+    ''' Returns each query a sample name search runs, as {name: (sql, params)} '''
+    queries = {}
+    for text in SAMPLE_NAMES:
+        for number, (sql, params) in enumerate(name_queries(clean_fragment(text)), 1):
+            queries[f"name: {text} ({number})"] = (sql, dict(params, limit=SEARCH_LIMIT))
+    return queries
+
+def run_sql(sql, params=()):
+    ''' Makes a benchmark step that runs one query and fetches every row '''
+    def step(conn):
+        return len(conn.execute(sql, params).fetchall())
+    return step
+
+def run_name_search(text):
+    ''' Makes a benchmark step that runs one kpop.py name search '''
+    def step(conn):
+        return len(search_names(conn.cursor(), text))
+    return step
+
+def find_full_scans(conn):
+    """
+    Returns (query name, plan line) for each query that reads the whole idol table without
+    an index, and for each search that sorts its rows instead of reading them in order.
+    """
+    full_scans = []
+    for name, (sql, params) in {**kpop_queries(), **name_search_queries()}.items():
+        if name in FULL_LISTINGS:
+            continue
+        for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params):
+            if row[3].startswith("SCAN idol") and "INDEX" not in row[3]:
+                full_scans.append((name, row[3]))
+            elif name.startswith(("search:", "name:")) and "TEMP B-TREE" in row[3]:
+                full_scans.append((name, row[3]))
+    return full_scans
+
+def build_database(path, size, seed=0):
+    ''' Creates a kpop database at path with size made-up idols. Returns how long it took in seconds. '''
+    if os.path.exists(path):
+        os.remove(path)
+    conn, cursor = setup_database(path)
+    seconds = seed_database(conn, size, seed)
+    conn.close()
+    return seconds
+
+def summarise(timings):
+    ''' Turns a list of timings in seconds into milliseconds statistics '''
+    return {
+        "min_ms": min(timings) * 1000,
+        "median_ms": statistics.median(timings) * 1000,
+        "mean_ms": statistics.mean(timings) * 1000,
+        "runs": len(timings),
+    }
+
+def time_step(path, step, repeat):
+    """
+    Times a step with a cold cache (a new connection for every run, the way kpop.py opens
+    one for every query) and with a warm cache (one connection, after one untimed run).
+    The connections are plain sqlite3.connect ones, like kpop.py's.
+    """
+    cold = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn = sqlite3.connect(path)
+        rows = step(conn)
+        cold.append(time.perf_counter() - start)
+        conn.close()
+
+    conn = sqlite3.connect(path)
+    step(conn)
+    warm = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        step(conn)
+        warm.append(time.perf_counter() - start)
+    conn.close()
+    return {"rows": rows, "cold": summarise(cold), "warm": summarise(warm)}
+
+def run_benchmark(sizes, repeat=DEFAULT_REPEAT, workdir=DEFAULT_WORKDIR, rebuild=False, seed=0):
+    ''' Builds (or reuses) a seeded database for each size and times every query on it '''
+    os.makedirs(workdir, exist_ok=True)
+    report = {"repeat": repeat, "seed": seed, "sizes": {}}
+    for size in sizes:
+        path = os.path.join(workdir, f"kpop_{size}.db")
+        build_seconds = None
+        if rebuild or not os.path.exists(path):
+            print(f"Seeding {size:,} idols in {path} ...")
+            build_seconds = build_database(path, size, seed)
+        # A database kept from an earlier run is brought up to date with the code first
+        conn, cursor = setup_database(path)
+        full_scans = find_full_scans(conn)
+        conn.close()
+        steps = {name: run_sql(sql, params) for name, (sql, params) in kpop_queries().items()}
+        steps.update({f"name: {text}": run_name_search(text) for text in SAMPLE_NAMES})
+        results = {}
+        for name, step in steps.items():
+            results[name] = time_step(path, step, repeat)
+            print(f"{size:>10,}  {name:<30} warm {results[name]['warm']['median_ms']:9.3f} ms"
+                  f"   cold {results[name]['cold']['median_ms']:9.3f} ms   {results[name]['rows']:>8} rows")
+        report["sizes"][str(size)] = {"path": path, "build_seconds": build_seconds,
+                                      "full_scans": full_scans, "queries": results}
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the kpop.py queries on seeded databases.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="numbers of idols to benchmark with")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="timed runs per query")
+    parser.add_argument("--workdir", default=DEFAULT_WORKDIR, help="where the seeded databases are kept")
+    parser.add_argument("--rebuild", action="store_true", help="seed the databases again even if they exist")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the made-up idols")
+    parser.add_argument("--out", default="kpop_bench_report.json", help="where to write the JSON report")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.sizes, args.repeat, args.workdir, args.rebuild, args.seed)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.out}")
+    failed = False
+    for size, result in report["sizes"].items():
+        for name, detail in result["full_scans"]:
+            print(f"Slow plan at {int(size):,} idols: {name}: {detail}")
+            failed = True
+    if failed:
+        sys.exit(1)
+    print("Every kpop.py query is index-backed and every search reads its rows in order.")
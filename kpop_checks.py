@@ -0,0 +1,76 @@
+# Checks that can be run against the kpop database to make sure it stays fast and correct
+import sqlite3
+import sys
+from datetime import date
+
+from kpop_bench import find_full_scans
+from kpop_database import AGE_ON_SQL, birthdate_range, setup_database, years_before
+
+# The days the age check is run on: around a leap day, around the same days a year
+# without one, and today
+AGE_CHECK_DAYS = [date(2024, 2, 28), date(2024, 2, 29), date(2024, 3, 1),
+                  date(2023, 2, 28), date(2023, 3, 1), date(2025, 2, 28)]
+# How many years of birthdates the age check goes back
+AGE_CHECK_YEARS = 40
+
+def find_age_mismatches(cursor, today):
+    """
+    Works out the age on today of everyone born on each day of the last AGE_CHECK_YEARS
+    years with AGE_ON_SQL, and returns (birthdate, age) for each birthdate that
+    birthdate_range(age, age) doesn't cover or that the range for the age after it does.
+    """
+    cursor.execute(f"""
+        WITH RECURSIVE days (birthdate) AS (
+            SELECT :first
+            UNION ALL
+            SELECT date(birthdate, '+1 day') FROM days WHERE birthdate < :last
+        )
+        SELECT birthdate, {AGE_ON_SQL.format(day=':today')} FROM days
+    """, {"first": years_before(today, AGE_CHECK_YEARS).isoformat(), "last": today.isoformat(),
+          "today": today.isoformat()})
+    ranges = {}
+    mismatches = []
+    for birthdate, age in cursor.fetchall():
+        for candidate in (age, age + 1):
+            if candidate not in ranges:
+                ranges[candidate] = birthdate_range(candidate, candidate, today)
+        after, up_to = ranges[age]
+        older_after, older_up_to = ranges[age + 1]
+        if not after < birthdate <= up_to or older_after < birthdate <= older_up_to:
+            mismatches.append((birthdate, age))
+    return mismatches
+
+def check_birthdate_ranges(cursor):
+    ''' Fails with an AssertionError if an age search would disagree with the age the views show '''
+    failures = []
+    for today in AGE_CHECK_DAYS + [date.today()]:
+        failures += [f"   on {today}: born {birthdate}, aged {age}" for birthdate, age in find_age_mismatches(cursor, today)]
+    assert not failures, "Birthdate ranges that disagree with AGE_SQL:\n" + "\n".join(failures)
+
+def check_query_plans(cursor):
+    ''' Fails with an AssertionError if any kpop.py query scans the whole idol table '''
+    full_scans = find_full_scans(cursor.connection)
+    assert not full_scans, "Queries doing a full scan of idol:\n" + "\n".join(
+        f"   {name}: {detail}" for name, detail in full_scans)
+
+# Every check, and what it means when it passes
+CHECKS = [
+    (check_query_plans, "All kpop.py queries are index-backed."),
+    (check_birthdate_ranges, "Age searches agree with the ages shown, leap days included."),
+]
+
+if __name__ == "__main__":
+    try:
+        conn, cursor = setup_database()
+    except sqlite3.Error as e:
+        sys.exit(f"A database error occurred: {e}")
+    failed = False
+    for check, passed_message in CHECKS:
+        try:
+            check(cursor)
+            print(passed_message)
+        except AssertionError as e:
+            print(e)
+            failed = True
+    conn.close()
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,278 @@
+# Creates the kpop database (tables, indexes and the views kpop.py uses) and fills it with made-up idols for testing
+import argparse
+import random
+import sqlite3
+import sys
+import time
+from datetime import date
+
+from db_indexes import create_indexes
+from kpop_search import setup_search
+
+# This is the filename of the database to be used
+DB_NAME = 'kpop.db'
+
+# These are the tables kpop.py joins. The labels are stored in lower case, because
+# the menu lower-cases what the user types before looking it up.
+# An idol's birthdate is stored as YYYY-MM-DD, so it sorts and compares as a date and
+# their age is worked out from it when it is read (see the idols view).
+KPOP_TABLES = [
+    '''
+    CREATE TABLE IF NOT EXISTS groups (
+        group_id INTEGER PRIMARY KEY,
+        kpop_group TEXT
+    );
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS ethnicitys (
+        ethnicity_id INTEGER PRIMARY KEY,
+        ethnicity TEXT
+    );
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS idol (
+        idol_id INTEGER PRIMARY KEY,
+        real_name TEXT,
+        stage_name TEXT,
+        group_id INTEGER,
+        ethnicity_id INTEGER,
+        birthdate TEXT,
+        birthday TEXT,
+        height INTEGER,
+        instagram TEXT,
+        FOREIGN KEY (group_id) REFERENCES groups (group_id),
+        FOREIGN KEY (ethnicity_id) REFERENCES ethnicitys (ethnicity_id)
+    );
+    ''',
+]
+
+# An idol's age on {day}, in whole years, from their birthdate. Someone born on
+# 29 February has their birthday on 1 March in other years.
+AGE_ON_SQL = ("(strftime('%Y', {day}) - substr(birthdate, 1, 4)"
+              " - (strftime('%m-%d', {day}) < substr(birthdate, 6)))")
+# An idol's age today. 'now' is read once per statement, so every row of a query is
+# aged against the same day.
+AGE_SQL = AGE_ON_SQL.format(day="'now', 'localtime'")
+
+# These are the indexes setup_database keeps on the database, so every kpop.py
+# filter and Top 10 view looks rows up instead of reading the whole idol table.
+# The label indexes let a filter on a group or ethnicity find its id first,
+# and the names are indexed without case so "Lee %" and kpop_search's name prefixes
+# can use them for LIKE.
+# Ages are birthdate ranges, so the oldest and youngest idols are the two ends of
+# idx_idol_birthdate_height_desc, and it and the (group or ethnicity, birthdate, height DESC)
+# indexes give kpop_query's searches their rows already oldest and then tallest first,
+# with the height there to be checked before the idol's row is read.
+# setup_database hands them to db_indexes.create_indexes.
+KPOP_INDEXES = {
+    "idx_groups_kpop_group": "CREATE UNIQUE INDEX IF NOT EXISTS idx_groups_kpop_group ON groups (kpop_group)",
+    "idx_ethnicitys_ethnicity": "CREATE UNIQUE INDEX IF NOT EXISTS idx_ethnicitys_ethnicity ON ethnicitys (ethnicity)",
+    "idx_idol_height": "CREATE INDEX IF NOT EXISTS idx_idol_height ON idol (height)",
+    "idx_idol_real_name": "CREATE INDEX IF NOT EXISTS idx_idol_real_name ON idol (real_name COLLATE NOCASE)",
+    "idx_idol_stage_name": "CREATE INDEX IF NOT EXISTS idx_idol_stage_name ON idol (stage_name COLLATE NOCASE)",
+    "idx_idol_birthdate_height_desc":
+        "CREATE INDEX IF NOT EXISTS idx_idol_birthdate_height_desc ON idol (birthdate, height DESC)",
+    "idx_idol_group_birthdate_height_desc":
+        "CREATE INDEX IF NOT EXISTS idx_idol_group_birthdate_height_desc ON idol (group_id, birthdate, height DESC)",
+    "idx_idol_ethnicity_birthdate_height_desc":
+        "CREATE INDEX IF NOT EXISTS idx_idol_ethnicity_birthdate_height_desc ON idol (ethnicity_id, birthdate, height DESC)",
+}
+
+# These are the views the kpop.py menu prints. They read idols through the idols view,
+# which adds each idol's age. The oldest idol has the earliest birthdate, so the Top 10
+# age views read the first or last 10 entries of idx_idol_birthdate_height_desc and stop.
+KPOP_VIEWS = {
+    "idols": f'''
+        SELECT idol.*, {AGE_SQL} AS age
+        FROM idol
+    ''',
+    "All information": '''
+        SELECT kpop_group, real_name, stage_name, age, birthday, ethnicity, height, instagram
+        FROM idols AS idol
+        LEFT JOIN ethnicitys ON idol.ethnicity_id = ethnicitys.ethnicity_id
+        LEFT JOIN groups ON idol.group_id = groups.group_id
+    ''',
+    "Top 10 oldest": '''
+        SELECT kpop_group, real_name, stage_name, age, birthday
+        FROM idols AS idol
+        LEFT JOIN groups ON idol.group_id = groups.group_id
+        WHERE birthdate IS NOT NULL
+        ORDER BY birthdate ASC
+        LIMIT 10
+    ''',
+    "Top 10 Youngest": '''
+        SELECT kpop_group, real_name, stage_name, age, birthday
+        FROM idols AS idol
+        LEFT JOIN groups ON idol.group_id = groups.group_id
+        WHERE birthdate IS NOT NULL
+        ORDER BY birthdate DESC
+        LIMIT 10
+    ''',
+    "Top 10 tallest": '''
+        SELECT kpop_group, real_name, stage_name, height
+        FROM idol
+        LEFT JOIN groups ON idol.group_id = groups.group_id
+        WHERE height IS NOT NULL
+        ORDER BY height DESC
+        LIMIT 10
+    ''',
+    "All the lee in kpop": '''
+        SELECT kpop_group, real_name, stage_name, age
+        FROM idols AS idol
+        LEFT JOIN groups ON idol.group_id = groups.group_id
+        WHERE real_name LIKE 'lee %'
+    ''',
+}
+
+# The groups, ethnicities and ages the kpop.py menu lists
+GROUPS = ["nct 127", "nct dream", "wayv", "ateez", "enhypen", "seventeen", "straykids"]
+ETHNICITYS = ["south korea", "china", "usa", "japan", "australia", "canada", "thailand"]
+AGES = range(19, 30)
+
+# What the made-up idols are built from
+SURNAMES = ["Lee", "Kim", "Park", "Choi", "Jung", "Kang", "Cho", "Yoon", "Jang", "Lim", "Han", "Hwang", "Seo", "Song"]
+SYLLABLES = ["Min", "Ji", "Seo", "Hyun", "Woo", "Jae", "Jun", "Young", "Hoon", "Sung", "Tae", "Yeon", "Ho", "Jin",
+             "Soo", "Eun", "Hye", "Dong", "Kyung", "Chan", "Bin", "Na", "Ra", "Yu"]
+HEIGHTS = range(160, 191)
+
+# How many idols are inserted per executemany call while seeding
+SEED_BATCH = 10000
+
+def create_views(cursor):
+    ''' Creates (or replaces) every view in KPOP_VIEWS '''
+    for view_name, sql in KPOP_VIEWS.items():
+        cursor.execute(f'DROP VIEW IF EXISTS "{view_name}"')
+        cursor.execute(f'CREATE VIEW "{view_name}" AS {sql}')
+
+def years_before(day, years):
+    """
+    Returns the date the given number of years before day. 29 February becomes 28 February
+    in a year without one: on 29 February, AGE_SQL has someone born on 28 February that many
+    years ago at that age and someone born on 1 March not yet.
+    """
+    try:
+        return day.replace(year=day.year - years)
+    except ValueError:
+        return date(day.year - years, 2, 28)
+
+def birthdate_range(age_min=None, age_max=None, today=None):
+    """
+    Turns an age range (both ends included, either left as None) into a birthdate range.
+    Returns (after, up_to): an idol is in the range if birthdate > after and birthdate <= up_to.
+    Either is None when that end of the age range is.
+    """
+    today = today or date.today()
+    up_to = years_before(today, int(age_min)).isoformat() if age_min is not None else None
+    after = years_before(today, int(age_max) + 1).isoformat() if age_max is not None else None
+    return after, up_to
+
+def migrate_ages(cursor, today=None):
+    """
+    Moves an older database from the ages lookup table to birthdates. Adds the birthdate
+    column if it is missing and fills it in for every idol that only has an age: the year
+    they were born in to be that age today, on their birthday (1 January if it isn't known).
+    The ages table and age_id column are left as they are, but nothing reads them any more.
+    Returns how many idols were given a birthdate.
+    """
+    today = today or date.today()
+    columns = [row[1] for row in cursor.execute("PRAGMA table_info(idol)")]
+    if "birthdate" not in columns:
+        cursor.execute("ALTER TABLE idol ADD COLUMN birthdate TEXT")
+    has_ages = cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'ages'").fetchone()
+    if "age_id" not in columns or not has_ages:
+        return 0
+    # Someone whose birthday is still to come this year was born a year earlier
+    cursor.execute("""
+        UPDATE idol SET birthdate = (
+            SELECT printf('%04d-%s', :year - ages.age - (coalesce(idol.birthday, '01-01') > :month_day),
+                          coalesce(idol.birthday, '01-01'))
+            FROM ages WHERE ages.age_id = idol.age_id
+        )
+        WHERE birthdate IS NULL AND age_id IS NOT NULL
+    """, {"year": today.year, "month_day": today.strftime("%m-%d")})
+    return cursor.rowcount
+
+def setup_database(db_name=DB_NAME):
+    """
+    Connects to the kpop database and makes sure its tables, indexes, views and name
+    search exist, moving an older database's ages across to birthdates first.
+    If the database file doesn't exist (or is empty), SQLite will create it.
+    Returns the connection and a cursor. Raises sqlite3.Error if it cannot be set up.
+    """
+    conn = sqlite3.connect(db_name)
+    try:
+        cursor = conn.cursor()
+        for sql in KPOP_TABLES:
+            cursor.execute(sql)
+        migrate_ages(cursor)
+        create_indexes(cursor, KPOP_INDEXES)
+        create_views(cursor)
+        setup_search(cursor)
+        conn.commit()
+    except sqlite3.Error:
+        conn.close()
+        raise
+    return conn, cursor
+
+def add_labels(cursor, table, column, labels):
+    ''' Adds any label that is missing from a lookup table and returns {label: id} for all of them '''
+    cursor.executemany(f"INSERT INTO {table} ({column}) SELECT ? WHERE NOT EXISTS "
+                       f"(SELECT 1 FROM {table} WHERE {column} = ?)", [(label, label) for label in labels])
+    cursor.execute(f"SELECT {column}, rowid FROM {table}")
+    return dict(cursor.fetchall())
+
+def synthetic_idols(size, group_ids, ethnicity_ids, seed=0, today=None):
+    """
+    Yields size made-up idol rows (without idol_id) aged between the first and last of AGES,
+    the same ones every time for the same seed and day.
+    """
+    rng = random.Random(seed)
+    today = today or date.today()
+    oldest = years_before(today, AGES[-1] + 1).toordinal() + 1
+    youngest = years_before(today, AGES[0]).toordinal()
+    for number in range(size):
+        given = rng.choice(SYLLABLES) + rng.choice(SYLLABLES).lower()
+        real_name = f"{rng.choice(SURNAMES)} {given}"
+        stage_name = f"{given}{number}"
+        birthdate = date.fromordinal(rng.randint(oldest, youngest))
+        yield (real_name, stage_name, rng.choice(group_ids), rng.choice(ethnicity_ids), birthdate.isoformat(),
+               birthdate.strftime("%m-%d"), rng.choice(HEIGHTS), "@" + stage_name.lower())
+
+def seed_database(conn, size, seed=0):
+    """
+    Adds size made-up idols, spread over the menu's groups plus enough extra groups to
+    keep them at about 8 members each. Returns how long it took in seconds.
+    """
+    start = time.perf_counter()
+    cursor = conn.cursor()
+    groups = GROUPS + [f"group {number}" for number in range(len(GROUPS), size // 8)]
+    group_ids = list(add_labels(cursor, "groups", "kpop_group", groups).values())
+    ethnicity_ids = list(add_labels(cursor, "ethnicitys", "ethnicity", ETHNICITYS).values())
+    rows = synthetic_idols(size, group_ids, ethnicity_ids, seed)
+    while True:
+        batch = [row for _, row in zip(range(SEED_BATCH), rows)]
+        if not batch:
+            break
+        cursor.executemany("""
+            INSERT INTO idol (real_name, stage_name, group_id, ethnicity_id, birthdate, birthday, height, instagram)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, batch)
+    conn.commit()
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Set up the kpop database and optionally fill it with made-up idols.")
+    parser.add_argument("--db", default=DB_NAME, help="the database file to set up")
+    parser.add_argument("--seed-idols", type=int, default=0, help="how many made-up idols to add")
+    parser.add_argument("--seed", type=int, default=0, help="the random seed, so the same idols come out every time")
+    args = parser.parse_args()
+
+    try:
+        conn, cursor = setup_database(args.db)
+    except sqlite3.Error as e:
+        sys.exit(f"A database error occurred: {e}")
+    if args.seed_idols:
+        seconds = seed_database(conn, args.seed_idols, args.seed)
+        print(f"Added {args.seed_idols:,} idols in {seconds:.2f}s")
+    print(f"{args.db} is set up with {conn.execute('SELECT COUNT(*) FROM idol').fetchone()[0]:,} idols")
+    conn.close()
@@ -1,34 +1,26 @@
-# Import the libraries to connect to the database and present the information in tables
+# Asks for a height, an age, a kpop group and an ethnicity and prints the idols that match each one
 import sqlite3
-from tabulate import tabulate
+from kpop_database import birthdate_range, setup_database
+# The same queries as the kpop.py menu, which read the idols view so ages come from birthdates
+from kpop import KPOP_QUERIES, ask_number, print_parameter_query
 
-# This is the filename of the database to be used
-DB_NAME = 'kpop.db'
-# This is the SQL to connect to all the tables in the database
-TABLES = (" idol "
-           "LEFT JOIN ethnicitys ON idol.ethnicity_id = ethnicitys.ethnicity_id "
-           "LEFT JOIN groups ON idol.group_id = groups.group_id "
-           "LEFT JOIN ages ON idol.age_id = ages.age_id ")
-
-def print_parameter_query(fields:str, where:str, parameter):
-    """ Prints the results for a parameter query in tabular form. """
-    db = sqlite3.connect(DB_NAME)
-    cursor = db.cursor()
-    sql = ("SELECT " + fields + " FROM " + TABLES + " WHERE " + where)
-    cursor.execute(sql,(parameter,))
-    results = cursor.fetchall()
-    print(tabulate(results,fields.split(",")))
-    db.close()  
+# Make sure the idols view is there, the way kpop.py does before its menu
+try:
+    conn, cursor = setup_database()
+    conn.close()
+except sqlite3.Error as e:
+    print(f"A database error occurred: {e}")
+    raise SystemExit(1)
 
 height = input('What height  would you like to see: ')
-print_parameter_query("kpop_group, real_name, stage_name, age, height","height = ? ORDER BY age DESC", height)
+print_parameter_query(*KPOP_QUERIES["height"], height)
 
-age = input('What age would you like to see: ')
-print_parameter_query("kpop_group, real_name, stage_name, age","age = ? ORDER BY age DESC", age)
+age = ask_number('What age would you like to see: ')
+if age is not None:
+    print_parameter_query(*KPOP_QUERIES["age"], *birthdate_range(age, age))
 
 kpop_group = input('Which kpop group would you like to see: ')
-print_parameter_query("kpop_group, real_name, stage_name, age","kpop_group = ? ORDER BY age DESC", kpop_group)
+print_parameter_query(*KPOP_QUERIES["group"], kpop_group.lower())
 
 ethnicity = input('Which ethnicity would you like to see? ')
-print_parameter_query("kpop_group, real_name, stage_name, age, ethnicity","ethnicity = ? ORDER BY age DESC", ethnicity)
-    
\ No newline at end of file
+print_parameter_query(*KPOP_QUERIES["ethnicity"], ethnicity.lower())
@@ -0,0 +1,77 @@
+# One idol search that combines a group, an ethnicity, a height range and an age range
+from collections import namedtuple
+
+from kpop_database import birthdate_range
+
+# The columns every idol search returns
+FIELDS = ["kpop_group", "real_name", "stage_name", "age", "height", "ethnicity"]
+
+# The idols view adds each idol's age, worked out from their birthdate
+TABLES = (" idols AS idol "
+          "LEFT JOIN groups ON idol.group_id = groups.group_id "
+          "LEFT JOIN ethnicitys ON idol.ethnicity_id = ethnicitys.ethnicity_id ")
+
+# Oldest first, then tallest. Every search index ends in (birthdate, height DESC) and then
+# the rowid, so a search reads its rows off one already in this order and a LIMIT stops it
+# early instead of sorting every match. Idols without a birthdate come last, the same order
+# as "birthdate IS NULL, birthdate", but written so SQLite still reads it off the index.
+ORDER = " ORDER BY idol.birthdate NULLS LAST, idol.height DESC, idol.idol_id"
+
+QUERY_FIELDS = ["group", "ethnicity", "height_min", "height_max", "age_min", "age_max", "limit"]
+
+class IdolQuery(namedtuple("IdolQuery", QUERY_FIELDS, defaults=[None] * len(QUERY_FIELDS))):
+    """
+    A search over the idols. Every field left as None is not filtered on.
+    The height and age ranges include both ends.
+    """
+    __slots__ = ()
+
+def compile_query(query):
+    """
+    Turns an IdolQuery into SQL with ? placeholders and the values to bind to them.
+    The group and ethnicity are looked up in their lookup tables and matched on the idol ids,
+    the heights are bound as integers and the ages become a birthdate range, so the
+    comparisons use the indexes.
+    """
+    conditions = []
+    params = []
+    born_after, born_up_to = birthdate_range(query.age_min, query.age_max)
+    if born_after is not None:
+        conditions.append("idol.birthdate > ?")
+        params.append(born_after)
+    if born_up_to is not None:
+        conditions.append("idol.birthdate <= ?")
+        params.append(born_up_to)
+    # The labels are stored in lower case, the same as the menu looks them up
+    if query.group is not None:
+        conditions.append("idol.group_id = (SELECT group_id FROM groups WHERE kpop_group = ?)")
+        params.append(query.group.lower())
+    if query.ethnicity is not None:
+        # A group only has a handful of idols, so when there is one the + stops SQLite
+        # from choosing the ethnicity index, which would read thousands of rows instead
+        column = "+idol.ethnicity_id" if query.group is not None else "idol.ethnicity_id"
+        conditions.append(column + " = (SELECT ethnicity_id FROM ethnicitys WHERE ethnicity = ?)")
+        params.append(query.ethnicity.lower())
+    # The + keeps SQLite on an index in birthdate order. idx_idol_height would find the
+    # heights quicker, but then every idol of those heights has to be sorted by age.
+    if query.height_min is not None:
+        conditions.append("+idol.height >= ?")
+        params.append(int(query.height_min))
+    if query.height_max is not None:
+        conditions.append("+idol.height <= ?")
+        params.append(int(query.height_max))
+
+    sql = "SELECT " + ", ".join(FIELDS) + " FROM " + TABLES
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += ORDER
+    if query.limit is not None:
+        sql += " LIMIT ?"
+        params.append(int(query.limit))
+    return sql, tuple(params)
+
+def search_idols(cursor, query):
+    ''' Runs an IdolQuery and returns its rows '''
+    sql, params = compile_query(query)
+    cursor.execute(sql, params)
+    return cursor.fetchall()
@@ -0,0 +1,124 @@
+# Name search over idols' real and stage names, backed by an FTS5 trigram table that triggers keep in step with idol
+import re
+
+# How many matches a search returns
+SEARCH_LIMIT = 50
+
+# The columns every name search returns
+FIELDS = ["kpop_group", "real_name", "stage_name", "age"]
+
+# idol_fts indexes every three-letter piece of real_name and stage_name straight from the
+# idol table (an external content table), so a fragment from anywhere in a name is looked up
+# instead of read from every row. The trigram tokenizer needs SQLite 3.34 or newer.
+SEARCH_SETUP = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS idol_fts USING fts5(
+        real_name,
+        stage_name,
+        content='idol',
+        content_rowid='idol_id',
+        tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS idol_fts_insert AFTER INSERT ON idol BEGIN
+        INSERT INTO idol_fts (rowid, real_name, stage_name) VALUES (new.idol_id, new.real_name, new.stage_name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS idol_fts_delete AFTER DELETE ON idol BEGIN
+        INSERT INTO idol_fts (idol_fts, rowid, real_name, stage_name)
+        VALUES ('delete', old.idol_id, old.real_name, old.stage_name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS idol_fts_update AFTER UPDATE OF idol_id, real_name, stage_name ON idol BEGIN
+        INSERT INTO idol_fts (idol_fts, rowid, real_name, stage_name)
+        VALUES ('delete', old.idol_id, old.real_name, old.stage_name);
+        INSERT INTO idol_fts (rowid, real_name, stage_name) VALUES (new.idol_id, new.real_name, new.stage_name);
+    END
+    """,
+]
+
+SELECT_SQL = """
+    SELECT kpop_group, idol.real_name, idol.stage_name, age
+    FROM idols AS idol
+    LEFT JOIN groups ON idol.group_id = groups.group_id
+"""
+
+# The matches in the order they are ranked: real names that start with what was typed
+# (so a surname comes first), then stage names that start with it, then names that have it
+# anywhere else. The first two read the NOCASE name indexes in order and the last reads
+# idol_fts, and each stops at its LIMIT, so a common fragment doesn't rank every match.
+# Idols an earlier tier found are left out of the later ones. coalesce makes a missing
+# name not match, where NULL would make the NOT NULL too and drop the idol. In :prefix,
+# a \ marks a %, _ or \ the user typed as a plain character.
+REAL_NAME_PREFIX_SQL = SELECT_SQL + """
+    WHERE idol.real_name LIKE :prefix ESCAPE '\\'
+    ORDER BY idol.real_name COLLATE NOCASE
+    LIMIT :limit
+"""
+STAGE_NAME_PREFIX_SQL = SELECT_SQL + """
+    WHERE idol.stage_name LIKE :prefix ESCAPE '\\' AND NOT coalesce(idol.real_name, '') LIKE :prefix ESCAPE '\\'
+    ORDER BY idol.stage_name COLLATE NOCASE
+    LIMIT :limit
+"""
+SUBSTRING_SQL = SELECT_SQL + """
+    JOIN idol_fts ON idol_fts.rowid = idol.idol_id
+    WHERE idol_fts MATCH :match
+      AND NOT (coalesce(idol.real_name, '') LIKE :prefix ESCAPE '\\' OR coalesce(idol.stage_name, '') LIKE :prefix ESCAPE '\\')
+    LIMIT :limit
+"""
+
+# A trigram index can only look up fragments of at least three characters
+TRIGRAM = 3
+
+def setup_search(cursor):
+    """
+    Creates the search table and its triggers if they are missing.
+    A new search table is filled from the idols that are already there.
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'idol_fts'")
+    exists = cursor.fetchone()
+    for sql in SEARCH_SETUP:
+        cursor.execute(sql)
+    if not exists:
+        rebuild_search(cursor)
+
+def rebuild_search(cursor):
+    ''' Refills the search table from the idol table '''
+    cursor.execute("INSERT INTO idol_fts (idol_fts) VALUES ('rebuild')")
+
+def clean_fragment(text):
+    ''' Returns what the user typed ready to search for: trimmed, with runs of spaces made one '''
+    return re.sub(r"\s+", " ", text).strip()
+
+def like_prefix(fragment):
+    ''' A LIKE pattern for names starting with fragment, with its %, _ and \\ escaped so they match themselves '''
+    return re.sub(r"([%_\\])", r"\\\1", fragment) + "%"
+
+def name_queries(fragment):
+    """
+    Returns the queries for a cleaned fragment, best matches first, as (sql, params) pairs.
+    Each query still needs a :limit. Fragments too short for the trigram index only
+    match at the start of a name.
+    """
+    prefix = {"prefix": like_prefix(fragment)}
+    queries = [(REAL_NAME_PREFIX_SQL, prefix), (STAGE_NAME_PREFIX_SQL, prefix)]
+    if len(fragment) >= TRIGRAM:
+        # One quoted phrase matches the fragment anywhere, even across a space
+        queries.append((SUBSTRING_SQL, dict(prefix, match='"' + fragment.replace('"', '""') + '"')))
+    return queries
+
+def search_names(cursor, text, limit=SEARCH_LIMIT):
+    ''' Returns up to limit idols whose real or stage name has text in it, best match first '''
+    fragment = clean_fragment(text)
+    if not fragment:
+        return []
+    results = []
+    for sql, params in name_queries(fragment):
+        if len(results) >= limit:
+            break
+        cursor.execute(sql, dict(params, limit=limit - len(results)))
+        results.extend(cursor.fetchall())
+    return results
@@ -0,0 +1,110 @@
+# Times the "find similar monsters" search against the plain Python loop it replaces, on made-up catalogues
+import argparse
+import heapq
+import json
+import math
+import statistics
+import sys
+import time
+
+import numpy as np
+
+import monster_similarity
+from monster_similarity import SimilarityIndex
+from monster_storage import STATS
+
+DEFAULT_SIZES = [10000, 100000, 1000000]
+DEFAULT_QUERIES = 20
+DEFAULT_K = 5
+
+def make_catalogue(size, seed=0):
+    ''' Returns size made-up monster names and their stats from 1 to 25 as an (n, 4) matrix '''
+    rng = np.random.default_rng(seed)
+    return [f"Monster{number}" for number in range(size)], rng.integers(1, 26, size=(size, len(STATS)), dtype=np.uint8)
+
+def naive_nearest(catalogue, target, k, weights=None):
+    ''' The plain Python way: work out the distance to every monster in a dictionary of dictionaries '''
+    weights = weights or {stat: 1 for stat in STATS}
+    distances = ((math.sqrt(sum(weights[stat] * (stats[stat] - target[stat]) ** 2 for stat in STATS)), order, name)
+                 for order, (name, stats) in enumerate(catalogue.items()))
+    return [(name, distance) for distance, order, name in heapq.nsmallest(k, distances)]
+
+def time_queries(search, targets):
+    ''' Runs search on every target. Returns the answers and the median time in milliseconds. '''
+    answers = []
+    timings = []
+    for target in targets:
+        start = time.perf_counter()
+        answers.append(search(target))
+        timings.append(time.perf_counter() - start)
+    return answers, statistics.median(timings) * 1000
+
+def same_answers(expected, actual):
+    ''' True if two lists of answers name the same monsters at the same distances '''
+    return all([name for name, _ in a] == [name for name, _ in b]
+               and all(math.isclose(x, y, abs_tol=1e-9) for (_, x), (_, y) in zip(a, b))
+               for a, b in zip(expected, actual))
+
+def run_benchmark(sizes, queries=DEFAULT_QUERIES, k=DEFAULT_K, weights=None, naive_max=None):
+    ''' Times each way of searching on a catalogue of each size and checks they agree '''
+    report = {"k": k, "queries": queries, "weights": weights, "kdtree_available": monster_similarity.cKDTree is not None,
+              "sizes": {}}
+    for size in sizes:
+        names, stats = make_catalogue(size)
+        rng = np.random.default_rng(size)
+        targets = [dict(zip(STATS, map(int, row))) for row in rng.integers(1, 26, size=(queries, len(STATS)))]
+        result = {}
+
+        start = time.perf_counter()
+        index = SimilarityIndex(names, stats)
+        result["numpy_build_ms"] = (time.perf_counter() - start) * 1000
+        # Time the vectorised scan even where the KD-tree would be used, to compare the two
+        index.kdtree_min = sys.maxsize
+        expected, result["numpy_ms"] = time_queries(lambda target: index.nearest(target, k, weights), targets)
+
+        if monster_similarity.cKDTree is not None:
+            index.kdtree_min = 0
+            start = time.perf_counter()
+            index.nearest(targets[0], k, weights)
+            result["kdtree_build_ms"] = (time.perf_counter() - start) * 1000
+            answers, result["kdtree_ms"] = time_queries(lambda target: index.nearest(target, k, weights), targets)
+            result["kdtree_matches"] = same_answers(expected, answers)
+
+        if naive_max is None or size <= naive_max:
+            catalogue = {name: dict(zip(STATS, map(int, row))) for name, row in zip(names, stats)}
+            weight_map = dict(zip(STATS, weights)) if weights else None
+            answers, result["naive_ms"] = time_queries(lambda target: naive_nearest(catalogue, target, k, weight_map), targets)
+            result["naive_matches"] = same_answers(expected, answers)
+            result["speedup"] = result["naive_ms"] / result["numpy_ms"]
+            del catalogue
+
+        report["sizes"][str(size)] = result
+        line = f"{size:>10,} monsters: numpy {result['numpy_ms']:8.2f} ms"
+        if "kdtree_ms" in result:
+            line += f"   kd-tree {result['kdtree_ms']:8.3f} ms (built in {result['kdtree_build_ms']:.0f} ms)"
+        if "naive_ms" in result:
+            line += f"   python loop {result['naive_ms']:9.2f} ms   {result['speedup']:6.1f}x faster"
+        print(line)
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the similar monster search against a plain Python loop.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="numbers of monsters to benchmark with")
+    parser.add_argument("--queries", type=int, default=DEFAULT_QUERIES, help="searches timed per size")
+    parser.add_argument("-k", type=int, default=DEFAULT_K, help="how many similar monsters each search finds")
+    parser.add_argument("--weights", type=float, nargs=len(STATS), metavar="W", help="a weight for each of " + ", ".join(STATS))
+    parser.add_argument("--naive-max", type=int, help="skip the Python loop on catalogues bigger than this")
+    parser.add_argument("--out", default="monster_bench_report.json", help="where to write the JSON report")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.sizes, args.queries, args.k, args.weights, args.naive_max)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.out}")
+    if not report["kdtree_available"]:
+        print("scipy is not installed, so the KD-tree was not timed")
+    mismatched = [size for size, result in report["sizes"].items()
+                  if not result.get("naive_matches", True) or not result.get("kdtree_matches", True)]
+    if mismatched:
+        print("The searches disagreed at " + ", ".join(mismatched) + " monsters")
+        sys.exit(1)
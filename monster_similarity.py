@@ -0,0 +1,154 @@
+# Finds the monsters whose Strength, Speed, Stealth and Cunning are closest to a monster or to stats the user picks
+import numpy as np
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    # Without scipy every search compares against every monster, which is still vectorised
+    cKDTree = None
+
+from monster_storage import STATS
+
+# How many similar monsters a search returns
+DEFAULT_K = 5
+
+# From this many monsters a KD-tree (when scipy is installed) answers searches instead of
+# comparing against every monster. Below it, building the tree costs more than it saves.
+KDTREE_MIN = 200000
+
+def stat_vector(stats):
+    ''' Turns {stat: number} or four numbers in STATS order into a float array '''
+    if isinstance(stats, dict):
+        stats = [stats[stat] for stat in STATS]
+    vector = np.asarray(stats, dtype=np.float64)
+    if vector.shape != (len(STATS),):
+        raise ValueError(f"Expected {len(STATS)} stats ({', '.join(STATS)}), got {len(vector)}")
+    return vector
+
+class SimilarityIndex:
+    """
+    The stats of every monster as an (n, 4) NumPy matrix, for finding the k nearest monsters
+    to a target by Euclidean distance, optionally weighted per stat. A weight of 2 makes a
+    difference in that stat count twice as much.
+
+    The index is a snapshot: build a new one after the catalogue changes (index_for does).
+    """
+
+    def __init__(self, names, stats, kdtree_min=KDTREE_MIN):
+        self.names = list(names)
+        self.kdtree_min = kdtree_min
+        self.stats = np.asarray(stats, dtype=np.uint8).reshape(-1, len(STATS))
+        # One contiguous column per stat, which NumPy runs through several times faster than
+        # the rows of self.stats. float64 keeps the sums exact, the same as Python's.
+        self.columns = np.ascontiguousarray(self.stats.T, dtype=np.float64)
+        self._positions = {name: position for position, name in enumerate(self.names)}
+        # KD-trees by weights, built the first time each weighting is searched
+        self._trees = {}
+        # The catalogue the index was built from and its version then, if it came from one
+        self.catalogue = None
+        self.version = None
+
+    @classmethod
+    def from_catalogue(cls, catalogue):
+        ''' Builds an index from a MonsterCatalogue '''
+        names, stats = catalogue.packed_stats()
+        index = cls(names, np.frombuffer(stats, dtype=np.uint8))
+        index.catalogue = catalogue
+        index.version = catalogue.version
+        return index
+
+    def uses_tree(self):
+        return cKDTree is not None and len(self.names) >= self.kdtree_min
+
+    def _weights(self, weights):
+        if weights is None:
+            return None
+        weights = stat_vector(weights)
+        if (weights < 0).any():
+            raise ValueError("Stat weights cannot be negative")
+        return weights
+
+    def _tree(self, weights):
+        ''' The KD-tree for a weighting. Weighted distance is plain distance after scaling each stat by sqrt(weight). '''
+        key = None if weights is None else tuple(weights)
+        if key not in self._trees:
+            points = self.stats.astype(np.float64)
+            if weights is not None:
+                points *= np.sqrt(weights)
+            self._trees[key] = cKDTree(points)
+        return self._trees[key]
+
+    def nearest(self, target, k=DEFAULT_K, weights=None, exclude=None):
+        """
+        Returns up to k (name, distance) pairs, nearest first. Monsters at the same distance
+        come in catalogue order, so the answer is the same with or without the KD-tree.
+        exclude leaves one monster out (the one being compared against).
+        """
+        target = stat_vector(target)
+        weights = self._weights(weights)
+        skip = self._positions.get(exclude) if exclude is not None else None
+        count = len(self.names) - (skip is not None)
+        k = min(k, count)
+        if k <= 0:
+            return []
+        if self.uses_tree():
+            positions, squared = self._nearest_by_tree(target, k, weights, skip)
+        else:
+            positions, squared = self._nearest_by_scan(target, k, weights, skip)
+        return [(self.names[position], float(np.sqrt(distance))) for position, distance in zip(positions, squared)]
+
+    def _squared_distances(self, target, weights, positions=None):
+        ''' The weighted squared distance from the target to every monster (or those at positions), a stat at a time '''
+        columns = self.columns if positions is None else self.columns[:, positions]
+        squared = np.zeros(columns.shape[1])
+        for stat, column in enumerate(columns):
+            difference = column - target[stat]
+            difference *= difference
+            if weights is not None:
+                difference *= weights[stat]
+            squared += difference
+        return squared
+
+    def _nearest_by_scan(self, target, k, weights, skip):
+        ''' Compares the target with every monster at once and keeps the k nearest '''
+        squared = self._squared_distances(target, weights)
+        if skip is not None:
+            squared[skip] = np.inf
+        # argpartition finds the k nearest without sorting everything, but which of several
+        # monsters tied at the k-th distance it keeps is arbitrary, so take every tied one
+        kth = squared[np.argpartition(squared, k - 1)[k - 1]]
+        candidates = np.flatnonzero(squared <= kth)
+        order = np.lexsort((candidates, squared[candidates]))[:k]
+        return candidates[order], squared[candidates[order]]
+
+    def _nearest_by_tree(self, target, k, weights, skip):
+        ''' Finds the k-th nearest distance with the KD-tree, then every monster within it '''
+        tree = self._tree(weights)
+        point = target * np.sqrt(weights) if weights is not None else target
+        distances, positions = tree.query(point, k=k + (skip is not None))
+        distances = np.atleast_1d(distances)
+        positions = np.atleast_1d(positions)
+        if skip is not None:
+            distances = distances[positions != skip][:k]
+        # A little slack so rounding doesn't drop a monster tied at the k-th distance
+        candidates = np.asarray(tree.query_ball_point(point, distances[-1] * (1 + 1e-9) + 1e-9), dtype=np.int64)
+        if skip is not None:
+            candidates = candidates[candidates != skip]
+        # Measured the same way as the scan, so ties sort the same way too
+        squared = self._squared_distances(target, weights, candidates)
+        order = np.lexsort((candidates, squared))[:k]
+        return candidates[order], squared[order]
+
+    def like(self, name, k=DEFAULT_K, weights=None):
+        ''' Returns the k monsters nearest to the named one, leaving it out '''
+        return self.nearest(self.stats[self._positions[name]], k, weights, exclude=name)
+
+# The last index index_for built, so searches reuse it (and its KD-trees) until the catalogue changes
+last_index = None
+
+def index_for(catalogue):
+    ''' Returns a SimilarityIndex for the catalogue, building a new one only after the catalogue has changed '''
+    global last_index
+    if last_index is None or last_index.catalogue is not catalogue or last_index.version != catalogue.version:
+        last_index = SimilarityIndex.from_catalogue(catalogue)
+    return last_index
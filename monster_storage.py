@@ -0,0 +1,374 @@
+# Keeps the NEOZONE monster catalogue in SQLite, with every monster's stats packed into four bytes in memory
+import argparse
+import atexit
+import heapq
+import random
+import sqlite3
+import time
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+from collections.abc import MutableMapping
+from itertools import islice
+
+# This is the filename of the database the catalogue is kept in
+DB_NAME = 'monsters.db'
+
+# The stats every monster has, in the order they are packed
+STATS = ["Strength", "Speed", "Stealth", "Cunning"]
+
+# Changes are written to the database in batches: once this many are waiting, or at the
+# next change after the oldest has waited this many seconds (it is checked on the next change,
+# there is no timer), and always on flush() or when the catalogue closes
+FLUSH_BATCH = 1000
+FLUSH_SECONDS = 5.0
+
+# How many rows are read at a time while loading
+LOAD_CHUNK = 10000
+
+# A stat index key is the stat's value above the slot number, so the keys sort by value
+# and then in the order the monsters were added
+SLOT_BITS = 32
+SLOT_MASK = (1 << SLOT_BITS) - 1
+
+# user_version 0 means a new database, which gets the starting monsters
+SCHEMA_VERSION = 1
+
+CREATE_SQL = """
+    CREATE TABLE IF NOT EXISTS monster (
+        monster_id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE,
+        strength INTEGER NOT NULL,
+        speed INTEGER NOT NULL,
+        stealth INTEGER NOT NULL,
+        cunning INTEGER NOT NULL
+    )
+"""
+
+SAVE_SQL = """
+    INSERT INTO monster (name, strength, speed, stealth, cunning) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (name) DO UPDATE SET
+        strength = excluded.strength, speed = excluded.speed,
+        stealth = excluded.stealth, cunning = excluded.cunning
+"""
+
+class MonsterCatalogue(MutableMapping):
+    """
+    The monster catalogue, used like the dictionary of dictionaries it replaces:
+    catalogue[name] gives {stat: number}, and adding or deleting a monster saves it.
+
+    In memory each monster is its name, a slot number and four bytes in one array('B')
+    of stats, so millions of monsters don't each need a dictionary. Nothing is read from
+    the database until the catalogue is first used, and changes are written behind in batches.
+    """
+
+    def __init__(self, db_name=DB_NAME, starting_monsters=None):
+        self.conn = sqlite3.connect(db_name)
+        # Set up the table, and give a new database the starting monsters
+        with self.conn:
+            self.conn.execute(CREATE_SQL)
+            if self.conn.execute("PRAGMA user_version").fetchone()[0] == 0:
+                self.conn.executemany(SAVE_SQL, [(name, *(stats[stat] for stat in STATS))
+                                                 for name, stats in (starting_monsters or {}).items()])
+                self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._loaded = False
+        # name -> slot, in the order the monsters were added (a dictionary keeps its order)
+        self._slots = {}
+        # slot -> name, None for a deleted monster's slot
+        self._names = []
+        # four stats per slot. A deleted monster's slot is left empty until _compact.
+        self._stats = array('B')
+        # One sorted array('Q') of index keys per stat, built by the first query and then kept up to date
+        self._indexes = None
+        # Goes up with every change, so anything built from the catalogue can tell it is out of date
+        self.version = 0
+        self._pending = {}        # name -> packed stats to save, or None to delete
+        self._removed = set()     # names deleted since the last flush, even if added again
+        self._oldest_pending = None
+        atexit.register(self.close)
+
+    def _load(self):
+        ''' Reads every monster into memory the first time the catalogue is used '''
+        if self._loaded:
+            return
+        self._loaded = True
+        cursor = self.conn.execute("SELECT name, strength, speed, stealth, cunning FROM monster ORDER BY monster_id")
+        while True:
+            rows = cursor.fetchmany(LOAD_CHUNK)
+            if not rows:
+                break
+            # A chunk at a time, which is quicker than adding the monsters one by one
+            first = len(self._stats) // len(STATS)
+            self._slots.update(zip([row[0] for row in rows], range(first, first + len(rows))))
+            self._names.extend([row[0] for row in rows])
+            self._stats.extend([stat for row in rows for stat in row[1:]])
+
+    def __getitem__(self, name):
+        self._load()
+        start = self._slots[name] * len(STATS)
+        return dict(zip(STATS, self._stats[start:start + len(STATS)]))
+
+    def __setitem__(self, name, stats):
+        self._load()
+        try:
+            packed = array('B', [int(stats[stat]) for stat in STATS])
+        except OverflowError:
+            raise ValueError(f"{name}'s stats must be between 0 and 255") from None
+        if name in self._slots:
+            slot = self._slots[name]
+            self._unindex(slot)
+            self._stats[slot * len(STATS):(slot + 1) * len(STATS)] = packed
+        else:
+            slot = len(self._stats) // len(STATS)
+            self._slots[name] = slot
+            self._names.append(name)
+            self._stats.extend(packed)
+        self._index(slot)
+        self.version += 1
+        self._write_behind(name, packed)
+
+    def __delitem__(self, name):
+        self._load()
+        slot = self._slots.pop(name)
+        self._unindex(slot)
+        self._names[slot] = None
+        self._removed.add(name)
+        self.version += 1
+        self._write_behind(name, None)
+        # Empty slots are only reclaimed once they are most of the array
+        slots = len(self._stats) // len(STATS)
+        if slots > 1024 and len(self._slots) < slots // 2:
+            self._compact()
+
+    def __iter__(self):
+        self._load()
+        return iter(self._slots)
+
+    def __len__(self):
+        self._load()
+        return len(self._slots)
+
+    def __contains__(self, name):
+        self._load()
+        return name in self._slots
+
+    def packed_stats(self):
+        """
+        Returns (names, stats): every monster's name in catalogue order, and a copy of
+        their stats in the same order, four bytes (STATS) per monster.
+        """
+        self._load()
+        if len(self._slots) * len(STATS) != len(self._stats):
+            self._compact()
+        return list(self._slots), self._stats[:]
+
+    def _compact(self):
+        ''' Moves the monsters' stats down over the empty slots, keeping them in order '''
+        width = len(STATS)
+        stats = array('B')
+        for name, slot in self._slots.items():
+            self._slots[name] = len(stats) // width
+            stats.extend(self._stats[slot * width:(slot + 1) * width])
+        self._stats = stats
+        self._names = list(self._slots)
+        # Every slot number has changed, so the next query builds the indexes again
+        self._indexes = None
+
+    def _index_keys(self, slot):
+        start = slot * len(STATS)
+        return [(value << SLOT_BITS) | slot for value in self._stats[start:start + len(STATS)]]
+
+    def _index(self, slot):
+        ''' Adds a monster's stats to the stat indexes, if they have been built '''
+        if self._indexes is not None:
+            for index, key in zip(self._indexes, self._index_keys(slot)):
+                index.insert(bisect_left(index, key), key)
+
+    def _unindex(self, slot):
+        ''' Takes a monster's stats out of the stat indexes, if they have been built '''
+        if self._indexes is not None:
+            for index, key in zip(self._indexes, self._index_keys(slot)):
+                del index[bisect_left(index, key)]
+
+    def _build_indexes(self):
+        if self._indexes is None:
+            self._load()
+            width = len(STATS)
+            slots = list(self._slots.values())
+            self._indexes = [array('Q', sorted([(self._stats[slot * width + stat] << SLOT_BITS) | slot for slot in slots]))
+                             for stat in range(width)]
+
+    def _key_range(self, stat, low, high):
+        ''' The positions in a stat's index of the monsters with low <= stat <= high (None is no limit) '''
+        index = self._indexes[STATS.index(stat)]
+        start = 0 if low is None else bisect_left(index, max(int(low), 0) << SLOT_BITS)
+        stop = len(index) if high is None else bisect_left(index, (max(int(high), -1) + 1) << SLOT_BITS)
+        return start, max(start, stop)
+
+    def query(self, ranges=None, sort=None, descending=False, offset=0, limit=None):
+        """
+        Finds the monsters whose stats are in ranges, a {stat: (lowest, highest)} dictionary
+        where either end can be None, and returns a MonsterPage of those from offset on.
+        They are sorted by the sort stat (in catalogue order if there is none, and where the
+        stat is tied). Each range is looked up in its stat's sorted index, and only the
+        monsters in the narrowest one are checked against the others.
+        """
+        ranges = {stat: bounds for stat, bounds in (ranges or {}).items() if bounds != (None, None)}
+        for stat in [*ranges, *([sort] if sort else [])]:
+            if stat not in STATS:
+                raise ValueError(f"Unknown stat {stat!r}, choose from {', '.join(STATS)}")
+        if not ranges and sort is None:
+            # Every monster in catalogue order needs no index, just the page
+            self._load()
+            names = islice(self._slots, offset, None if limit is None else offset + limit)
+            return MonsterPage(len(self._slots), [(name, self[name]) for name in names])
+        self._build_indexes()
+        width = len(STATS)
+        stats = self._stats
+        end = None if limit is None else offset + limit
+        spans = {stat: self._key_range(stat, *bounds) for stat, bounds in ranges.items()}
+        if spans:
+            driver = min(spans, key=lambda stat: spans[stat][1] - spans[stat][0])
+        else:
+            driver = sort
+            spans[driver] = (0, len(self._indexes[STATS.index(driver)]))
+        start, stop = spans[driver]
+        index = self._indexes[STATS.index(driver)]
+
+        if sort == driver and len(ranges) <= 1:
+            # The driving index already has the matches in order, so only the page is read from it
+            total = stop - start
+            page = list(islice(self._ordered_slots(index, start, stop, descending), offset, end))
+        else:
+            slots = [key & SLOT_MASK for key in index[start:stop]]
+            for stat, (low, high) in ranges.items():
+                if stat != driver:
+                    position = STATS.index(stat)
+                    low = -1 if low is None else low
+                    high = 256 if high is None else high
+                    slots = [slot for slot in slots if low <= stats[slot * width + position] <= high]
+            total = len(slots)
+            if sort is None:
+                key = None
+            else:
+                position = STATS.index(sort)
+                sign = -1 if descending else 1
+                key = lambda slot: (sign * stats[slot * width + position], slot)
+            if end is not None and end < len(slots) // 8:
+                # Only the page is wanted, so don't sort every match
+                page = heapq.nsmallest(end, slots, key=key)[offset:]
+            else:
+                page = sorted(slots, key=key)[offset:end]
+        return MonsterPage(total, [(self._names[slot], dict(zip(STATS, stats[slot * width:(slot + 1) * width])))
+                                   for slot in page])
+
+    def _ordered_slots(self, index, start, stop, descending):
+        """
+        Yields the slots of index[start:stop] by stat, highest first if descending, and in
+        catalogue order where the stat is tied. Nothing past what is used is read.
+        """
+        if not descending:
+            for position in range(start, stop):
+                yield index[position] & SLOT_MASK
+            return
+        if start == stop:
+            return
+        # The keys are lowest first, so go down a value at a time and read each value's run forwards
+        for value in range(index[stop - 1] >> SLOT_BITS, (index[start] >> SLOT_BITS) - 1, -1):
+            first = max(start, bisect_left(index, value << SLOT_BITS))
+            last = min(stop, bisect_left(index, (value + 1) << SLOT_BITS))
+            for position in range(first, last):
+                yield index[position] & SLOT_MASK
+
+    def _write_behind(self, name, packed):
+        ''' Queues a change, and writes the queue if it is now big enough or its oldest change old enough '''
+        self._pending[name] = packed
+        if self._oldest_pending is None:
+            self._oldest_pending = time.monotonic()
+        if len(self._pending) >= FLUSH_BATCH or time.monotonic() - self._oldest_pending >= FLUSH_SECONDS:
+            self.flush()
+
+    def flush(self):
+        ''' Writes every waiting change to the database in one transaction '''
+        if not self._pending:
+            return
+        with self.conn:
+            # A monster deleted and added again is deleted first, so it moves to the end like it does in memory
+            self.conn.executemany("DELETE FROM monster WHERE name = ?", [(name,) for name in self._removed])
+            self.conn.executemany(SAVE_SQL, [(name, *packed) for name, packed in self._pending.items() if packed is not None])
+        self._pending.clear()
+        self._removed.clear()
+        self._oldest_pending = None
+
+    def close(self):
+        ''' Writes any waiting changes and closes the database. Safe to call more than once. '''
+        if self.conn is None:
+            return
+        self.flush()
+        self.conn.close()
+        self.conn = None
+        atexit.unregister(self.close)
+
+MonsterPage = namedtuple("MonsterPage", ["total", "monsters"])
+MonsterPage.__doc__ = "One page of a query: how many monsters matched in all, and this page's (name, stats) pairs"
+
+def seed_monsters(catalogue, count, seed=0):
+    ''' Adds count made-up monsters with stats from 1 to 25. Returns how long it took in seconds. '''
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    for number in range(count):
+        catalogue[f"Monster{number}"] = {stat: rng.randint(1, 25) for stat in STATS}
+    catalogue.flush()
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    import tracemalloc
+
+    parser = argparse.ArgumentParser(description="Set up the monster catalogue database, or time and size it.")
+    parser.add_argument("--db", default=DB_NAME, help="the database file")
+    parser.add_argument("--seed-monsters", type=int, default=0, help="how many made-up monsters to add")
+    args = parser.parse_args()
+
+    catalogue = MonsterCatalogue(args.db)
+    if args.seed_monsters:
+        print(f"Added {args.seed_monsters:,} monsters in {seed_monsters(catalogue, args.seed_monsters):.2f}s")
+    catalogue.close()
+
+    # Time a fresh start, then measure the memory (tracemalloc slows everything down, so separately)
+    # and compare it with the same monsters as a dictionary of dictionaries
+    start = time.perf_counter()
+    catalogue = MonsterCatalogue(args.db)
+    opened = time.perf_counter() - start
+    count = len(catalogue)
+    loaded = time.perf_counter() - start
+    catalogue.close()
+    tracemalloc.start()
+    catalogue = MonsterCatalogue(args.db)
+    len(catalogue)
+    packed_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    tracemalloc.start()
+    as_dicts = {name: catalogue[name] for name in catalogue}
+    dict_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del as_dicts
+
+    # The first query builds the stat indexes, and later ones only read what they need from them
+    start = time.perf_counter()
+    catalogue.query({"Speed": (15, None)}, "Speed", limit=10)
+    indexed = time.perf_counter() - start
+    timings = []
+    for ranges, sort, descending in [({"Speed": (15, None), "Stealth": (None, 10)}, "Strength", False),
+                                     ({"Speed": (15, None)}, "Speed", True), ({}, "Cunning", False)]:
+        start = time.perf_counter()
+        page = catalogue.query(ranges, sort, descending, offset=100, limit=10)
+        timings.append(f"{ranges or 'every monster'} by {sort}: {page.total:,} found, "
+                       f"page in {(time.perf_counter() - start) * 1000:.2f} ms")
+    catalogue.close()
+    print(f"{count:,} monsters: opened in {opened * 1000:.1f} ms, loaded on first use in {loaded:.2f}s")
+    # The dictionaries share the catalogue's name strings, so their figure leaves the names out
+    print(f"Memory: {packed_bytes / 1024 / 1024:.1f} MB for the catalogue with its names, "
+          f"{dict_bytes / 1024 / 1024:.1f} MB more for the stats as a dictionary of dictionaries")
+    print(f"Stat indexes built in {indexed:.2f}s by the first query")
+    for timing in timings:
+        print("   " + timing)
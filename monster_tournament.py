@@ -0,0 +1,214 @@
+# Plays every monster against every other monster to see which stats win, for balancing the game
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from monster_storage import DB_NAME, STATS, MonsterCatalogue
+
+# Where each stat is in a monster's stats (the STATS order)
+STRENGTH, SPEED, STEALTH, CUNNING = range(len(STATS))
+
+DEFAULT_RULE = "tactics"
+DEFAULT_ROUNDS = 10
+# Each block of matchups is about this many pairs, which keeps a worker's arrays to tens of MB
+BLOCK_PAIRS = 2000000
+# How much a stat advantage matters: an advantage of SCALE makes a win about 73% likely
+SCALE = 10.0
+# Elo ratings start here, and 400 points more means ten times the odds of winning
+ELO_START = 1500
+ELO_SPREAD = 400
+
+# The scoring rules by name, which scoring_rule fills in
+SCORING_RULES = {}
+
+def scoring_rule(name):
+    """
+    Adds a scoring rule to SCORING_RULES. A rule gets two monsters' stats, mine and theirs,
+    where mine[STRENGTH] and the rest are NumPy arrays that broadcast against theirs, and
+    returns the chance that mine wins. rule(b, a) has to be 1 - rule(a, b), so a matchup is
+    only played one way round.
+    """
+    def register(rule):
+        SCORING_RULES[name] = rule
+        return rule
+    return register
+
+def win_chance(advantage):
+    ''' Turns an advantage (0 is an even fight) into a chance of winning, the same curve Elo uses '''
+    return 0.5 + 0.5 * np.tanh(advantage / (2 * SCALE))
+
+@scoring_rule("power")
+def power(mine, theirs):
+    ''' The monster with the bigger total of stats is more likely to win '''
+    return win_chance((mine[STRENGTH] + mine[SPEED] + mine[STEALTH] + mine[CUNNING])
+                      - (theirs[STRENGTH] + theirs[SPEED] + theirs[STEALTH] + theirs[CUNNING]))
+
+@scoring_rule("tactics")
+def tactics(mine, theirs):
+    """
+    Rock, paper, scissors: Strength beats Cunning, Cunning beats Speed, Speed beats Stealth
+    and Stealth beats Strength. Each stat scores by how far it is above the stat it beats.
+    """
+    advantage = 0
+    for attack, defence in [(STRENGTH, CUNNING), (CUNNING, SPEED), (SPEED, STEALTH), (STEALTH, STRENGTH)]:
+        advantage = advantage + np.maximum(mine[attack] - theirs[defence], 0) - np.maximum(theirs[attack] - mine[defence], 0)
+    return win_chance(advantage)
+
+def get_rule(rule):
+    ''' Returns a scoring rule from its name, or the rule itself if it is already a function '''
+    if callable(rule):
+        return rule
+    try:
+        return SCORING_RULES[rule]
+    except KeyError:
+        raise ValueError(f"Unknown scoring rule {rule!r}, choose from {', '.join(SCORING_RULES)}") from None
+
+def blocks(count, block_pairs=BLOCK_PAIRS):
+    ''' Splits the monsters into (start, stop) runs of rows, each playing about block_pairs matchups '''
+    rows = max(1, block_pairs // max(count, 1))
+    return [(start, min(start + rows, count)) for start in range(0, count, rows)]
+
+# Each worker process's copy of the stats, one float row per stat, set by share_stats
+columns = None
+
+def share_stats(stats):
+    global columns
+    columns = np.ascontiguousarray(np.asarray(stats, dtype=np.float64).reshape(-1, len(STATS)).T)
+
+def play_block(start, stop, rule, rounds, seed):
+    """
+    Plays monsters start to stop against every monster after them, rounds times each.
+    Every chance is worked out at once by broadcasting the block's stats (as a column)
+    against the later monsters' (as a row), and the rounds are drawn as one binomial per pair.
+    Returns (start, wins and expected wins for the later monsters, the same for the block).
+    """
+    mine = columns[:, start:stop, None]
+    theirs = columns[:, None, start:]
+    chance = np.asarray(get_rule(rule)(mine, theirs), dtype=np.float64)
+    # The block also meets itself, where only the pairs above the diagonal are real matchups
+    played = np.ones(chance.shape, dtype=bool)
+    played[:, :stop - start] = np.triu(np.ones((stop - start, stop - start), dtype=bool), 1)
+    chance[~played] = 0.0
+    wins = np.random.default_rng(seed).binomial(rounds, chance)
+    losses = np.where(played, rounds - wins, 0)
+    lost_chance = np.where(played, 1.0 - chance, 0.0)
+    return (start, losses.sum(axis=0), lost_chance.sum(axis=0) * rounds,
+            wins.sum(axis=1), chance.sum(axis=1) * rounds)
+
+Standing = namedtuple("Standing", ["name", "wins", "games", "win_rate", "expected_win_rate", "elo"])
+
+def elo_ratings(wins, games):
+    """
+    Elo-style ratings from each monster's wins. Everyone plays everyone the same number of
+    times, so a rating is the one that would expect that share of wins against the whole field.
+    Half a win is added to each side so a monster that always wins or always loses still gets one.
+    """
+    share = (wins + 0.5) / (games + 1.0)
+    return ELO_START + ELO_SPREAD * np.log10(share / (1.0 - share))
+
+def run_tournament(names, stats, rule=DEFAULT_RULE, rounds=DEFAULT_ROUNDS, workers=None, seed=0, block_pairs=BLOCK_PAIRS):
+    """
+    Plays every pair of monsters rounds times. stats has four numbers (STATS) per monster.
+    The blocks of matchups are shared between workers processes (all the CPUs by default,
+    none with 1), and each block has its own random seed, so the results are the same
+    however many workers there are. Returns a report dictionary with the standings best first.
+    """
+    names = list(names)
+    count = len(names)
+    started = time.perf_counter()
+    runs = blocks(count, block_pairs)
+    seeds = np.random.SeedSequence(seed).spawn(len(runs))
+    tasks = [(start, stop, rule, rounds, block_seed) for (start, stop), block_seed in zip(runs, seeds)]
+    workers = min(workers or os.cpu_count() or 1, max(len(tasks), 1))
+    if workers == 1:
+        share_stats(stats)
+        results = [play_block(*task) for task in tasks]
+    else:
+        with multiprocessing.Pool(workers, initializer=share_stats, initargs=(stats,)) as pool:
+            results = pool.starmap(play_block, tasks)
+    wins = np.zeros(count, dtype=np.int64)
+    expected = np.zeros(count)
+    for start, their_wins, their_expected, block_wins, block_expected in results:
+        wins[start:] += their_wins
+        expected[start:] += their_expected
+        wins[start:start + len(block_wins)] += block_wins
+        expected[start:start + len(block_wins)] += block_expected
+    seconds = time.perf_counter() - started
+
+    games = (count - 1) * rounds
+    ratings = elo_ratings(wins, games)
+    order = np.lexsort((np.arange(count), -ratings))
+    pairs = count * (count - 1) // 2
+    return {
+        "monsters": count,
+        "rule": rule if isinstance(rule, str) else rule.__name__,
+        "rounds": rounds,
+        "workers": workers,
+        "pairs": pairs,
+        "matchups": pairs * rounds,
+        "seconds": seconds,
+        "pairs_per_second": pairs / seconds if seconds else math.inf,
+        "matchups_per_second": pairs * rounds / seconds if seconds else math.inf,
+        "standings": [Standing(names[i], int(wins[i]), games, float(wins[i] / games) if games else 0.0,
+                               float(expected[i] / games) if games else 0.0, float(ratings[i])) for i in order],
+    }
+
+def tournament(catalogue, rule=DEFAULT_RULE, rounds=DEFAULT_ROUNDS, workers=None, seed=0):
+    ''' Runs a tournament between every monster in a MonsterCatalogue '''
+    names, stats = catalogue.packed_stats()
+    return run_tournament(names, np.frombuffer(stats, dtype=np.uint8), rule, rounds, workers, seed)
+
+def win_rate_table(names, stats, picked, rule=DEFAULT_RULE):
+    """
+    The chance of each picked monster beating each other picked monster, as a list of rows
+    in the order picked (row beats column). A monster meeting itself has an even chance.
+    """
+    positions = {name: position for position, name in enumerate(names)}
+    picked_stats = np.asarray(stats, dtype=np.float64).reshape(-1, len(STATS))[[positions[name] for name in picked]].T
+    chance = np.asarray(get_rule(rule)(picked_stats[:, :, None], picked_stats[:, None, :]), dtype=np.float64)
+    return chance.tolist()
+
+def print_report(report, top=10):
+    print(f"{report['monsters']:,} monsters, {report['pairs']:,} pairs x {report['rounds']} rounds = "
+          f"{report['matchups']:,} matchups with the {report['rule']} rule on {report['workers']} worker(s)")
+    print(f"   {report['seconds']:.2f}s: {report['pairs_per_second']:,.0f} pairs/s, "
+          f"{report['matchups_per_second']:,.0f} matchups/s")
+    print(f"   {'':4}{'monster':<20}{'elo':>7}{'win rate':>10}{'expected':>10}")
+    for place, standing in enumerate(report["standings"][:top], 1):
+        print(f"   {place:<4}{standing.name:<20}{standing.elo:7.0f}{standing.win_rate:10.1%}{standing.expected_win_rate:10.1%}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play every monster against every other monster and rank them.")
+    parser.add_argument("--db", default=DB_NAME, help="the monster catalogue database")
+    parser.add_argument("--random", type=int, metavar="N", help="use N made-up monsters instead of the catalogue")
+    parser.add_argument("--rule", default=DEFAULT_RULE, choices=sorted(SCORING_RULES), help="how a matchup is scored")
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS, help="how many times each pair plays")
+    parser.add_argument("--workers", type=int, help="processes to use (all the CPUs by default)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed, for results that can be repeated")
+    parser.add_argument("--top", type=int, default=10, help="how many of the standings to print")
+    parser.add_argument("--out", help="also write the report and the top monsters' win-rate table as JSON here")
+    args = parser.parse_args()
+
+    if args.random:
+        names = [f"Monster{number}" for number in range(args.random)]
+        stats = np.random.default_rng(args.seed).integers(1, 26, size=(args.random, len(STATS)), dtype=np.uint8)
+    else:
+        catalogue = MonsterCatalogue(args.db)
+        names, stats = catalogue.packed_stats()
+        catalogue.close()
+        stats = np.frombuffer(stats, dtype=np.uint8)
+    report = run_tournament(names, stats, args.rule, args.rounds, args.workers, args.seed)
+    print_report(report, args.top)
+    if args.out:
+        top = [standing.name for standing in report["standings"][:args.top]]
+        report = dict(report, standings=[standing._asdict() for standing in report["standings"]],
+                      win_rate_table={"monsters": top, "chances": win_rate_table(names, stats, top, args.rule)})
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.out}")